@@ -0,0 +1,143 @@
+import html
+import re
+
+from ast_nodes import Document, Heading
+
+
+# Heading ids, ::toc and #links depend on the whole document (the second "Intro" heading
+# gets id "intro-2"), but blocks are rendered and cached one at a time. So blocks only
+# contain placeholders, and resolve() fills them in with one pass over the rendered
+# chunks, using the headings of the AST that was already parsed.
+
+OPEN = "\ue000"
+CLOSE = "\ue001"
+
+PLACEHOLDER_RE = re.compile(f"{OPEN}(?:(a|r):([^{CLOSE}]*)|toc:(\\d+)){CLOSE}")
+TAG_RE = re.compile(r"<[^>]+>")
+
+
+def escape(text: str) -> str:
+    # html.escape for text from the source. The sentinels become character references,
+    # so a document can't contain anything the final pass takes for a placeholder
+    return html.escape(text).replace(OPEN, "&#xe000;").replace(CLOSE, "&#xe001;")
+
+
+def slugify(text: str) -> str:
+    # lower case words joined by dashes, the markup characters drop out
+    slug = re.sub(r"[^\w\s-]", "", text.lower())
+    slug = re.sub(r"[\s-]+", "-", slug).strip("-")
+    return slug or "section"
+
+
+def anchor_placeholder(text: str) -> str:
+    return f"{OPEN}a:{slugify(text)}{CLOSE}"
+
+
+def ref_placeholder(target: str) -> str:
+    # [text](#Some Heading) and [text](#some-heading-2) both work
+    return f"{OPEN}r:{slugify(target)}{CLOSE}"
+
+
+def toc_placeholder(depth: int) -> str:
+    return f"{OPEN}toc:{depth}{CLOSE}"
+
+
+def toc_html(entries: list[tuple[int, str, str]], depth: int) -> str:
+    # entries are (level, text html, id), nested lists follow the heading levels.
+    # stack holds the level of every open list, a list is closed once the heading
+    # belongs to the list around it (H1, H3, H2 puts the H3 and the H2 under the H1)
+    parts = []
+    stack = []
+    for level, text, anchor in entries:
+        if level > depth:
+            continue
+        while len(stack) > 1 and stack[-2] >= level:
+            parts.append("</li></ul>")
+            stack.pop()
+        if not stack or level > stack[-1]:
+            parts.append("<ul>")
+            stack.append(level)
+        else:
+            parts.append("</li>")
+            stack[-1] = level
+        parts.append(f"<li><a href='#{anchor}'>{text}</a>")
+
+    while stack:
+        parts.append("</li></ul>")
+        stack.pop()
+    return "".join(parts)
+
+
+class Anchors:
+    # the ids of one document, made on the first placeholder that needs them
+
+    def __init__(self, doc: Document, inline):
+        self.ids = {}           # base slug -> ids of the headings with that slug, in order
+        self.next = {}          # base slug -> how many of them were handed out
+        self.used = set()
+        self.headings = []      # (level, source text, id)
+        self.entries = None     # (level, text html, id), only made for a ::toc
+        self.tocs = {}
+        self.inline = inline
+
+        for h in doc.children:
+            if not isinstance(h, Heading):
+                continue
+            base = slugify(h.text)
+            anchor = self.unique(base)
+            self.ids.setdefault(base, []).append(anchor)
+            self.headings.append((h.level, h.text, anchor))
+
+    def unique(self, base: str) -> str:
+        anchor = base
+        n = 2
+        while anchor in self.used:
+            anchor = f"{base}-{n}"
+            n += 1
+        self.used.add(anchor)
+        return anchor
+
+    def heading(self, base: str) -> str:
+        # headings take their ids in document order. A placeholder without a heading
+        # (html kept from before a block broke) still gets an id of its own
+        i = self.next.get(base, 0)
+        self.next[base] = i + 1
+        ids = self.ids.get(base, ())
+        return ids[i] if i < len(ids) else self.unique(base)
+
+    def ref(self, slug: str) -> str:
+        ids = self.ids.get(slug)
+        if ids:
+            return ids[0]
+        return slug
+
+    def toc(self, depth: int) -> str:
+        if self.entries is None:
+            # the toc shows the heading text without its formatting
+            self.entries = [
+                (level, escape(html.unescape(TAG_RE.sub("", self.inline(text)))), anchor)
+                for level, text, anchor in self.headings
+            ]
+        if depth not in self.tocs:
+            self.tocs[depth] = toc_html(self.entries, depth)
+        return self.tocs[depth]
+
+    def replace(self, m) -> str:
+        kind, value = m.group(1), m.group(2)
+        if kind == "a":
+            return self.heading(value)
+        if kind == "r":
+            return "#" + self.ref(value)
+        return self.toc(int(m.group(3)))
+
+
+def resolve(doc: Document, blocks: list[str], inline) -> list[str]:
+    # fills in the placeholders, only the chunks that contain one are touched
+    anchors = None
+    for i, chunk in enumerate(blocks):
+        if OPEN not in chunk:
+            continue
+        if anchors is None:
+            anchors = Anchors(doc, inline)
+        blocks[i] = PLACEHOLDER_RE.sub(anchors.replace, chunk)
+    return blocks
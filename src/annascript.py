@@ -0,0 +1,141 @@
+import argparse
+import sys
+
+
+def cmd_build(args) -> int:
+    from build import build
+    return build(args.src, args.out, jobs=args.jobs, force=args.force, quiet=args.quiet)
+
+
+def cmd_watch(args) -> int:
+    from watch import watch
+    return watch(args.src, args.out, poll=args.poll, interval=args.interval)
+
+
+def cmd_serve(args) -> int:
+    from server import serve
+    from limits import CompileLimits
+    limits = CompileLimits(
+        max_source_bytes=args.max_bytes or None,
+        max_depth=args.max_depth or None,
+        max_table_cells=args.max_cells or None,
+        time_budget=args.timeout or None,
+    )
+    return serve(args.host, args.port, socket_path=args.socket, verbose=args.verbose, limits=limits,
+                 root=args.root, allow_remote=args.allow_remote)
+
+
+def cmd_loadtest(args) -> int:
+    from loadtest import loadtest
+    return loadtest(args.url, args.socket, args.requests, args.concurrency, path=args.file, unique=args.unique)
+
+
+def cmd_bench(args) -> int:
+    from bench import bench, FULL_SIZES
+    sizes = args.sizes.split(",") if args.sizes else (list(FULL_SIZES) if args.full else None)
+    profiles = args.profiles.split(",") if args.profiles else None
+    if args.highlight:
+        from bench import bench_highlight
+        return bench_highlight(profiles, (sizes or ["1M"])[0], repeat=args.repeat, seed=args.seed)
+    return bench(profiles, sizes, repeat=args.repeat, seed=args.seed, baseline_path=args.baseline,
+                 save=args.save_baseline, threshold=args.threshold, output=args.output)
+
+
+def cmd_profile(args) -> int:
+    from profiling import profile_file
+    return profile_file(args.file, runs=args.runs, out_dir=args.out)
+
+
+def cmd_pdf(args) -> int:
+    from pdf_export import export_pdfs
+    return export_pdfs(args.src, args.out, pages=args.pages)
+
+
+def cmd_stress(args) -> int:
+    from stress import stress
+    return stress(args.threads, args.rounds, args.size, args.seed)
+
+
+def make_arg_parser() -> argparse.ArgumentParser:
+    ap = argparse.ArgumentParser(prog="annascript", description="annaScript command line compiler")
+    sub = ap.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("build", help="compile a folder of .ascr files to html")
+    p.add_argument("src", help="source folder")
+    p.add_argument("-o", "--out", required=True, help="output folder")
+    p.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: cpu count)")
+    p.add_argument("--force", action="store_true", help="ignore the manifest and rebuild everything")
+    p.add_argument("-q", "--quiet", action="store_true", help="only print the summary")
+    p.set_defaults(func=cmd_build)
+
+    p = sub.add_parser("watch", help="keep recompiling a folder whenever a file changes")
+    p.add_argument("src", help="source folder")
+    p.add_argument("-o", "--out", required=True, help="output folder")
+    p.add_argument("--poll", action="store_true", help="poll the folder instead of using inotify")
+    p.add_argument("--interval", type=float, default=0.5, help="polling interval in seconds")
+    p.set_defaults(func=cmd_watch)
+
+    p = sub.add_parser("serve", help="run a local compile server with a json api")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--socket", default=None, help="listen on this unix socket instead of tcp")
+    p.add_argument("--root", default=None, help="folder that \"path\" requests may read from (off without it)")
+    p.add_argument("--allow-remote", action="store_true", help="allow a --host that isn't a loopback address")
+    p.add_argument("-v", "--verbose", action="store_true", help="log every request")
+    p.add_argument("--max-bytes", type=int, default=16 * 1024 * 1024, help="largest accepted document, 0 for no limit")
+    p.add_argument("--max-depth", type=int, default=32, help="deepest accepted list nesting, 0 for no limit")
+    p.add_argument("--max-cells", type=int, default=200_000, help="most table cells per document, 0 for no limit")
+    p.add_argument("--timeout", type=float, default=10.0, help="seconds one compile may take, 0 for no limit")
+    p.set_defaults(func=cmd_serve)
+
+    p = sub.add_parser("loadtest", help="measure requests/sec and latency of a running compile server")
+    p.add_argument("--url", default="http://127.0.0.1:8765")
+    p.add_argument("--socket", default=None, help="connect to this unix socket instead of tcp")
+    p.add_argument("-n", "--requests", type=int, default=2000)
+    p.add_argument("-c", "--concurrency", type=int, default=16)
+    p.add_argument("-f", "--file", default=None, help="send this .ascr file instead of the built-in sample")
+    p.add_argument("--unique", action="store_true", help="make every request body unique to bypass the document cache")
+    p.set_defaults(func=cmd_loadtest)
+
+    p = sub.add_parser("bench", help="benchmark every compile stage on synthetic documents")
+    p.add_argument("--profiles", default=None, help="comma separated: inline,lists,tables,macros,symbols,mixed")
+    p.add_argument("--sizes", default=None, help="comma separated document sizes, e.g. 1K,64K,1M")
+    p.add_argument("--full", action="store_true", help="run every size from 1KB up to 50MB")
+    p.add_argument("--repeat", type=int, default=5, help="runs per stage, the best one counts")
+    p.add_argument("--seed", type=int, default=1234)
+    p.add_argument("--baseline", default=None, help="baseline json to compare against (or to write with --save-baseline)")
+    p.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    p.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown per stage, 0.25 = 25%%")
+    p.add_argument("-o", "--output", default=None, help="also write the results to this json file")
+    p.add_argument("--highlight", action="store_true", help="benchmark the editor syntax highlighter in blocks/sec instead")
+    p.set_defaults(func=cmd_bench)
+
+    p = sub.add_parser("profile", help="profile compiling one file (cProfile, tracemalloc, folded stacks)")
+    p.add_argument("file", help=".ascr file to compile")
+    p.add_argument("-n", "--runs", type=int, default=10, help="how often the file is compiled")
+    p.add_argument("-o", "--out", default=None, help="report folder (default: a new folder in the temp dir)")
+    p.set_defaults(func=cmd_profile)
+
+    p = sub.add_parser("pdf", help="export a file or a whole folder to pdf (needs PySide6)")
+    p.add_argument("src", help=".ascr file or source folder")
+    p.add_argument("-o", "--out", default=None, help="pdf file or output folder (default: next to the sources)")
+    p.add_argument("-p", "--pages", type=int, default=4, help="how many pages render at the same time")
+    p.set_defaults(func=cmd_pdf)
+
+    p = sub.add_parser("stress", help="compile on many threads at once and check every result")
+    p.add_argument("-t", "--threads", type=int, default=8)
+    p.add_argument("-r", "--rounds", type=int, default=20)
+    p.add_argument("--size", default="64K", help="size of each corpus document")
+    p.add_argument("--seed", type=int, default=1234)
+    p.set_defaults(func=cmd_stress)
+
+    return ap
+
+
+def main(argv=None) -> int:
+    args = make_arg_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
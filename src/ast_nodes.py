@@ -50,3 +50,8 @@ class Table(Node):
 @dataclass
 class Comment(Node):
     raw: str = ""
+
+@dataclass
+class ErrorNode(Node):
+    # a block the parser could not make sense of, rendered as an inline error marker
+    message: str = ""
@@ -0,0 +1,145 @@
+import asyncio
+import os
+import sys
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+
+import compiler_api
+from compiler import Compiler
+from stats import CompileStats
+
+
+# asyncio front end of the compiler for web apps. The CPU work runs on an executor and
+# file writes go through asyncio.to_thread, so the event loop keeps serving requests.
+# A semaphore caps the compiles in flight, and cancelling the awaiting task stops the
+# compile at its next budget check (see limits.py) instead of letting it run to the end.
+
+# With the GIL, compile threads compete with the event loop thread for it, and more than two
+# of them make the loop lag without compiling any faster. Free-threaded builds use every core
+GIL_CONCURRENCY = 2
+
+# the compiler of a worker process when AsyncCompiler runs on a ProcessPoolExecutor
+_process_compiler = None
+
+
+def _compile_in_process(text: str, standalone: bool) -> tuple[str, CompileStats]:
+    # runs inside the worker process, each one keeps its own compiler and caches
+    global _process_compiler
+    if _process_compiler is None:
+        _process_compiler = Compiler()
+    html_out, stats = _process_compiler.compile(text)
+    if standalone:
+        html_out = _process_compiler.inline_stylesheet(html_out)
+    return html_out, stats
+
+
+def _write_text(path: str, text: str):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+class AsyncCompiler:
+    def __init__(self, compiler: Compiler | None = None, executor: Executor | None = None,
+                 max_concurrency: int | None = None):
+        # without an executor the compiles get their own thread pool. A ProcessPoolExecutor
+        # works too, each worker process then compiles with its own Compiler, and a running
+        # compile can't be stopped early there, only queued ones are dropped
+        self.compiler = compiler or Compiler()
+        if max_concurrency is None:
+            gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+            max_concurrency = GIL_CONCURRENCY if gil else (os.cpu_count() or 4)
+        self.max_concurrency = max_concurrency
+        self.own_executor = executor is None
+        self.executor = executor or ThreadPoolExecutor(self.max_concurrency, thread_name_prefix="ascript-compile")
+        self.in_process = isinstance(self.executor, ProcessPoolExecutor)
+        # a semaphore belongs to the event loop it first waited on, so every loop
+        # (each asyncio.run) gets its own. The executor is shared by all of them
+        self.semaphores = {}
+        self.lock = threading.Lock()
+
+    def semaphore(self, loop) -> asyncio.Semaphore:
+        with self.lock:
+            semaphore = self.semaphores.get(loop)
+            if semaphore is None:
+                # the semaphore keeps its loop alive, forget the loops that are closed
+                for old in [old for old in self.semaphores if old.is_closed()]:
+                    del self.semaphores[old]
+                semaphore = self.semaphores[loop] = asyncio.Semaphore(self.max_concurrency)
+            return semaphore
+
+    def _compile(self, text: str, cancel: threading.Event, standalone: bool) -> tuple[str, CompileStats]:
+        html_out, stats = self.compiler.compile(text, cancel)
+        if standalone and not self.compiler.standalone:
+            with stats.span("theme"):
+                html_out = self.compiler.inline_stylesheet(html_out)
+        return html_out, stats
+
+    async def compile(self, text: str, standalone: bool = False) -> tuple[str, CompileStats]:
+        loop = asyncio.get_running_loop()
+        semaphore = self.semaphore(loop)
+        await semaphore.acquire()
+        cancel = threading.Event()
+
+        try:
+            if self.in_process:
+                job = self.executor.submit(_compile_in_process, text, standalone)
+            else:
+                job = self.executor.submit(self._compile, text, cancel, standalone)
+        except BaseException:
+            semaphore.release()
+            raise
+
+        # the slot is given back when the worker is really done, not when the caller
+        # stops waiting, otherwise cancelled compiles would pile up past the limit
+        job.add_done_callback(lambda _: self._release(loop, semaphore))
+
+        try:
+            return await asyncio.wrap_future(job)
+        except asyncio.CancelledError:
+            cancel.set()
+            job.cancel()
+            raise
+
+    def _release(self, loop, semaphore):
+        try:
+            loop.call_soon_threadsafe(semaphore.release)
+        except RuntimeError:
+            # the loop is gone already, nobody is waiting for the slot anymore
+            pass
+
+    async def render_to_tempfile(self, text: str) -> str:
+        # like compiler_api.render_to_tempfile, the preview goes to the temp folder of this process
+        html_out, stats = await self.compile(text)
+        return await asyncio.to_thread(compiler_api._write_preview, html_out, stats)
+
+    async def export_standalone_html(self, text: str, output_path: str) -> str:
+        html_out, _ = await self.compile(text, standalone=True)
+        await asyncio.to_thread(_write_text, output_path, html_out)
+        return output_path
+
+    def close(self):
+        if self.own_executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+# the module level functions mirror compiler_api and share its default compiler
+_default = None
+
+
+def default_async_compiler() -> AsyncCompiler:
+    global _default
+    if _default is None:
+        _default = AsyncCompiler(compiler_api.default_compiler)
+    return _default
+
+
+async def compile_text(text: str) -> tuple[str, CompileStats]:
+    return await default_async_compiler().compile(text)
+
+
+async def render_to_tempfile(text: str) -> str:
+    return await default_async_compiler().render_to_tempfile(text)
+
+
+async def export_standalone_html(text: str, output_path: str) -> str:
+    return await default_async_compiler().export_standalone_html(text, output_path)
@@ -0,0 +1,237 @@
+import contextlib
+import io
+import json
+import os
+import re
+import tempfile
+import time
+
+import compiler_api
+from ast_nodes import Heading, Paragraph, ListItem, UL, OL, Table, Macro
+from corpus import PROFILES, generate, parse_size, format_size
+from highlight import highlight_line, PARAM_RE, STATE_MACRO
+from inline import parse_inline
+from lexer import lex_line
+from parser import parse
+from renderer import render
+from tokenizer import tokenize
+
+
+DEFAULT_SIZES = ("1K", "64K", "1M")
+FULL_SIZES = ("1K", "64K", "1M", "10M", "50M")
+
+# parse_inline is memoized, the benchmarks measure the uncached function
+_parse_inline = getattr(parse_inline, "__wrapped__", parse_inline)
+
+
+def collect_inline(nodes, out: list[str]):
+    # every string the renderer hands to parse_inline
+    for node in nodes:
+        if isinstance(node, Heading):
+            out.append(node.text)
+        elif isinstance(node, Paragraph):
+            out.append(" ".join(line.strip() for line in node.lines))
+        elif isinstance(node, Macro):
+            out.append(node.content)
+        elif isinstance(node, (UL, OL)):
+            collect_inline(node.items, out)
+        elif isinstance(node, ListItem):
+            out.append(node.text)
+            collect_inline(node.children, out)
+        elif isinstance(node, Table):
+            out.extend(cell for row in node.rows for cell in row)
+    return out
+
+
+def clear_caches():
+    # every repetition measures a cold compile, like the baselines from before the caches
+    lex_line.cache_clear()
+    highlight_line.cache_clear()
+    parse_inline.cache_clear()
+    compiler_api.default_compiler.blocks.clear()
+
+
+def best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        clear_caches()
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def bench_document(text: str, repeat: int) -> dict:
+    tokens = tokenize(text)
+    doc = parse(tokens)
+    inline_texts = collect_inline(doc.children, [])
+
+    fd, out_path = tempfile.mkstemp(suffix=".html", prefix="ascr_bench_")
+    os.close(fd)
+
+    def run_inline():
+        for s in inline_texts:
+            _parse_inline(s)
+
+    def run_export():
+        # the export logs every file it writes, that shouldn't end up in the benchmark output
+        with contextlib.redirect_stdout(io.StringIO()):
+            compiler_api.export_standalone_html(text, out_path)
+
+    try:
+        return {
+            "tokenize": best_of(lambda: tokenize(text), repeat),
+            "parse": best_of(lambda: parse(tokens), repeat),
+            "parse_inline": best_of(run_inline, repeat),
+            "render": best_of(lambda: render(doc), repeat),
+            "export": best_of(run_export, repeat),
+        }
+    finally:
+        os.remove(out_path)
+
+
+def repeats_for(size: int, repeat: int) -> int:
+    # big documents take seconds per run, a few runs are enough there
+    if size >= 10 * 1024 * 1024:
+        return min(repeat, 2)
+    if size >= 1024 * 1024:
+        return min(repeat, 3)
+    return repeat
+
+
+def run_suite(profiles, sizes, repeat: int = 5, seed: int = 1234, quiet: bool = False) -> dict:
+    results = {}
+    for profile in profiles:
+        for size_text in sizes:
+            size = parse_size(size_text)
+            text = generate(profile, size, seed)
+            timings = bench_document(text, repeats_for(size, repeat))
+            key = f"{profile}/{format_size(size)}"
+            results[key] = {"bytes": len(text.encode("utf-8")), "ms": timings}
+
+            if not quiet:
+                mb = len(text) / (1024 * 1024)
+                cells = "  ".join(f"{stage} {ms:9.2f}ms" for stage, ms in timings.items())
+                print(f"[aScript] {key:<16} {cells}  ({mb / (timings['export'] / 1000):.2f}MB/s export)")
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float, min_ms: float = 0.5) -> list[str]:
+    regressions = []
+    for key, entry in results.items():
+        base = baseline.get("results", {}).get(key)
+        if not base:
+            continue
+        for stage, ms in entry["ms"].items():
+            base_ms = base["ms"].get(stage)
+            if base_ms is None:
+                continue
+            # tiny timings are mostly noise, compare them against a floor
+            limit = max(base_ms, min_ms) * (1 + threshold)
+            if ms > limit:
+                regressions.append(f"{key} {stage}: {ms:.2f}ms vs baseline {base_ms:.2f}ms (+{(ms / base_ms - 1) * 100:.0f}%)")
+    return regressions
+
+
+# the rule list of the editor highlighter before the single pass scanner, kept as a reference
+LEGACY_RULES = [re.compile(p) for p in (
+    r"//.*$", r"^#{1,4} .*", r"\*\*\*[^*]+?\*\*\*", r"\*\*[^*]+?\*\*", r"\*[^*]+?\*", r"`[^`]+?`",
+    r"\^\^[^\^]+?\^\^", r",,[^,]+?,,", r"\[[^\]]+?\]", r"\([^)]+?\)", r"==[^=]+?==",
+    r"^\s*-\s+.+$", r"^\s{4}-\s+.+$", r"^\s*[0-9]+\.\s+.+$", r"^::[A-Za-z0-9_]+", r"^::$",
+    r"^\|(\s*[-A-Za-z0-9 ]+\s*\|)+$", r"^\|.*\|$",
+)]
+
+
+def legacy_highlight_line(text: str, in_macro: bool):
+    # same work the old highlightBlock did, returns every setFormat call it would make
+    if text.startswith("::") and not text.startswith(":::"):
+        return [(0, len(text))], text.strip() != "::"
+    if in_macro:
+        return [(0, len(text))], text.strip() != "::"
+    m = PARAM_RE.match(text)
+    if m:
+        return [(0, 1), (1, 1)], False
+    calls = []
+    for pattern in LEGACY_RULES:
+        for match in pattern.finditer(text):
+            calls.append(match.span())
+    return calls, False
+
+
+def bench_highlight(profiles=None, size: str = "1M", repeat: int = 3, seed: int = 1234) -> int:
+    profiles = profiles or list(PROFILES)
+    single_pass = getattr(highlight_line, "__wrapped__", highlight_line)
+
+    for profile in profiles:
+        lines = generate(profile, parse_size(size), seed).split("\n")
+
+        def run_legacy():
+            in_macro, calls = False, 0
+            for line in lines:
+                spans, in_macro = legacy_highlight_line(line, in_macro)
+                calls += len(spans)
+            return calls
+
+        def run(fn):
+            in_macro, calls = False, 0
+            for line in lines:
+                spans, state = fn(line, in_macro)
+                in_macro = state == STATE_MACRO
+                calls += len(spans)
+            return calls
+
+        legacy_ms = best_of(run_legacy, repeat)
+        single_ms = best_of(lambda: run(single_pass), repeat)
+
+        # the warm cache is what's measured here, so not through best_of (it clears the caches)
+        highlight_line.cache_clear()
+        run(highlight_line)
+        start = time.perf_counter()
+        run(highlight_line)
+        cached_ms = (time.perf_counter() - start) * 1000
+
+        legacy_calls = run_legacy()
+        single_calls = run(single_pass)
+        n = len(lines)
+        print(
+            f"[aScript] {profile:<8} {n} blocks: legacy {n / legacy_ms * 1000:10.0f} blocks/s, "
+            f"single pass {n / single_ms * 1000:10.0f} blocks/s, cached {n / cached_ms * 1000:10.0f} blocks/s, "
+            f"setFormat calls {legacy_calls} -> {single_calls}"
+        )
+    return 0
+
+
+def bench(profiles=None, sizes=None, repeat: int = 5, seed: int = 1234, baseline_path: str | None = None,
+          save: bool = False, threshold: float = 0.25, output: str | None = None) -> int:
+    profiles = profiles or list(PROFILES)
+    sizes = sizes or list(DEFAULT_SIZES)
+
+    # copy the themes up front, otherwise the first export pays for it
+    compiler_api._ensure_temp_environment()
+
+    results = run_suite(profiles, sizes, repeat, seed)
+    report = {"seed": seed, "repeat": repeat, "results": results}
+
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+
+    status = 0
+    if baseline_path and save:
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+        print(f"[aScript] baseline saved to {baseline_path}")
+    elif baseline_path:
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, threshold)
+        if regressions:
+            print(f"[aScript] {len(regressions)} stage(s) regressed more than {threshold * 100:.0f}%:")
+            for line in regressions:
+                print(f"[aScript]   {line}")
+            status = 1
+        else:
+            print(f"[aScript] no regressions against {baseline_path} (threshold {threshold * 100:.0f}%)")
+
+    compiler_api.cleanup_instance_directory()
+    return status
@@ -0,0 +1,225 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from parser import parse_text
+from renderer import render
+from compiler import BASE_DIR, THEMES_SRC
+
+
+SOURCE_EXTENSIONS = (".ascr", ".ascript")
+MANIFEST_NAME = ".ascr-manifest.json"
+
+# modules whose code changes the generated html, a change in any of them invalidates the manifest
+COMPILER_MODULES = (
+    "lexer.py", "tokenizer.py", "parser.py", "ast_nodes.py", "inline.py", "renderer.py",
+    "anchors.py", "limits.py", "incremental.py", "compiler.py",
+)
+
+
+def compiler_fingerprint() -> str:
+    h = hashlib.sha256()
+    for name in COMPILER_MODULES:
+        with open(os.path.join(BASE_DIR, name), "rb") as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def hash_bytes(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def find_sources(src_dir: str) -> list[str]:
+    found = []
+    for root, dirs, files in os.walk(src_dir):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        for name in sorted(files):
+            if name.endswith(SOURCE_EXTENSIONS):
+                rel = os.path.relpath(os.path.join(root, name), src_dir)
+                found.append(rel.replace(os.sep, "/"))
+    return found
+
+
+def output_name(rel: str) -> str:
+    return os.path.splitext(rel)[0] + ".html"
+
+
+def relink_themes(html_out: str, depth: int) -> str:
+    # the stylesheet link is relative to the output root
+    if not depth:
+        return html_out
+    return html_out.replace("href='themes/", f"href='{'../' * depth}themes/", 1)
+
+
+def compile_to_html(text: str, depth: int = 0) -> str:
+    return relink_themes(render(parse_text(text)), depth)
+
+
+def compile_file(src_path: str, dst_path: str, depth: int = 0):
+    # runs inside the worker processes, returns (elapsed ms, error or None)
+    start = time.perf_counter()
+    try:
+        with open(src_path, "r", encoding="utf-8") as f:
+            text = f.read()
+
+        html_out = compile_to_html(text, depth)
+
+        os.makedirs(os.path.dirname(dst_path) or ".", exist_ok=True)
+        with open(dst_path, "w", encoding="utf-8") as f:
+            f.write(html_out)
+        error = None
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+
+    return (time.perf_counter() - start) * 1000, error
+
+
+def load_manifest(out_dir: str) -> dict:
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {"compiler": None, "files": {}}
+
+    if not isinstance(manifest.get("files"), dict):
+        manifest["files"] = {}
+    return manifest
+
+
+def save_manifest(out_dir: str, manifest: dict):
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def copy_themes(out_dir: str):
+    dst = os.path.join(out_dir, "themes")
+    shutil.copytree(THEMES_SRC, dst, dirs_exist_ok=True)
+
+
+def plan_build(src_dir: str, out_dir: str, manifest: dict, force: bool = False):
+    # returns (files to compile as (rel, hash, stat), unchanged rel paths)
+    entries = manifest["files"]
+    todo = []
+    unchanged = []
+
+    for rel in find_sources(src_dir):
+        src_path = os.path.join(src_dir, rel)
+        dst_path = os.path.join(out_dir, output_name(rel))
+        st = os.stat(src_path)
+        entry = entries.get(rel)
+        have_output = os.path.exists(dst_path)
+
+        # cheap check first, only hash files whose size or mtime moved
+        if not force and entry and have_output \
+                and entry.get("size") == st.st_size and entry.get("mtime") == st.st_mtime_ns:
+            unchanged.append(rel)
+            continue
+
+        with open(src_path, "rb") as f:
+            digest = hash_bytes(f.read())
+
+        if not force and entry and have_output and entry.get("hash") == digest:
+            entry["size"] = st.st_size
+            entry["mtime"] = st.st_mtime_ns
+            unchanged.append(rel)
+            continue
+
+        todo.append((rel, digest, st))
+
+    return todo, unchanged
+
+
+def prune_removed(src_dir: str, out_dir: str, manifest: dict) -> list[str]:
+    removed = []
+    for rel in list(manifest["files"]):
+        if os.path.exists(os.path.join(src_dir, rel)):
+            continue
+        dst_path = os.path.join(out_dir, output_name(rel))
+        if os.path.exists(dst_path):
+            os.remove(dst_path)
+        del manifest["files"][rel]
+        removed.append(rel)
+    return removed
+
+
+def build(src_dir: str, out_dir: str, jobs: int | None = None, force: bool = False, quiet: bool = False) -> int:
+    wall_start = time.perf_counter()
+
+    src_dir = os.path.abspath(src_dir)
+    out_dir = os.path.abspath(out_dir)
+    os.makedirs(out_dir, exist_ok=True)
+
+    manifest = load_manifest(out_dir)
+    copy_themes(out_dir)
+    # before a compiler change resets the manifest, the old entries still list deleted sources
+    removed = prune_removed(src_dir, out_dir, manifest)
+
+    fingerprint = compiler_fingerprint()
+    if manifest.get("compiler") != fingerprint:
+        # compiler changed since the last build, nothing in the manifest can be trusted
+        force = True
+        manifest = {"compiler": fingerprint, "files": {}}
+
+    todo, unchanged = plan_build(src_dir, out_dir, manifest, force)
+
+    results = []
+    failed = []
+
+    def record(rel, digest, st, elapsed, error):
+        if error:
+            failed.append((rel, error))
+            manifest["files"].pop(rel, None)
+            if not quiet:
+                print(f"[aScript] FAILED  {rel}: {error}")
+            return
+        manifest["files"][rel] = {"hash": digest, "size": st.st_size, "mtime": st.st_mtime_ns}
+        results.append((rel, elapsed))
+        if not quiet:
+            print(f"[aScript] {elapsed:9.2f}ms  {rel}")
+
+    def job_args(rel):
+        return (
+            os.path.join(src_dir, rel),
+            os.path.join(out_dir, output_name(rel)),
+            rel.count("/"),
+        )
+
+    jobs = jobs or os.cpu_count() or 1
+
+    if jobs <= 1 or len(todo) <= 1:
+        for rel, digest, st in todo:
+            elapsed, error = compile_file(*job_args(rel))
+            record(rel, digest, st, elapsed, error)
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(todo))) as pool:
+            futures = {pool.submit(compile_file, *job_args(rel)): (rel, digest, st) for rel, digest, st in todo}
+            for fut in as_completed(futures):
+                rel, digest, st = futures[fut]
+                elapsed, error = fut.result()
+                record(rel, digest, st, elapsed, error)
+
+    save_manifest(out_dir, manifest)
+
+    wall = (time.perf_counter() - wall_start) * 1000
+    compile_total = sum(elapsed for _, elapsed in results)
+
+    print(
+        f"[aScript] {len(results)} compiled, {len(unchanged)} unchanged, "
+        f"{len(removed)} removed, {len(failed)} failed"
+    )
+    if results:
+        slowest_rel, slowest = max(results, key=lambda r: r[1])
+        print(
+            f"[aScript] compile time {compile_total:.2f}ms total, "
+            f"{compile_total / len(results):.2f}ms average, slowest {slowest_rel} ({slowest:.2f}ms)"
+        )
+    print(f"[aScript] build finished in {wall:.2f}ms using {jobs} job(s)")
+
+    return 1 if failed else 0
@@ -0,0 +1,117 @@
+import os
+import re
+import threading
+
+from ast_nodes import Document
+from incremental import BlockCache, LastGood
+from inline import InlineRules
+from limits import CompileLimits, start_budget
+from parser import parse
+from renderer import Renderer, MACROS, register_macro, render_page
+from sourcemap import LineIndex
+from stats import CompileStats
+from tokenizer import tokenize
+import profiling
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+THEMES_SRC = os.path.join(BASE_DIR, "themes")
+
+# bit heavier regex because the style tags can be funny
+STYLESHEET_LINK_RE = re.compile(
+    r"<link\b[^>]*?rel=['\"]stylesheet['\"][^>]*?href=['\"]([^'\"]+)['\"][^>]*?>",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+class Compiler:
+    # A self contained compiler. The macros, inline rules, block cache, theme folder and
+    # output settings belong to the instance, and compile() hands back the html instead of
+    # writing or printing anything. Compilers don't share mutable state, so any number of
+    # them can run on different threads, and the caches of one are locked for sharing it.
+
+    def __init__(self, macros: dict | None = None, inline: InlineRules | None = None,
+                 themes_dir: str = THEMES_SRC, standalone: bool = False, line_anchors: bool = False,
+                 limits: CompileLimits | None = None, max_blocks: int = 50000, verbose: bool = False):
+        # macros=None starts with a copy of the built-in macros, a dict that is passed in is used as is
+        self.macros = dict(MACROS) if macros is None else macros
+        self.inline = inline or InlineRules()
+        self.renderer = Renderer(self.macros, self.inline)
+        self.blocks = BlockCache(max_blocks, self.renderer)
+
+        self.themes_dir = themes_dir
+        self.standalone = standalone        # inline the theme css into the page
+        self.line_anchors = line_anchors    # data-line attributes on every block
+        self.limits = limits
+        self.verbose = verbose
+
+        self.theme_css = {}                 # stylesheet href -> css text or None
+        self.lock = threading.Lock()
+
+    def register_macro(self, name: str):
+        # like renderer.register_macro, but only for this compiler
+        return register_macro(name, self.macros)
+
+    def compile_blocks(self, text: str, stats: CompileStats, line_index: LineIndex | None = None,
+                       last_good: LastGood | None = None, budget=None) -> tuple[Document, list[str]]:
+        with stats.span("tokenize"), profiling.stage("tokenize"):
+            tokens = tokenize(text, budget)
+
+        with stats.span("parse"), profiling.stage("parse"):
+            doc = parse(tokens, budget)
+
+        with stats.span("render"), profiling.stage("render"):
+            blocks = self.blocks.render_blocks(doc, text, stats, line_index, last_good, budget)
+
+        return doc, blocks
+
+    def compile(self, text: str, cancel=None, last_good: LastGood | None = None) -> tuple[str, CompileStats]:
+        stats = CompileStats()
+        budget = start_budget(text, self.limits, cancel)
+        line_index = LineIndex() if self.line_anchors else None
+
+        doc, blocks = self.compile_blocks(text, stats, line_index, last_good, budget)
+        html_out = render_page(doc, blocks)
+
+        if self.standalone:
+            with stats.span("theme"):
+                html_out = self.inline_stylesheet(html_out)
+
+        if self.verbose:
+            print(f"[aScript] compiled {len(doc.children)} blocks in {stats.summary()}")
+        return html_out, stats
+
+    def read_theme_css(self, css_rel_path: str) -> str | None:
+        with self.lock:
+            if css_rel_path in self.theme_css:
+                return self.theme_css[css_rel_path]
+
+        css_abs_path = os.path.join(self.themes_dir, css_rel_path.replace("themes/", "", 1))
+        css = None
+        if os.path.exists(css_abs_path):
+            with open(css_abs_path, "r", encoding="utf-8") as f:
+                css = f.read()
+
+        with self.lock:
+            self.theme_css[css_rel_path] = css
+        return css
+
+    def inline_stylesheet(self, html: str) -> str:
+        match = STYLESHEET_LINK_RE.search(html)
+
+        if not match:
+            if self.verbose:
+                print("[aScript] No stylesheet link found. Exporting without inline CSS.")
+            return html
+
+        css_content = self.read_theme_css(match.group(1))
+
+        if css_content is None:
+            if self.verbose:
+                print("[aScript] Stylesheet found but missing on disk:", match.group(1))
+            return html
+
+        style_tag = "<style>\n" + css_content + "\n</style>"
+
+        # function replacement, css can contain backslashes
+        return STYLESHEET_LINK_RE.sub(lambda m: style_tag, html)
@@ -1,128 +1,183 @@
 import uuid
 import tempfile
 import os
-import re
 import shutil
-import time
+from dataclasses import dataclass
 
-from parser import parse_text
-from renderer import render
+from ast_nodes import Document
+from compiler import Compiler, THEMES_SRC
+from incremental import LastGood
+from inline import DEFAULT_INLINE
+from stats import CompileStats
+from sourcemap import LineIndex, SCROLL_SCRIPT
+from renderer import MACROS, render_page, add_line_anchor
+from virtual_preview import make_sections, render_shell
+from limits import CompileLimits, start_budget
+import profiling
 
 
-INSTANCE_ID = uuid.uuid4().hex
+# The editor's side of the compiler: previews in a temp folder per process and the
+# html export. The compiling itself is done by default_compiler (compiler.py), which
+# uses the built-in macro registry and the module level inline rules, so
+# renderer.register_macro and parse_inline.cache_clear() apply to it.
 
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-THEMES_SRC = os.path.join(BASE_DIR, "themes")
+default_compiler = Compiler(macros=MACROS, inline=DEFAULT_INLINE)
 
-ROOT_TEMP = os.path.join(tempfile.gettempdir(), "ascriptstudio", INSTANCE_ID)
+# informational output (theme copies, written previews), off unless set_verbose(True)
+_verbose = False
+_instance_dir = None
 
-THEMES_DST = os.path.join(ROOT_TEMP, "themes")
 
+def set_verbose(verbose: bool):
+    global _verbose
+    _verbose = verbose
+    default_compiler.verbose = verbose
 
-def _ensure_temp_environment():
-    os.makedirs(ROOT_TEMP, exist_ok=True)
 
-    if not os.path.exists(THEMES_DST):
-        print("[aScript] Copying theme folder...")
-        shutil.copytree(THEMES_SRC, THEMES_DST)
-        print(f"[aScript] Copied theme folder to {THEMES_DST}")
-    else:
-        pass
+def _log(*args):
+    if _verbose:
+        print("[aScript]", *args)
 
 
-def _cleanup_old_previews():
-    for filename in os.listdir(ROOT_TEMP):
+def instance_dir() -> str:
+    # the temp folder of this process, named on first use instead of at import
+    global _instance_dir
+    if _instance_dir is None:
+        _instance_dir = os.path.join(tempfile.gettempdir(), "ascriptstudio", uuid.uuid4().hex)
+    return _instance_dir
+
+
+def _ensure_temp_environment() -> str:
+    root = instance_dir()
+    themes_dst = os.path.join(root, "themes")
+    os.makedirs(root, exist_ok=True)
+
+    if not os.path.exists(themes_dst):
+        _log("Copying theme folder...")
+        shutil.copytree(THEMES_SRC, themes_dst)
+        _log(f"Copied theme folder to {themes_dst}")
+    return root
+
+
+def _cleanup_old_previews(root: str):
+    for filename in os.listdir(root):
         if filename == "themes":
             continue
 
         if filename.startswith("preview_") and filename.endswith(".html"):
             try:
-                os.remove(os.path.join(ROOT_TEMP, filename))
+                os.remove(os.path.join(root, filename))
             except Exception as e:
                 print("[aScript] Warning: Could not delete old preview:", e)
 
 
-def render_to_tempfile(ascript_text: str) -> str:
-    _ensure_temp_environment()
+def _compile_blocks(ascript_text: str, stats: CompileStats, line_index: LineIndex | None = None,
+                    last_good: LastGood | None = None, limits: CompileLimits | None = None, cancel=None):
+    # with limits (or a cancel event) the compile raises CompileLimitError when one is hit
+    budget = start_budget(ascript_text, limits, cancel)
+    return default_compiler.compile_blocks(ascript_text, stats, line_index, last_good, budget)
 
-    _cleanup_old_previews()
 
-    file_id = uuid.uuid4().hex
-    output_path = os.path.join(ROOT_TEMP, f"preview_{file_id}.html")
+def compile_text(ascript_text: str, stats: CompileStats | None = None, line_index: LineIndex | None = None,
+                 last_good: LastGood | None = None, limits: CompileLimits | None = None,
+                 cancel=None) -> tuple[str, CompileStats]:
+    stats = stats or CompileStats()
+    ast, blocks = _compile_blocks(ascript_text, stats, line_index, last_good, limits, cancel)
+    return render_page(ast, blocks), stats
 
-    start_time = time.time()
 
-    ast = parse_text(ascript_text)
-    html_out = render(ast)
+def _write_preview(html_out: str, stats: CompileStats) -> str:
+    root = _ensure_temp_environment()
 
-    with open(output_path, "w", encoding="utf-8") as f:
-        f.write(html_out)
+    _cleanup_old_previews(root)
 
-    elapsed = round((time.time() - start_time) * 1000, 2)
-    print(f"[aScript] wrote {output_path} in {elapsed}ms")
+    file_id = uuid.uuid4().hex
+    output_path = os.path.join(root, f"preview_{file_id}.html")
 
+    with stats.span("io"), profiling.stage("io"):
+        with open(output_path, "w", encoding="utf-8") as f:
+            f.write(html_out)
+
+    _log(f"wrote {output_path} in {stats.summary()}")
     return output_path
 
 
+def render_to_tempfile(ascript_text: str, stats: CompileStats | None = None) -> str:
+    with profiling.stage("render_to_tempfile"):
+        html_out, stats = compile_text(ascript_text, stats)
+        return _write_preview(html_out, stats)
 
 
-def cleanup_instance_directory():
-    try:
-        if os.path.exists(ROOT_TEMP):
-            shutil.rmtree(ROOT_TEMP)
-            print(f"[aScript] Cleaned instance folder {ROOT_TEMP}")
+@dataclass
+class Preview:
+    path: str
+    doc: Document
+    line_index: LineIndex
+    sections: list | None = None    # set for a virtualized preview
 
-        top_level = os.path.dirname(ROOT_TEMP)
 
-        if os.path.exists(top_level) and not os.listdir(top_level):
-            shutil.rmtree(top_level)
-            print(f"[aScript] Removed empty ascriptstudio root folder {top_level}")
+def render_preview(ascript_text: str, stats: CompileStats | None = None,
+                   virtual_min_blocks: int | None = None, last_good: LastGood | None = None) -> Preview:
+    # the editor preview: blocks carry their source lines, plus the scroll sync script.
+    # From virtual_min_blocks blocks on the page only gets section placeholders, the
+    # sections are handed to the page on demand (virtual_preview.py). The AST comes
+    # along for the editor panels (outline, folding), so they never parse on their own.
+    # Blocks that fail show an error marker over their last_good html
+    with profiling.stage("render_to_tempfile"):
+        stats = stats or CompileStats()
+        line_index = LineIndex()
+        ast, blocks = _compile_blocks(ascript_text, stats, last_good=last_good)
 
-    except Exception as e:
-        print("[aScript] Warning: Cleanup failed:", e)
+        if virtual_min_blocks is not None and len(ast.children) >= virtual_min_blocks:
+            sections = make_sections(ast.children, blocks)
+            html_out = render_shell(ast, sections, line_index)
+            return Preview(_write_preview(html_out, stats), ast, line_index, sections)
 
+        for i, (node, out) in enumerate(zip(ast.children, blocks)):
+            anchored = add_line_anchor(out, node.start_line, node.end_line)
+            if anchored is not None:
+                line_index.add(node.start_line, node.end_line)
+                blocks[i] = anchored
+        html_out = render_page(ast, blocks)
+        html_out = html_out.replace("\n  </body>", "\n" + SCROLL_SCRIPT + "  </body>", 1)
+        return Preview(_write_preview(html_out, stats), ast, line_index)
 
 
-def export_standalone_html(ascript_text: str, output_path: str):
 
-    html_path = render_to_tempfile(ascript_text)
 
-    with open(html_path, "r", encoding="utf-8") as f:
-        html = f.read()
+def cleanup_instance_directory():
+    if _instance_dir is None:
+        return
 
-    # bit heavier regex because the style tags can be funny
-    link_regex = re.compile(
-        r"<link\b[^>]*?rel=['\"]stylesheet['\"][^>]*?href=['\"]([^'\"]+)['\"][^>]*?>",
-        re.IGNORECASE | re.DOTALL,
-    )
+    try:
+        if os.path.exists(_instance_dir):
+            shutil.rmtree(_instance_dir)
+            _log(f"Cleaned instance folder {_instance_dir}")
 
-    match = link_regex.search(html)
+        top_level = os.path.dirname(_instance_dir)
 
-    if not match:
-        print("[aScript] No stylesheet link found. Exporting without inline CSS.")
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(html)
-        print("[aScript] Standalone export saved to:", output_path)
-        return output_path
+        if os.path.exists(top_level) and not os.listdir(top_level):
+            shutil.rmtree(top_level)
+            _log(f"Removed empty ascriptstudio root folder {top_level}")
 
-    css_rel_path = match.group(1)
-    css_abs_path = os.path.join(THEMES_DST, css_rel_path.replace("themes/", "", 1))
+    except Exception as e:
+        print("[aScript] Warning: Cleanup failed:", e)
 
-    if not os.path.exists(css_abs_path):
-        print("[aScript] Stylesheet found but missing on disk:", css_abs_path)
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(html)
-        return output_path
 
-    with open(css_abs_path, "r", encoding="utf-8") as f:
-        css_content = f.read()
+def read_theme_css(css_rel_path: str) -> str | None:
+    return default_compiler.read_theme_css(css_rel_path)
+
 
-    style_tag = "<style>\n" + css_content + "\n</style>"
+def inline_stylesheet(html: str) -> str:
+    return default_compiler.inline_stylesheet(html)
 
-    html_standalone = link_regex.sub(style_tag, html)
+
+def export_standalone_html(ascript_text: str, output_path: str):
+    html_out, _ = compile_text(ascript_text)
+    html_standalone = inline_stylesheet(html_out)
 
     with open(output_path, "w", encoding="utf-8") as f:
         f.write(html_standalone)
 
-    print("[aScript] Standalone export saved to:", output_path)
-    return output_path
\ No newline at end of file
+    _log("Standalone export saved to:", output_path)
+    return output_path
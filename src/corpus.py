@@ -0,0 +1,160 @@
+import random
+
+
+# Deterministic synthetic documents for the benchmarks. The same (profile, size, seed)
+# always gives the same text, so timings of different versions are comparable.
+
+WORDS = (
+    "note chapter lorem ipsum dolor sit amet function derivative integral matrix vector "
+    "energy velocity reaction protein history essay theorem proof example summary school "
+    "homework exam review formula table value result method sample analysis model graph"
+).split()
+
+GREEK = (
+    "alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta", "theta", "iota", "kappa",
+    "lambda", "mu", "nu", "xi", "omicron", "pi", "rho", "sigma", "tau", "upsilon", "phi",
+    "chi", "psi", "omega",
+)
+
+SYMBOLS = ("<->", "->", "=>", "<=", ">=", "!=", "+-", "<*>", "--")
+
+MACROS = ("box", "note", "def", "center", "summary")
+BOX_TYPES = ("info", "warning", "danger", "")
+
+
+def _words(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+
+def _inline_span(rng: random.Random) -> str:
+    w = _words(rng, rng.randint(1, 3))
+    kind = rng.randrange(9)
+    if kind == 0:
+        return f"*{w}*"
+    if kind == 1:
+        return f"**{w}**"
+    if kind == 2:
+        return f"***{w}***"
+    if kind == 3:
+        return f"`{w}`"
+    if kind == 4:
+        return f"=={w}=="
+    if kind == 5:
+        return f"x^^{rng.randint(2, 9)}^^"
+    if kind == 6:
+        return f"H,,{rng.randint(2, 9)},,O"
+    if kind == 7:
+        return f"[{w}](https://example.com/{rng.choice(WORDS)})"
+    return w
+
+
+def _symbol_text(rng: random.Random) -> str:
+    parts = []
+    for _ in range(rng.randint(6, 14)):
+        r = rng.random()
+        if r < 0.35:
+            parts.append("\\" + rng.choice(GREEK))
+        elif r < 0.65:
+            parts.append(rng.choice(SYMBOLS))
+        else:
+            parts.append(rng.choice(WORDS))
+    return " ".join(parts)
+
+
+def _paragraph(rng: random.Random, inline_ratio: float) -> str:
+    lines = []
+    for _ in range(rng.randint(1, 4)):
+        parts = [_inline_span(rng) if rng.random() < inline_ratio else rng.choice(WORDS)
+                 for _ in range(rng.randint(6, 16))]
+        lines.append(" ".join(parts))
+    return "\n".join(lines)
+
+
+def _list(rng: random.Random, max_depth: int) -> str:
+    lines = []
+    ordered = rng.random() < 0.4
+    depth = 0
+    for i in range(rng.randint(4, 16)):
+        depth = max(0, min(max_depth, depth + rng.choice((-1, 0, 0, 1))))
+        marker = f"{i + 1}." if ordered else "-"
+        lines.append(f"{'    ' * depth}{marker} {_words(rng, rng.randint(2, 6))} {_inline_span(rng)}")
+    return "\n".join(lines)
+
+
+def _table(rng: random.Random) -> str:
+    cols = rng.randint(3, 8)
+    header = "| " + " | ".join(rng.choice(WORDS).title() for _ in range(cols)) + " |"
+    sep = "|" + "|".join("-----" for _ in range(cols)) + "|"
+    rows = [
+        "| " + " | ".join(_inline_span(rng) if rng.random() < 0.3 else str(rng.randint(0, 999))
+                          for _ in range(cols)) + " |"
+        for _ in range(rng.randint(3, 20))
+    ]
+    return "\n".join([header, sep] + rows)
+
+
+def _macro(rng: random.Random) -> str:
+    name = rng.choice(MACROS)
+    attrs = ""
+    if name == "box":
+        box_type = rng.choice(BOX_TYPES)
+        if box_type:
+            attrs += f" type={box_type}"
+        if rng.random() < 0.6:
+            attrs += f' title="{_words(rng, 2).title()}"'
+    body = "\n".join(_paragraph(rng, 0.2) for _ in range(rng.randint(1, 3)))
+    return f"::{name}{attrs}\n{body}\n::"
+
+
+def _heading(rng: random.Random) -> str:
+    return "#" * rng.randint(1, 4) + " " + _words(rng, rng.randint(2, 5)).title()
+
+
+# profile -> list of (weight, block generator)
+PROFILES = {
+    "inline": [(8, lambda rng: _paragraph(rng, 0.6)), (1, _heading)],
+    "lists": [(6, lambda rng: _list(rng, 4)), (1, lambda rng: _paragraph(rng, 0.1)), (1, _heading)],
+    "tables": [(6, _table), (1, lambda rng: _paragraph(rng, 0.1)), (1, _heading)],
+    "macros": [(6, _macro), (1, lambda rng: _paragraph(rng, 0.1)), (1, _heading)],
+    "symbols": [(8, lambda rng: "\n".join(_symbol_text(rng) for _ in range(rng.randint(1, 4)))), (1, _heading)],
+    "mixed": [
+        (4, lambda rng: _paragraph(rng, 0.3)), (2, lambda rng: _list(rng, 2)), (1, _table),
+        (2, _macro), (1, lambda rng: _symbol_text(rng)), (1, _heading),
+    ],
+}
+
+
+def generate(profile: str, size: int, seed: int = 1234) -> str:
+    if profile not in PROFILES:
+        raise ValueError(f"unknown corpus profile {profile!r}, expected one of {', '.join(PROFILES)}")
+
+    rng = random.Random(f"{profile}:{seed}")
+    weights = [w for w, _ in PROFILES[profile]]
+    makers = [m for _, m in PROFILES[profile]]
+
+    parts = [f"@title: {profile} benchmark\n@author: bench\n@style: default\n"]
+    total = len(parts[0])
+    while total < size:
+        block = rng.choices(makers, weights)[0](rng)
+        parts.append(block)
+        total += len(block) + 2
+
+    return "\n\n".join(parts)[:max(size, len(parts[0]))]
+
+
+def parse_size(text: str) -> int:
+    text = text.strip().upper().removesuffix("B")
+    factor = 1
+    if text.endswith("K"):
+        factor, text = 1024, text[:-1]
+    elif text.endswith("M"):
+        factor, text = 1024 * 1024, text[:-1]
+    return int(float(text) * factor)
+
+
+def format_size(size: int) -> str:
+    if size >= 1024 * 1024:
+        return f"{size / (1024 * 1024):g}MB"
+    if size >= 1024:
+        return f"{size / 1024:g}KB"
+    return f"{size}B"
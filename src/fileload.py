@@ -0,0 +1,71 @@
+import codecs
+import mmap
+import os
+
+
+# Reads a document in line aligned chunks so the editor can append it piece by piece.
+# Files are mapped with mmap where possible, otherwise read with plain reads.
+
+CHUNK_SIZE = 1 << 20
+
+
+def _normalize(text: str) -> str:
+    # same newlines open(..., "r") would give us
+    if "\r" in text:
+        text = text.replace("\r\n", "\n").replace("\r", "\n")
+    return text
+
+
+def _mapped_chunks(f, size: int, chunk_size: int):
+    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        pos = 0
+        while pos < size:
+            end = min(size, pos + chunk_size)
+            if end < size:
+                # cut after a newline, it never sits inside a multibyte character
+                nl = data.find(b"\n", end)
+                end = size if nl < 0 else nl + 1
+            yield data[pos:end], end
+            pos = end
+    finally:
+        data.close()
+
+
+def _read_chunks(f, chunk_size: int):
+    pos = 0
+    while True:
+        block = f.read(chunk_size)
+        if not block:
+            return
+        if not block.endswith(b"\n"):
+            block += f.readline()
+        pos += len(block)
+        yield block, pos
+
+
+def read_chunks(path: str, chunk_size: int = CHUNK_SIZE):
+    # yields (text, bytes read so far, total bytes)
+    with open(path, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        decoder = codecs.getincrementaldecoder("utf-8")()
+
+        try:
+            chunks = _mapped_chunks(f, size, chunk_size) if size else iter(())
+            first = next(chunks, None)
+        except (ValueError, OSError):
+            # not mappable (pipes, some network file systems)
+            chunks = _read_chunks(f, chunk_size)
+            first = next(chunks, None)
+
+        if first is None:
+            return
+
+        block, done = first
+        yield _normalize(decoder.decode(block)), done, size
+        for block, done in chunks:
+            yield _normalize(decoder.decode(block)), done, size
+
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail, size, size
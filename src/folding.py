@@ -0,0 +1,68 @@
+from bisect import bisect_right
+
+from ast_nodes import Document, Heading, Macro, Table, UL, OL, CodeBlock
+
+
+# Foldable regions of a document, taken from the node ranges of the preview compile.
+# A region is (first line, last line, kind) with 1-based lines; folding it hides every
+# line after the first one.
+
+FOLDABLE = (Macro, Table, UL, OL, CodeBlock)
+
+
+def fold_ranges(doc: Document) -> list[tuple[int, int, str]]:
+    ranges = []
+    open_headings = []      # [level, start line, last line so far]
+
+    def close(level):
+        while open_headings and open_headings[-1][0] >= level:
+            _, start, end = open_headings.pop()
+            if end > start:
+                ranges.append((start, end, "heading"))
+
+    for ch in doc.children:
+        if isinstance(ch, Heading):
+            close(ch.level)
+            open_headings.append([ch.level, ch.start_line, ch.end_line])
+            continue
+
+        # a section reaches up to the last block before the next heading of its level
+        for entry in open_headings:
+            entry[2] = max(entry[2], ch.end_line)
+
+        if isinstance(ch, FOLDABLE) and ch.end_line > ch.start_line:
+            ranges.append((ch.start_line, ch.end_line, type(ch).__name__.lower()))
+
+    close(0)
+    ranges.sort()
+    return ranges
+
+
+class FoldMap:
+    def __init__(self):
+        self.ranges = []
+        self.starts = []
+        self.by_start = {}
+
+    def update(self, doc: Document) -> bool:
+        ranges = fold_ranges(doc)
+        if ranges == self.ranges:
+            return False
+        self.ranges = ranges
+        self.starts = [r[0] for r in ranges]
+        self.by_start = {r[0]: r for r in ranges}
+        return True
+
+    def at(self, line: int):
+        # the region whose first line this is
+        return self.by_start.get(line)
+
+    def enclosing(self, line: int):
+        # the innermost region containing the line. Regions nest, so walking back from
+        # the last one starting at or before the line, the first that reaches it wins
+        i = bisect_right(self.starts, line) - 1
+        while i >= 0:
+            if self.ranges[i][1] >= line:
+                return self.ranges[i]
+            i -= 1
+        return None
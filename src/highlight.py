@@ -0,0 +1,90 @@
+import re
+from functools import lru_cache
+
+from lexer import lex_line, carry_state
+
+
+# Qt free part of the editor's syntax highlighter. Every line is scanned once and
+# turned into non-overlapping (start, length, format name) spans, so the Qt side
+# only has to call setFormat once per span. What kind of line it is comes from the
+# compiler's lexer, so the editor and the preview always agree.
+
+STATE_NORMAL = 0
+STATE_MACRO = 1
+
+PARAM_RE = re.compile(r"^(@[A-Za-z0-9_]+)(\s*:\s*)(.*)$")
+
+# one pattern for all inline formats, the leftmost match wins and at the same
+# position the earlier alternative wins (*** before ** before *). The lookahead
+# lets the regex engine skip plain text without trying every alternative.
+INLINE_RE = re.compile(r"""
+    (?=[*`^,\[(=])
+    (?:
+      (?P<bolditalic>\*\*\*[^*]+?\*\*\*)
+    | (?P<bold>\*\*[^*]+?\*\*)
+    | (?P<italic>\*[^*]+?\*)
+    | (?P<code>`[^`]+?`)
+    | (?P<supersub>\^\^[^\^]+?\^\^|,,[^,]+?,,)
+    | (?P<link_text>\[[^\]]+?\])
+    | (?P<link_url>\([^)]+?\))
+    | (?P<highlight>==[^=]+?==)
+    )
+""", re.VERBOSE)
+
+
+def _overlay(length: int, base_key, inline) -> tuple:
+    # inline spans on top of an optional base format for the whole line
+    spans = []
+    pos = 0
+    for start, end, key in inline:
+        if base_key is not None and start > pos:
+            spans.append((pos, start - pos, base_key))
+        spans.append((start, end - start, key))
+        pos = end
+
+    if base_key is not None and length > pos:
+        spans.append((pos, length - pos, base_key))
+
+    return tuple(spans)
+
+
+@lru_cache(maxsize=65536)
+def highlight_line(text: str, in_macro: bool) -> tuple[tuple, int]:
+    # returns (spans, block state of this line)
+    kind, _, indent = lex_line(text)
+    length = len(text)
+    state = STATE_MACRO if carry_state(kind, in_macro) else STATE_NORMAL
+
+    if in_macro:
+        # the compiler takes everything up to the closing :: as macro content
+        key = "macro_marker" if kind == "MACRO_END" else "macro_inside"
+        return ((0, length, key),), state
+
+    if kind in ("MACRO_START", "MACRO_END"):
+        return ((0, length, "macro_marker"),), state
+
+    if kind == "BLANK":
+        return (), state
+
+    if kind == "COMMENT":
+        return ((0, length, "comment"),), state
+
+    if kind == "META":
+        m = PARAM_RE.match(text)
+        if not m:
+            return (), state
+        key, colon, value = m.groups()
+        start = len(key) + len(colon)
+        return ((0, len(key), "param_key"), (start, len(value), "param_value")), state
+
+    if kind in ("UL_ITEM", "OL_ITEM"):
+        # alternate the colors per nesting level
+        key = "list_lvl2" if (indent // 4) % 2 else "list_lvl1"
+        return ((0, length, key),), state
+
+    if kind == "TABLE_ROW":
+        return ((0, length, "table_value"),), state
+
+    inline = [(m.start(), m.end(), m.lastgroup) for m in INLINE_RE.finditer(text)]
+    base_key = "heading" if kind == "HEADING" else None
+    return _overlay(length, base_key, inline), state
@@ -0,0 +1,127 @@
+import threading
+import time
+from bisect import bisect_right
+from collections import OrderedDict
+
+from ast_nodes import Document, Node, ErrorNode
+from parser import parse_text
+from renderer import Renderer, DEFAULT_RENDERER, render_page, add_line_anchor, render_block_error
+
+
+def block_source(node: Node, lines: list[str]) -> str:
+    return "\n".join(lines[node.start_line - 1:node.end_line])
+
+
+class LastGood:
+    # The html every block had the last time it rendered without errors, one per document.
+    # A block that breaks while it is being edited keeps showing that under its error marker.
+
+    def __init__(self):
+        self.starts = []
+        self.blocks = []        # (start line, end line, html), sorted by start line
+
+    def find(self, start: int, end: int) -> str | None:
+        # top level blocks don't overlap, so walking back from the last one starting
+        # before end, everything up to the first one ending before start overlaps
+        i = bisect_right(self.starts, end) - 1
+        found = []
+        while i >= 0 and self.blocks[i][1] >= start:
+            found.append(self.blocks[i][2])
+            i -= 1
+        return "\n".join(reversed(found)) if found else None
+
+    def update(self, blocks: list[tuple[int, int, str]]):
+        self.blocks = blocks
+        self.starts = [b[0] for b in blocks]
+
+
+class BlockCache:
+    # Keeps the rendered html of every top level block, keyed by the block's source text.
+    # Editing one paragraph of a big document then only re-renders that paragraph.
+
+    def __init__(self, max_blocks: int = 50000, renderer: Renderer | None = None):
+        self.max_blocks = max_blocks
+        self.renderer = renderer if renderer is not None else DEFAULT_RENDERER
+        self.render = self.renderer.render
+        self.blocks: OrderedDict[tuple[str, str], str] = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def render_block(self, node: Node, lines: list[str]) -> str:
+        key = (type(node).__name__, block_source(node, lines))
+
+        with self.lock:
+            cached = self.blocks.get(key)
+            if cached is not None:
+                self.blocks.move_to_end(key)
+                self.hits += 1
+                return cached
+
+        out = self.render(node)
+
+        with self.lock:
+            self.misses += 1
+            self.blocks[key] = out
+            if len(self.blocks) > self.max_blocks:
+                self.blocks.popitem(last=False)
+        return out
+
+    def render_isolated(self, node: Node, lines: list[str], last_good: LastGood | None = None) -> tuple[str, str | None]:
+        # returns (html, html to keep as the block's last good version). A block that
+        # fails to parse or render becomes an error marker, failures are never cached
+        if isinstance(node, ErrorNode):
+            message = node.message
+        else:
+            try:
+                out = self.render_block(node, lines)
+                return out, out
+            except Exception as e:
+                message = f"{type(e).__name__}: {e}"
+
+        kept = last_good.find(node.start_line, node.end_line) if last_good is not None else None
+        return render_block_error(node.start_line, node.end_line, message, kept), kept
+
+    def render_blocks(self, doc: Document, text: str, stats=None, line_index=None,
+                      last_good: LastGood | None = None, budget=None) -> list[str]:
+        # with a line_index every block gets data-line anchors and is added to the index
+        lines = text.splitlines()
+        blocks = []
+        good = []
+        for ch in doc.children:
+            if budget is not None:
+                budget.check(ch.start_line)
+            hits = self.hits
+            start = time.perf_counter()
+            out, kept = self.render_isolated(ch, lines, last_good)
+            if stats is not None:
+                stats.add_node(ch, start, time.perf_counter(), cached=self.hits != hits)
+                if kept is not out:
+                    stats.add_error(ch.start_line, ch.end_line)
+            if kept is not None:
+                good.append((ch.start_line, ch.end_line, kept))
+
+            if line_index is not None:
+                anchored = add_line_anchor(out, ch.start_line, ch.end_line)
+                if anchored is not None:
+                    line_index.add(ch.start_line, ch.end_line)
+                    out = anchored
+            blocks.append(out)
+
+        if last_good is not None:
+            last_good.update(good)
+        return self.renderer.resolve(doc, blocks)
+
+    def render_document(self, doc: Document, text: str, stats=None, line_index=None,
+                        last_good: LastGood | None = None, budget=None) -> str:
+        return render_page(doc, self.render_blocks(doc, text, stats, line_index, last_good, budget))
+
+    def compile(self, text: str, last_good: LastGood | None = None) -> tuple[Document, str]:
+        doc = parse_text(text)
+        return doc, self.render_document(doc, text, last_good=last_good)
+
+    def clear(self):
+        with self.lock:
+            self.blocks.clear()
+        self.hits = 0
+        self.misses = 0
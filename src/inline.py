@@ -1,87 +1,105 @@
 import re
 import html
+from functools import lru_cache
 
-def parse_inline(text: str) -> str:
-    if not text:
-        return ""
+from anchors import escape, ref_placeholder
 
-    code_spans = {}
 
-    def repl_code(m):
-        key = f"__CODE_{len(code_spans)}__"
-        code_spans[key] = f"<code>{html.escape(m.group(1))}</code>"
-        return key
+MATH_SYMBOLS = {
+    "<->": "↔",
+    "->": "→",
+    "=>": "⇒",
+    "<=": "≤",
+    ">=": "≥",
+    "!=": "≠",
+    "+-": "±",
+    "<*>": "×",
+    "--": "–",
+}
 
-    text = re.sub(r'`([^`]+?)`', repl_code, text)
+GREEK = {
+    r"\alpha": "α", r"\beta": "β", r"\gamma": "γ",
+    r"\delta": "δ", r"\epsilon": "ε", r"\zeta": "ζ",
+    r"\eta": "η", r"\theta": "θ", r"\iota": "ι",
+    r"\kappa": "κ", r"\lambda": "λ", r"\mu": "μ",
+    r"\nu": "ν", r"\xi": "ξ", r"\omicron": "ο",
+    r"\pi": "π", r"\rho": "ρ", r"\sigma": "σ",
+    r"\tau": "τ", r"\upsilon": "υ", r"\phi": "φ",
+    r"\chi": "χ", r"\psi": "ψ", r"\omega": "ω",
+}
 
-    MATH_SYMBOLS = {
-        "<->": "↔",
-        "->": "→",
-        "=>": "⇒",
-        "<=": "≤",
-        ">=": "≥",
-        "!=": "≠",
-        "+-": "±",
-        "<*>": "×",
-        "--": "–",
-    }
 
-    for k, v in MATH_SYMBOLS.items():
-        text = text.replace(k, v)
+class InlineRules:
+    # The replacement tables of one compiler plus its own result cache. Every Compiler
+    # gets its own instance, the module level parse_inline uses DEFAULT_INLINE.
 
-    GREEK = {
-        r"\alpha": "α", r"\beta": "β", r"\gamma": "γ",
-        r"\delta": "δ", r"\epsilon": "ε", r"\zeta": "ζ",
-        r"\eta": "η", r"\theta": "θ", r"\iota": "ι",
-        r"\kappa": "κ", r"\lambda": "λ", r"\mu": "μ",
-        r"\nu": "ν", r"\xi": "ξ", r"\omicron": "ο",
-        r"\pi": "π", r"\rho": "ρ", r"\sigma": "σ",
-        r"\tau": "τ", r"\upsilon": "υ", r"\phi": "φ",
-        r"\chi": "χ", r"\psi": "ψ", r"\omega": "ω",
-    }
+    def __init__(self, symbols: dict | None = None, greek: dict | None = None, cache_size: int = 16384):
+        self.symbols = dict(MATH_SYMBOLS if symbols is None else symbols)
+        self.greek = dict(GREEK if greek is None else greek)
+        # the same lines get compiled over and over while typing, so keep the results around
+        self.parse = lru_cache(maxsize=cache_size)(self._parse)
 
-    for k, v in GREEK.items():
-        text = text.replace(k, v)
+    def _parse(self, text: str) -> str:
+        if not text:
+            return ""
 
-    text = html.escape(text)
+        code_spans = {}
 
-    for placeholder, html_code in code_spans.items():
-        text = text.replace(placeholder, html_code)
+        def repl_code(m):
+            key = f"__CODE_{len(code_spans)}__"
+            code_spans[key] = f"<code>{escape(m.group(1))}</code>"
+            return key
 
-    text = re.sub(r'\*\*\*(.+?)\*\*\*',
-                  lambda m: f"<strong><em>{_inline_parse(m.group(1))}</em></strong>",
-                  text, flags=re.S)
+        text = re.sub(r'`([^`]+?)`', repl_code, text)
 
-    text = re.sub(r'\*\*(.+?)\*\*',
-                  lambda m: f"<strong>{_inline_parse(m.group(1))}</strong>",
-                  text, flags=re.S)
+        for k, v in self.symbols.items():
+            text = text.replace(k, v)
 
-    text = re.sub(r'\*(.+?)\*',
-                  lambda m: f"<em>{_inline_parse(m.group(1))}</em>",
-                  text, flags=re.S)
+        for k, v in self.greek.items():
+            text = text.replace(k, v)
 
-    text = re.sub(r'==(.+?)==',
-                  lambda m: f"<mark>{_inline_parse(m.group(1))}</mark>",
-                  text, flags=re.S)
+        text = escape(text)
 
-    text = re.sub(r'\^\^(.+?)\^\^',
-                  lambda m: f"<sup>{_inline_parse(m.group(1))}</sup>",
-                  text, flags=re.S)
+        for placeholder, html_code in code_spans.items():
+            text = text.replace(placeholder, html_code)
 
-    text = re.sub(r',,(.+?),,',
-                  lambda m: f"<sub>{_inline_parse(m.group(1))}</sub>",
-                  text, flags=re.S)
+        text = re.sub(r'\*\*\*(.+?)\*\*\*',
+                      lambda m: f"<strong><em>{_inline_parse(m.group(1))}</em></strong>",
+                      text, flags=re.S)
 
-    def repl_link(m):
-        label = _inline_parse(m.group(1))
-        href = html.escape(m.group(2))
-        if href.strip().lower().startswith("javascript:"):
-            href = "#"
-        return f'<a href="{href}">{label}</a>'
+        text = re.sub(r'\*\*(.+?)\*\*',
+                      lambda m: f"<strong>{_inline_parse(m.group(1))}</strong>",
+                      text, flags=re.S)
 
-    text = re.sub(r'\[([^\]]+)\]\(([^)]+)\)', repl_link, text)
+        text = re.sub(r'\*(.+?)\*',
+                      lambda m: f"<em>{_inline_parse(m.group(1))}</em>",
+                      text, flags=re.S)
 
-    return text
+        text = re.sub(r'==(.+?)==',
+                      lambda m: f"<mark>{_inline_parse(m.group(1))}</mark>",
+                      text, flags=re.S)
+
+        text = re.sub(r'\^\^(.+?)\^\^',
+                      lambda m: f"<sup>{_inline_parse(m.group(1))}</sup>",
+                      text, flags=re.S)
+
+        text = re.sub(r',,(.+?),,',
+                      lambda m: f"<sub>{_inline_parse(m.group(1))}</sub>",
+                      text, flags=re.S)
+
+        def repl_link(m):
+            label = _inline_parse(m.group(1))
+            href = html.escape(m.group(2))
+            if href.strip().lower().startswith("javascript:"):
+                href = "#"
+            elif href.startswith("#") and len(href) > 1:
+                # links to a heading get its real id in the final pass (anchors.py)
+                href = ref_placeholder(html.unescape(href[1:]))
+            return f'<a href="{href}">{label}</a>'
+
+        text = re.sub(r'\[([^\]]+)\]\(([^)]+)\)', repl_link, text)
+
+        return text
 
 def _inline_parse(s: str) -> str:
     
@@ -110,3 +128,7 @@ def _inline_parse(s: str) -> str:
                s, flags=re.S)
 
     return s
+
+
+DEFAULT_INLINE = InlineRules()
+parse_inline = DEFAULT_INLINE.parse
@@ -0,0 +1,60 @@
+import re
+from functools import lru_cache
+
+
+# Line lexer shared by the compiler tokenizer and the editor highlighter. A line is
+# classified once and the result is cached by its text, so when a keystroke changes
+# a line, the highlighter and the next preview compile both reuse the same result.
+
+HEADING_RE = re.compile(r'^\s*#{1,6}\s+')
+UL_RE = re.compile(r'^\s*-\s+')
+OL_RE = re.compile(r'^\s*\d+\.\s+')
+
+
+def count_indent(s: str) -> int:
+    # treat tabs as 4 spaces (Yes, one tab are exactly 4 spaces and no, I won't change my mind)
+    s_expanded = s.replace("\t", " " * 4)
+    return len(s_expanded) - len(s_expanded.lstrip(" "))
+
+
+@lru_cache(maxsize=1 << 17)
+def lex_line(line: str) -> tuple[str, str | None, int]:
+    # returns (token type, token value, indent)
+    indent = count_indent(line)
+    stripped = line.strip()
+
+    if stripped.startswith("//"):
+        return "COMMENT", stripped, indent
+
+    if line.startswith("@"):
+        return "META", line, indent
+
+    if not stripped:
+        return "BLANK", None, indent
+
+    if HEADING_RE.match(line):
+        return "HEADING", stripped, indent
+
+    if stripped.startswith("::") and stripped != "::":
+        return "MACRO_START", stripped, indent
+
+    if stripped == "::":
+        return "MACRO_END", "::", indent
+
+    if UL_RE.match(line):
+        return "UL_ITEM", line.rstrip(), indent
+
+    if OL_RE.match(line):
+        return "OL_ITEM", line.rstrip(), indent
+
+    if stripped.startswith("|"):
+        return "TABLE_ROW", stripped, indent
+
+    return "TEXT", line.rstrip(), indent
+
+
+def carry_state(kind: str, in_macro: bool) -> bool:
+    # whether the next line is inside a macro, the same rule parse_macro follows
+    if in_macro:
+        return kind != "MACRO_END"
+    return kind == "MACRO_START"
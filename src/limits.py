@@ -0,0 +1,95 @@
+import time
+from dataclasses import dataclass
+
+
+# Bounds for compiling documents we don't control (the compile server). The tokenizer,
+# parser and renderer loops call Budget.tick/check, so a compile that runs over its
+# time budget or gets cancelled stops at the next check instead of pinning a worker.
+
+class CompileLimitError(Exception):
+    def __init__(self, limit: str, value, maximum, line: int | None = None):
+        self.limit = limit          # "source_bytes", "depth", "table_cells", "time" or "cancelled"
+        self.value = value
+        self.maximum = maximum
+        self.line = line
+        where = f" at line {line}" if line is not None else ""
+        if limit == "cancelled":
+            message = f"compile cancelled{where}"
+        else:
+            message = f"{limit} limit exceeded{where}: {value} > {maximum}"
+        super().__init__(message)
+
+    def as_dict(self) -> dict:
+        return {
+            "error": str(self),
+            "limit": self.limit,
+            "value": self.value,
+            "maximum": self.maximum,
+            "line": self.line,
+        }
+
+
+@dataclass
+class CompileLimits:
+    # None switches a limit off
+    max_source_bytes: int | None = 16 * 1024 * 1024
+    max_depth: int | None = 32
+    max_table_cells: int | None = 200_000
+    time_budget: float | None = 10.0    # seconds of wall clock per compile
+
+    def start(self, text: str, cancel=None) -> "Budget":
+        # checks the source size up front, cancel is anything with is_set() (threading.Event)
+        maximum = self.max_source_bytes
+        # a character is at most 4 bytes, only encode when the text could be too big
+        if maximum is not None and len(text) * 4 > maximum:
+            size = len(text.encode("utf-8"))
+            if size > maximum:
+                raise CompileLimitError("source_bytes", size, maximum)
+        return Budget(self, cancel)
+
+
+class Budget:
+    # the running state of one compile
+    CHECK_EVERY = 256
+
+    def __init__(self, limits: CompileLimits, cancel=None):
+        self.limits = limits
+        self.cancel = cancel
+        self.started = time.perf_counter()
+        self.deadline = None if limits.time_budget is None else self.started + limits.time_budget
+        self.cells = 0
+        self.ticks = 0
+
+    def check(self, line: int | None = None):
+        if self.cancel is not None and self.cancel.is_set():
+            raise CompileLimitError("cancelled", None, None, line)
+        if self.deadline is not None:
+            now = time.perf_counter()
+            if now > self.deadline:
+                raise CompileLimitError("time", round(now - self.started, 3), self.limits.time_budget, line)
+
+    def tick(self, line: int | None = None):
+        # for tight loops, only every CHECK_EVERY-th call looks at the clock
+        self.ticks += 1
+        if self.ticks % self.CHECK_EVERY == 0:
+            self.check(line)
+
+    def enter(self, depth: int, line: int | None = None):
+        maximum = self.limits.max_depth
+        if maximum is not None and depth > maximum:
+            raise CompileLimitError("depth", depth, maximum, line)
+
+    def add_cells(self, count: int, line: int | None = None):
+        self.cells += count
+        maximum = self.limits.max_table_cells
+        if maximum is not None and self.cells > maximum:
+            raise CompileLimitError("table_cells", self.cells, maximum, line)
+
+
+def start_budget(text: str, limits: CompileLimits | None = None, cancel=None) -> Budget | None:
+    # None when there is nothing to enforce, a cancel event alone runs without limits
+    if limits is None and cancel is None:
+        return None
+    if limits is None:
+        limits = CompileLimits(None, None, None, None)
+    return limits.start(text, cancel)
@@ -0,0 +1,130 @@
+import http.client
+import json
+import math
+import socket
+import threading
+import time
+from urllib.parse import urlsplit
+
+
+SAMPLE_DOCUMENT = """@title: Load test
+@style: default
+
+# Load test
+
+This is a *sample* page with **bold** text, `code`, ==highlights== and \\alpha -> \\omega.
+
+- first item
+- second item
+    - nested item
+
+::box type=info title="Note"
+Some boxed content with ^^super^^ and ,,sub,,.
+::
+
+| Name  | Value |
+|-------|-------|
+| a     | 1     |
+| b     | 2     |
+"""
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: float = 30):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+def make_connection(url: str | None, socket_path: str | None):
+    if socket_path:
+        return UnixHTTPConnection(socket_path)
+    parts = urlsplit(url)
+    return http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = max(0, math.ceil(pct / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+def run_load_test(url: str | None = "http://127.0.0.1:8765", socket_path: str | None = None,
+                  requests: int = 2000, concurrency: int = 16, text: str = SAMPLE_DOCUMENT,
+                  unique: bool = False) -> dict:
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def worker():
+        conn = make_connection(url, socket_path)
+        local_latencies = []
+        local_errors = []
+        while True:
+            with lock:
+                n = next(counter, None)
+            if n is None:
+                break
+
+            # unique bodies defeat the document cache, so this measures the cold path
+            body = json.dumps({"text": f"{text}\n\nrequest {n}" if unique else text})
+            start = time.perf_counter()
+            try:
+                conn.request("POST", "/compile", body, {"Content-Type": "application/json"})
+                response = conn.getresponse()
+                response.read()
+                if response.status != 200:
+                    local_errors.append(response.status)
+            except (OSError, http.client.HTTPException) as e:
+                local_errors.append(str(e))
+                conn.close()
+                conn = make_connection(url, socket_path)
+                continue
+            local_latencies.append((time.perf_counter() - start) * 1000)
+
+        conn.close()
+        with lock:
+            latencies.extend(local_latencies)
+            errors.extend(local_errors)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    wall_start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - wall_start
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "seconds": wall,
+        "rps": len(latencies) / wall if wall else 0.0,
+        "p50_ms": percentile(latencies, 50),
+        "p99_ms": percentile(latencies, 99),
+        "max_ms": latencies[-1] if latencies else 0.0,
+    }
+
+
+def loadtest(url: str | None, socket_path: str | None, requests: int, concurrency: int,
+             path: str | None = None, unique: bool = False) -> int:
+    text = SAMPLE_DOCUMENT
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            text = f.read()
+
+    result = run_load_test(url, socket_path, requests, concurrency, text, unique)
+
+    print(f"[aScript] {result['requests']} requests in {result['seconds']:.2f}s "
+          f"with {concurrency} connections, {result['errors']} errors")
+    print(f"[aScript] {result['rps']:.1f} requests/sec")
+    print(f"[aScript] latency p50 {result['p50_ms']:.2f}ms, p99 {result['p99_ms']:.2f}ms, "
+          f"max {result['max_ms']:.2f}ms")
+    return 1 if result["errors"] else 0
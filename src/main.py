@@ -1,3 +1,6 @@
+import time
+STARTUP_T0 = time.perf_counter()
+
 import sys
 import html
 import traceback
@@ -5,30 +8,43 @@ import tempfile
 import os
 import re
 import webbrowser
-import subprocess, sys
 
 
-from PySide6.QtWebEngineWidgets import QWebEngineView
-from PySide6.QtWebEngineCore import QWebEnginePage
+# QtWebEngine is imported when the preview is created, after the window is on screen
 from PySide6.QtCore import (
-    Qt, QTimer, QUrl, QDir
+    Qt, QTimer, QUrl, QDir, QThread, Signal, QEvent, QObject, Slot, QRect,
+    QPoint
 )
 from PySide6.QtGui import (
-    QFont, QTextCursor, QTextDocument, QShortcut, QKeySequence, 
+    QFont, QTextCursor, QShortcut, QKeySequence, 
     QColor, QSyntaxHighlighter, QTextCharFormat, QIcon, QPixmap,
-    QCursor
+    QCursor, QPainter
 )
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QPlainTextEdit,
     QHBoxLayout, QTabBar, QStackedWidget, QToolButton, QSizePolicy,
     QLabel, QGridLayout, QSplitter, QFileDialog, QDialog, 
-    QLineEdit, QPushButton, QMessageBox
+    QLineEdit, QPushButton, QMessageBox, QCheckBox, QProgressBar, QTabWidget,
+    QDockWidget, QListWidget, QListWidgetItem
 )
 from compiler_api import (
-    render_to_tempfile, 
+    render_preview, 
     cleanup_instance_directory, 
-    export_standalone_html
+    export_standalone_html,
+    set_verbose
 )
+from stats import CompileStats, StatsHistory
+from sourcemap import LineIndex
+from virtual_preview import VIRTUAL_MIN_BLOCKS
+from outline import Outline, headings, display_text
+from folding import FoldMap
+from incremental import LastGood
+import profiling
+from highlight import highlight_line, STATE_MACRO, STATE_NORMAL
+from lexer import lex_line, carry_state
+from search import MatchIndex
+from fileload import read_chunks
+import saving
 
 DEFAULT_PATH = f"{QDir.homePath()}/Documents"
 print(f"[ascript] Default path set to {DEFAULT_PATH}")
@@ -48,6 +64,8 @@ class FindReplaceDialog(QDialog):
 
         self.editor = editor
         self.replace_mode = replace_mode
+        self.index = MatchIndex()
+        self.index_valid = False
 
         self.setWindowTitle("Find & Replace" if replace_mode else "Find")
         self.setWindowModality(Qt.ApplicationModal)
@@ -88,6 +106,21 @@ class FindReplaceDialog(QDialog):
         find_row.addWidget(self.find_edit)
         layout.addLayout(find_row)
 
+        options_row = QHBoxLayout()
+        self.regex_box = QCheckBox("Regex")
+        self.case_box = QCheckBox("Match case")
+        self.case_box.setChecked(True)
+        self.count_label = QLabel("")
+        options_row.addWidget(self.regex_box)
+        options_row.addWidget(self.case_box)
+        options_row.addStretch()
+        options_row.addWidget(self.count_label)
+        layout.addLayout(options_row)
+
+        self.find_edit.textChanged.connect(self.rebuild_index)
+        self.regex_box.toggled.connect(self.rebuild_index)
+        self.case_box.toggled.connect(self.rebuild_index)
+
         if self.replace_mode:
             replace_row = QHBoxLayout()
             replace_row.addWidget(QLabel("Replace:"))
@@ -116,51 +149,123 @@ class FindReplaceDialog(QDialog):
 
         layout.addLayout(btn_row)
 
-    def find_next(self):
-        text = self.find_edit.text()
-        if not text:
+        # keep the index in sync with edits while the dialog is open
+        self.editor.document().contentsChange.connect(self.on_contents_change)
+        self.finished.connect(self.detach)
+
+    def detach(self):
+        try:
+            self.editor.document().contentsChange.disconnect(self.on_contents_change)
+        except (RuntimeError, TypeError):
+            pass
+
+    def document_lines(self, first_block, last_block):
+        block = first_block
+        while block.isValid():
+            yield block.position(), block.text()
+            if block == last_block:
+                break
+            block = block.next()
+
+    def rebuild_index(self):
+        doc = self.editor.document()
+        try:
+            self.index.set_query(self.find_edit.text(), self.regex_box.isChecked(), self.case_box.isChecked())
+        except re.error as e:
+            self.index_valid = False
+            self.count_label.setText(f"Invalid pattern: {e.msg}")
+            return
+
+        self.index.rebuild(self.document_lines(doc.firstBlock(), doc.lastBlock()))
+        self.index_valid = True
+        self.update_count_label()
+
+    def on_contents_change(self, position, removed, added):
+        if not self.index_valid or self.index.pattern is None:
+            return
+
+        doc = self.editor.document()
+        first = doc.findBlock(position)
+        last = doc.findBlock(position + added)
+        if not last.isValid():
+            last = doc.lastBlock()
+
+        delta = added - removed
+        new_end = last.position() + last.length()
+        self.index.update(first.position(), new_end - delta, delta, self.document_lines(first, last))
+        self.update_count_label()
+
+    def update_count_label(self, current: int = -1):
+        n = len(self.index)
+        if not self.find_edit.text():
+            self.count_label.setText("")
+        elif n == 0:
+            self.count_label.setText("No matches")
+        elif current >= 0:
+            self.count_label.setText(f"{current + 1} of {n}")
+        else:
+            self.count_label.setText(f"{n} matches")
+
+    def select_match(self, i: int):
+        if i < 0:
+            self.update_count_label()
             return
+        cursor = self.editor.textCursor()
+        cursor.setPosition(self.index.starts[i])
+        cursor.setPosition(self.index.ends[i], QTextCursor.KeepAnchor)
+        self.editor.setTextCursor(cursor)
+        self.update_count_label(i)
 
-        if not self.editor.find(text):
-            cursor = self.editor.textCursor()
-            cursor.movePosition(QTextCursor.Start)
-            self.editor.setTextCursor(cursor)
-            self.editor.find(text)
+    def find_next(self):
+        if not self.index_valid:
+            return
+        cursor = self.editor.textCursor()
+        self.select_match(self.index.next_after(cursor.selectionEnd()))
 
     def find_prev(self):
-        text = self.find_edit.text()
-        if not text:
+        if not self.index_valid:
             return
-        
-        if not self.editor.find(text, QTextDocument.FindBackward):
-            cursor = self.editor.textCursor()
-            cursor.movePosition(QTextCursor.End)
-            self.editor.setTextCursor(cursor)
-            self.editor.find(text, QTextDocument.FindBackward)
+        cursor = self.editor.textCursor()
+        self.select_match(self.index.prev_before(cursor.selectionStart()))
 
     def replace_one(self):
-        find_text = self.find_edit.text()
-        replace_text = self.replace_edit.text()
+        if not self.index_valid:
+            return
 
         cursor = self.editor.textCursor()
-        selected = cursor.selectedText()
-
-        if selected == find_text:
-            cursor.insertText(replace_text)
-        else:
+        i = self.index.match_at(cursor.selectionStart(), cursor.selectionEnd())
+        if i < 0:
             self.find_next()
-            cursor = self.editor.textCursor()
-            if cursor.selectedText() == find_text:
-                cursor.insertText(replace_text)
+            return
+
+        block = cursor.block()
+        replacement = self.index.replacement(
+            block.text(), cursor.selectionStart() - block.position(), self.replace_edit.text()
+        )
+        cursor.insertText(replacement)
+        self.find_next()
 
     def replace_all(self):
-        find_text = self.find_edit.text()
-        replace_text = self.replace_edit.text()
+        if not self.index_valid or not len(self.index):
+            return
 
-        text = self.editor.toPlainText()
-        new_text = text.replace(find_text, replace_text)
-        self.editor.setPlainText(new_text)
+        # one edit over the lines from the first to the last match: a single undo step,
+        # one contentsChange and the highlighter only redoes those lines
+        doc = self.editor.document()
+        first = doc.findBlock(self.index.starts[0])
+        last = doc.findBlock(self.index.ends[-1])
 
+        cursor = QTextCursor(doc)
+        cursor.setPosition(first.position())
+        cursor.setPosition(last.position() + last.length() - 1, QTextCursor.KeepAnchor)
+        text = cursor.selectedText().replace("\u2029", "\n")
+
+        new_text, count = self.index.replace_lines(text, self.replace_edit.text())
+
+        cursor.beginEditBlock()
+        cursor.insertText(new_text)
+        cursor.endEditBlock()
+        self.count_label.setText(f"Replaced {count}")
 
 
 
@@ -219,7 +324,7 @@ class RibbonGroup(QWidget):
 
 
 class RibbonMenu(QWidget):
-    def __init__(self, file_ops, edit_ops, clipboard_ops, font_ops, export_ops, help_ops):
+    def __init__(self, file_ops, edit_ops, clipboard_ops, font_ops, export_ops, help_ops, tools_ops):
         super().__init__()
 
         self.file_ops = file_ops
@@ -228,13 +333,14 @@ class RibbonMenu(QWidget):
         self.font_ops = font_ops
         self.export_ops = export_ops
         self.help_ops = help_ops
+        self.tools_ops = tools_ops
 
         layout = QVBoxLayout(self)
         layout.setContentsMargins(0, 0, 0, 0)
         layout.setSpacing(0)
 
         self.tab_bar = QTabBar()
-        for tab_name in ["Home", "Export", "Help"]:
+        for tab_name in ["Home", "Export", "Tools", "Help"]:
             self.tab_bar.addTab(tab_name)
         self.tab_bar.setExpanding(False)
         layout.addWidget(self.tab_bar)
@@ -242,15 +348,14 @@ class RibbonMenu(QWidget):
         self.stack = QStackedWidget()
         layout.addWidget(self.stack)
 
-        self.home_tab = self.make_home_tab()
-        self.export_tab = self.make_export_tab()
-        self.help_tab = self.make_help_tab()
+        # only Home is visible at startup, the other tabs are built when first opened
+        self.builders = [self.make_home_tab, self.make_export_tab, self.make_tools_tab, self.make_help_tab]
+        self.built = [False] * len(self.builders)
+        for _ in self.builders:
+            self.stack.addWidget(QWidget())
+        self.show_tab(0)
 
-        self.stack.addWidget(self.home_tab)
-        self.stack.addWidget(self.export_tab)
-        self.stack.addWidget(self.help_tab)
-
-        self.tab_bar.currentChanged.connect(self.stack.setCurrentIndex)
+        self.tab_bar.currentChanged.connect(self.show_tab)
 
         self.setStyleSheet("""
         QTabBar::tab {
@@ -274,6 +379,15 @@ class RibbonMenu(QWidget):
         }
         """)
 
+    def show_tab(self, index: int):
+        if not self.built[index]:
+            placeholder = self.stack.widget(index)
+            self.stack.insertWidget(index, self.builders[index]())
+            self.stack.removeWidget(placeholder)
+            placeholder.deleteLater()
+            self.built[index] = True
+        self.stack.setCurrentIndex(index)
+
     def make_home_tab(self):
         tab = QWidget()
         tab.setObjectName("RibbonContent")
@@ -345,17 +459,48 @@ class RibbonMenu(QWidget):
 
         export_group = RibbonGroup("Export", [
             ["Export File"],
-            ["Export File as PDF"]
+            ["Export File as PDF"],
+            ["Export Folder as PDF"]
         ])
 
         export_group.buttons["Export File"].clicked.connect(self.export_ops["export"])
         export_group.buttons["Export File as PDF"].clicked.connect(self.export_ops["export_pdf"])
+        export_group.buttons["Export Folder as PDF"].clicked.connect(self.export_ops["export_pdf_folder"])
 
         layout.addWidget(export_group)
         layout.addStretch()
         return tab
 
 
+    def make_tools_tab(self):
+        tab = QWidget()
+        tab.setObjectName("RibbonContent")
+
+        layout = QHBoxLayout(tab)
+        layout.setContentsMargins(8, 8, 8, 4)
+        layout.setSpacing(8)
+
+        perf_group = RibbonGroup("Performance", [
+            ["Compile Stats", "Dump Profile"],
+            ["Export Trace"]
+        ])
+
+        perf_group.buttons["Compile Stats"].clicked.connect(self.tools_ops["show_stats"])
+        perf_group.buttons["Export Trace"].clicked.connect(self.tools_ops["export_trace"])
+        perf_group.buttons["Dump Profile"].clicked.connect(self.tools_ops["dump_profile"])
+
+        view_group = RibbonGroup("View", [
+            ["Outline", "Minimap"]
+        ])
+        view_group.buttons["Outline"].clicked.connect(self.tools_ops["toggle_outline"])
+        view_group.buttons["Minimap"].clicked.connect(self.tools_ops["toggle_minimap"])
+
+        layout.addWidget(perf_group)
+        layout.addWidget(view_group)
+        layout.addStretch()
+        return tab
+
+
     def make_help_tab(self):
         tab = QWidget()
         tab.setObjectName("RibbonContent")
@@ -395,9 +540,27 @@ class RibbonMenu(QWidget):
 
 
 class AScriptHighlighter(QSyntaxHighlighter):
+    # lazy mode for big documents: only the blocks around the viewport get formatted
+    # right away, the rest only carries the macro state and is formatted while idle
+    LAZY_MIN_BLOCKS = 20000
+    VIEWPORT_MARGIN = 100
+    IDLE_SLICE_MS = 8
+
     def __init__(self, document):
         super().__init__(document)
 
+        self.lazy = False
+        self.window = (0, -1)       # block numbers that are formatted right away
+        self.forced = False
+        self.pending = None         # (first, last) block numbers waiting for the idle pass
+        self.suspended = False
+
+        self.idle_timer = QTimer()
+        self.idle_timer.setInterval(0)
+        self.idle_timer.timeout.connect(self.idle_step)
+        self.block_count = document.blockCount()
+        document.blockCountChanged.connect(self.on_block_count_changed)
+
         self.colors = {
             "param_key":     QColor("#7CC4FF"),
             "param_value":   QColor("#A9DBFF"),
@@ -436,80 +599,168 @@ class AScriptHighlighter(QSyntaxHighlighter):
             return f
 
         self.formats = {k: fmt(v) for k, v in self.colors.items()}
-        self.param_pattern = re.compile(r"^(@[A-Za-z0-9_]+)(\s*:\s*)(.*)$")
-        self.param_key_format   = self.formats["param_key"]
-        self.param_value_format = self.formats["param_value"]
 
-        self.rules = []
+    def suspend(self):
+        # the tab went into the background, the idle pass waits until it's shown again
+        self.suspended = True
+        self.idle_timer.stop()
+
+    def resume(self):
+        self.suspended = False
+        if self.pending is not None:
+            self.idle_timer.start()
+
+    def set_lazy(self, lazy: bool):
+        self.lazy = lazy
+        self.pending = None
+        self.idle_timer.stop()
+
+    def on_block_count_changed(self, count):
+        # pasting a huge text switches to lazy mode as well
+        if count >= self.LAZY_MIN_BLOCKS:
+            self.lazy = True
+        if self.pending is not None and count > self.block_count:
+            # blocks were inserted, the deferred range moved down
+            first, last = self.pending
+            self.pending = (first, last + count - self.block_count)
+        self.block_count = count
+
+    def set_viewport(self, first: int, last: int):
+        old_first, old_last = self.window
+        first = max(0, first - self.VIEWPORT_MARGIN)
+        last = last + self.VIEWPORT_MARGIN
+        self.window = (first, last)
+        if not self.lazy:
+            return
 
-        self.rules.append((re.compile(r"//.*$"), self.formats["comment"]))
+        # blocks that were already in the window are formatted
+        if old_first <= old_last:
+            if first < old_first:
+                self.rehighlight_range(first, min(last, old_first - 1))
+            if last > old_last:
+                self.rehighlight_range(max(first, old_last + 1), last)
+        else:
+            self.rehighlight_range(first, last)
 
-        self.rules.append((re.compile(r"^#{1,4} .*"), self.formats["heading"]))
+    def rehighlight_range(self, first: int, last: int, budget_ms: float | None = None) -> int:
+        # returns the first block number that was not done (> last when finished)
+        block = self.document().findBlockByNumber(first)
+        number = first
+        deadline = None if budget_ms is None else time.perf_counter() + budget_ms / 1000
 
-        self.rules.append((re.compile(r"\*\*\*[^*]+?\*\*\*"), self.formats["bolditalic"]))
+        self.forced = True
+        try:
+            while block.isValid() and number <= last:
+                self.rehighlightBlock(block)
+                block = block.next()
+                number += 1
+                if deadline is not None and time.perf_counter() > deadline:
+                    break
+        finally:
+            self.forced = False
 
-        self.rules.append((re.compile(r"\*\*[^*]+?\*\*"), self.formats["bold"]))
+        return number if block.isValid() else last + 1
 
-        self.rules.append((re.compile(r"\*[^*]+?\*"), self.formats["italic"]))
+    def refresh_range(self, first: int, last: int):
+        # formats lines that were skipped (folded away), in lazy mode only the
+        # visible part right now and the rest in the idle pass
+        if not self.lazy:
+            self.rehighlight_range(first, last)
+            return
+        w_first, w_last = self.window
+        if max(first, w_first) <= min(last, w_last):
+            self.rehighlight_range(max(first, w_first), min(last, w_last))
+        self.defer(first)
+        self.defer(last)
+
+    def defer(self, number: int):
+        if self.pending is None:
+            self.pending = (number, number)
+        else:
+            first, last = self.pending
+            self.pending = (min(first, number), max(last, number))
+        if not self.suspended and not self.idle_timer.isActive():
+            self.idle_timer.start()
+
+    def idle_step(self):
+        if self.pending is None:
+            self.idle_timer.stop()
+            return
 
-        self.rules.append((re.compile(r"`[^`]+?`"), self.formats["code"]))
+        first, last = self.pending
+        done = self.rehighlight_range(first, last, self.IDLE_SLICE_MS)
+        if done > last:
+            self.pending = None
+            self.idle_timer.stop()
+        else:
+            self.pending = (done, last)
 
-        self.rules.append((re.compile(r"\^\^[^\^]+?\^\^"), self.formats["supersub"]))
-        self.rules.append((re.compile(r",,[^,]+?,,"), self.formats["supersub"]))
+    def highlightBlock(self, text):
+        in_macro = (self.previousBlockState() == STATE_MACRO)
 
-        self.rules.append((re.compile(r"\[[^\]]+?\]"), self.formats["link_text"]))
-        self.rules.append((re.compile(r"\([^)]+?\)"), self.formats["link_url"]))
+        if not self.currentBlock().isVisible():
+            # folded away, only the state is needed. Unfolding rehighlights the lines
+            kind = lex_line(text)[0]
+            self.setCurrentBlockState(STATE_MACRO if carry_state(kind, in_macro) else STATE_NORMAL)
+            return
 
-        self.rules.append((re.compile(r"==[^=]+?=="), self.formats["highlight"]))
+        if self.lazy and not self.forced:
+            number = self.currentBlock().blockNumber()
+            first, last = self.window
+            if not first <= number <= last:
+                # only carry the macro state, the formats follow in the idle pass
+                kind = lex_line(text)[0]
+                self.setCurrentBlockState(STATE_MACRO if carry_state(kind, in_macro) else STATE_NORMAL)
+                self.defer(number)
+                return
 
-        self.rules.append((re.compile(r"^\s*-\s+.+$"), self.formats["list_lvl1"]))
-        self.rules.append((re.compile(r"^\s{4}-\s+.+$"), self.formats["list_lvl2"]))
-        self.rules.append((re.compile(r"^\s*[0-9]+\.\s+.+$"), self.formats["list_lvl1"]))
+        # spans come from the single pass scanner in highlight.py (cached by line text)
+        spans, state = highlight_line(text, in_macro)
 
-        self.rules.append((re.compile(r"^::[A-Za-z0-9_]+"), self.formats["macro_marker"]))
-        self.rules.append((re.compile(r"^::$"), self.formats["macro_marker"]))
+        formats = self.formats
+        for start, length, key in spans:
+            self.setFormat(start, length, formats[key])
 
-        self.rules.append((re.compile(r"^\|(\s*[-A-Za-z0-9 ]+\s*\|)+$"), self.formats["table_header"]))
-        self.rules.append((re.compile(r"^\|.*\|$"), self.formats["table_value"]))
+        self.setCurrentBlockState(state)
 
-    def highlightBlock(self, text):
-        in_macro = (self.previousBlockState() == 1)
 
-        if text.startswith("::") and not text.startswith(":::"):
-            if text.strip() == "::":
-                self.setFormat(0, len(text), self.formats["macro_marker"])
-                self.setCurrentBlockState(0)
-                return
-            else:
-                self.setFormat(0, len(text), self.formats["macro_marker"])
-                self.setCurrentBlockState(1)
-                return
 
-        if in_macro:
-            self.setFormat(0, len(text), self.formats["macro_inside"])
-            if text.strip() == "::":
-                self.setCurrentBlockState(0)
-            else:
-                self.setCurrentBlockState(1)
-            return
+class LineNumberGutter(QWidget):
+    # the painting is done by the editor, it knows the block geometry
+    FOLD_WIDTH = 14
+
+    def __init__(self, editor):
+        super().__init__(editor)
+        self.editor = editor
 
-        self.setCurrentBlockState(0)
+    def paintEvent(self, event):
+        self.editor.paint_gutter(event)
 
-        m = self.param_pattern.match(text)
-        if m:
-            key, colon, value = m.groups()
+    def mousePressEvent(self, event):
+        self.editor.gutter_clicked(int(event.position().y()))
 
-            self.setFormat(0, len(key), self.param_key_format)
 
-            start = len(key) + len(colon)
-            self.setFormat(start, len(value), self.param_value_format)
 
-            return
+class Minimap(QWidget):
+    # one row of LINE_HEIGHT pixels per line and one pixel per character
+    WIDTH = 100
+    LINE_HEIGHT = 2
+
+    def __init__(self, editor):
+        super().__init__(editor)
+        self.editor = editor
+        self.first = 0              # block number of the top row, set while painting
+        self.setCursor(Qt.PointingHandCursor)
 
-        for pattern, fmt in self.rules:
-            for match in pattern.finditer(text):
-                start, end = match.span()
-                self.setFormat(start, end - start, fmt)
+    def paintEvent(self, event):
+        self.editor.paint_minimap(event)
+
+    def mousePressEvent(self, event):
+        self.editor.minimap_clicked(int(event.position().y()))
+
+    def mouseMoveEvent(self, event):
+        if event.buttons() & Qt.LeftButton:
+            self.editor.minimap_clicked(int(event.position().y()))
 
 
 
@@ -528,6 +779,217 @@ class AScriptEditor(QPlainTextEdit):
             }
         """)
 
+        # set by DocumentTab, the gutter shows the fold markers and the minimap
+        # takes its colors and cached spans from the highlighter
+        self.folds = None
+        self.highlighter = None
+
+        self.gutter = LineNumberGutter(self)
+        self.minimap = Minimap(self)
+        self.minimap.hide()
+        self.minimap_enabled = False
+        self.margins = None         # (digits, minimap) the viewport margins were last set for
+
+        self.blockCountChanged.connect(self.update_margins)
+        self.updateRequest.connect(self.on_update_request)
+        self.cursorPositionChanged.connect(self.gutter.update)
+        self.update_margins()
+
+    def gutter_width(self) -> int:
+        digits = len(str(max(1, self.blockCount())))
+        return 10 + self.fontMetrics().horizontalAdvance("9") * digits + LineNumberGutter.FOLD_WIDTH
+
+    def update_margins(self, *_):
+        # the width only changes with the number of digits, not on every new line
+        key = (len(str(max(1, self.blockCount()))), self.minimap_enabled)
+        if key == self.margins:
+            return
+        self.margins = key
+        self.setViewportMargins(self.gutter_width(), 0, Minimap.WIDTH if self.minimap_enabled else 0, 0)
+        self.place_side_widgets()
+
+    def set_minimap_enabled(self, enabled: bool):
+        self.minimap_enabled = enabled
+        self.minimap.setVisible(enabled)
+        self.update_margins()
+
+    def place_side_widgets(self):
+        cr = self.contentsRect()
+        self.gutter.setGeometry(QRect(cr.left(), cr.top(), self.gutter_width(), cr.height()))
+        self.minimap.setGeometry(QRect(cr.right() - Minimap.WIDTH + 1, cr.top(), Minimap.WIDTH, cr.height()))
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.place_side_widgets()
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == QEvent.FontChange:
+            self.margins = None
+            self.update_margins()
+
+    def on_update_request(self, rect, dy):
+        if dy:
+            self.gutter.scroll(0, dy)
+        else:
+            self.gutter.update(0, rect.y(), self.gutter.width(), rect.height())
+
+        # the cursor blink asks for a small rect, the minimap only cares about scrolling and edits
+        if self.minimap_enabled and (dy or rect.contains(self.viewport().rect())):
+            self.minimap.update()
+
+    def iter_visible_blocks(self, block):
+        # visible blocks from block on, a folded region is skipped in one jump
+        doc = self.document()
+        while block.isValid():
+            if not block.isVisible():
+                block = block.next()
+                continue
+            yield block
+            after = block.next()
+            if after.isValid() and not after.isVisible() and self.folds is not None:
+                region = self.folds.at(block.blockNumber() + 1)
+                if region is not None:
+                    after = doc.findBlockByNumber(region[1])
+            block = after
+
+    def paint_gutter(self, event):
+        painter = QPainter(self.gutter)
+        painter.fillRect(event.rect(), QColor("#252526"))
+
+        area = event.rect()
+        height = self.fontMetrics().height()
+        numbers_width = self.gutter.width() - LineNumberGutter.FOLD_WIDTH - 4
+        current = self.textCursor().blockNumber()
+
+        block = self.firstVisibleBlock()
+        top = self.blockBoundingGeometry(block).translated(self.contentOffset()).top()
+
+        for block in self.iter_visible_blocks(block):
+            if top > area.bottom():
+                break
+            block_height = self.blockBoundingRect(block).height()
+            if top + block_height >= area.top():
+                number = block.blockNumber()
+                painter.setPen(QColor("#FFFFFF") if number == current else QColor("#6E7681"))
+                painter.drawText(0, int(top), numbers_width, height, Qt.AlignRight, str(number + 1))
+
+                region = self.folds.at(number + 1) if self.folds is not None else None
+                if region is not None:
+                    painter.setPen(QColor("#8A8A8A"))
+                    marker = "▸" if self.is_folded(number + 1) else "▾"
+                    painter.drawText(numbers_width + 4, int(top), LineNumberGutter.FOLD_WIDTH, height,
+                                     Qt.AlignLeft, marker)
+            top += block_height
+
+        painter.end()
+
+    def gutter_clicked(self, y: int):
+        # a click on a fold marker folds or unfolds the region
+        if self.folds is None:
+            return
+        line = self.cursorForPosition(QPoint(0, y)).block().blockNumber() + 1
+        region = self.folds.at(line)
+        if region is not None:
+            folded = self.is_folded(line)
+            self.set_folded(region[0], region[1], not folded, self.highlighter)
+
+    def paint_minimap(self, event):
+        painter = QPainter(self.minimap)
+        painter.fillRect(event.rect(), QColor("#181818"))
+
+        line_height = Minimap.LINE_HEIGHT
+        rows = max(1, self.minimap.height() // line_height)
+        first, last = self.visible_block_range()
+        total = self.blockCount()
+
+        # the minimap follows the editor, proportionally when the document doesn't fit
+        if total <= rows:
+            start = 0
+        else:
+            start = int(first * (total - rows) / max(1, total - (last - first)))
+            start = max(0, min(start, total - rows))
+        self.minimap.first = start
+
+        colors = self.highlighter.colors if self.highlighter is not None else {}
+        plain = QColor("#5A5A5A")
+        y = 0
+        view_top = view_bottom = None
+        block = self.document().findBlockByNumber(start)
+
+        for block in self.iter_visible_blocks(block):
+            if y >= self.minimap.height():
+                break
+            number = block.blockNumber()
+            if number >= first and view_top is None:
+                view_top = y
+            if number <= last:
+                view_bottom = y + line_height
+
+            text = block.text()
+            stripped = text.lstrip()
+            if stripped:
+                # the same cached spans the highlighter used for this line, no second lexing pass
+                previous = block.previous()
+                in_macro = previous.isValid() and previous.userState() == STATE_MACRO
+                spans, _ = highlight_line(text, in_macro)
+
+                indent = len(text) - len(stripped)
+                painter.fillRect(QRect(indent, y, len(stripped), line_height - 1), plain)
+                for span_start, length, key in spans:
+                    color = colors.get(key)
+                    if color is not None:
+                        painter.fillRect(QRect(span_start, y, length, line_height - 1), color)
+            y += line_height
+
+        if view_top is not None:
+            painter.fillRect(QRect(0, view_top, Minimap.WIDTH, max(line_height, view_bottom - view_top)),
+                             QColor(255, 255, 255, 28))
+        painter.end()
+
+    def minimap_clicked(self, y: int):
+        # centers the editor on the clicked row
+        line = self.minimap.first + y // Minimap.LINE_HEIGHT
+        first, last = self.visible_block_range()
+        self.verticalScrollBar().setValue(max(0, line - (last - first) // 2))
+
+    def is_folded(self, start_line: int) -> bool:
+        block = self.document().findBlockByNumber(start_line)
+        return block.isValid() and not block.isVisible()
+
+    def set_folded(self, start_line: int, end_line: int, folded: bool, highlighter=None):
+        # hides (or shows) the lines after start_line up to end_line, lines are 1-based
+        doc = self.document()
+        block = doc.findBlockByNumber(start_line)
+        if not block.isValid():
+            return
+
+        if folded:
+            # keep the cursor out of the hidden lines
+            cursor = self.textCursor()
+            if start_line <= cursor.blockNumber() < end_line:
+                cursor.setPosition(doc.findBlockByNumber(start_line - 1).position())
+                self.setTextCursor(cursor)
+
+        first_pos = block.position()
+        last = block
+        while block.isValid() and block.blockNumber() < end_line:
+            block.setVisible(not folded)
+            last = block
+            block = block.next()
+
+        doc.markContentsDirty(first_pos, last.position() + last.length() - first_pos)
+        if not folded and highlighter is not None:
+            highlighter.refresh_range(start_line, end_line - 1)
+        self.viewport().update()
+        self.gutter.update()
+        self.minimap.update()
+
+    def visible_block_range(self) -> tuple[int, int]:
+        first = self.firstVisibleBlock().blockNumber()
+        lines = self.viewport().height() // max(1, self.fontMetrics().lineSpacing())
+        return first, first + lines + 1
+
     def keyPressEvent(self, event):
         key = event.key()
         modifiers = event.modifiers()
@@ -611,35 +1073,150 @@ class AScriptEditor(QPlainTextEdit):
 
 
 
+class FileLoader(QThread):
+    # reads a file in the background, the window appends the chunks as they arrive
+    chunk = Signal(str, int, int)
+    failed = Signal(str)
+
+    def __init__(self, path: str, parent=None):
+        super().__init__(parent)
+        self.path = path
+
+    def run(self):
+        try:
+            for text, done, total in read_chunks(self.path):
+                if self.isInterruptionRequested():
+                    return
+                self.chunk.emit(text, done, total)
+        except (OSError, UnicodeDecodeError) as e:
+            self.failed.emit(str(e))
+
+
+
+class PreviewBridge(QObject):
+    # hands the sections of a virtualized preview to the page (see virtual_preview.py)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.sections = []
+
+    @Slot(int, result=str)
+    def section(self, i):
+        if 0 <= i < len(self.sections):
+            return self.sections[i].html
+        return ""
+
+
+
+class DocumentTab:
+    # everything that belongs to one open document. The preview, the web engine
+    # profile and the compiler caches are shared by all tabs of the window.
+
+    def __init__(self, journal=None):
+        self.editor = AScriptEditor()
+        self.highlighter = AScriptHighlighter(self.editor.document())
+        self.current_file = None
+        self.document_modified = False
+        self.fast_mode = False
+        self.loader = None
+        self.journal = journal
+        self.folds = FoldMap()
+        self.last_good = LastGood()
+        self.editor.folds = self.folds
+        self.editor.highlighter = self.highlighter
+
+    def is_blank(self) -> bool:
+        return not self.current_file and not self.document_modified and self.editor.document().isEmpty()
+
+    def title(self) -> str:
+        name = os.path.basename(self.current_file) if self.current_file else "Untitled File"
+        return f"{name} *" if self.document_modified else name
+
+
+
 class MainWindow(QMainWindow):
-    def __init__(self):
+    # files above this open in fast mode: lazy highlighting, no line wrap, slow preview
+    FAST_MODE_BYTES = 8 * 1024 * 1024
+    PREVIEW_DELAY_MS = 150
+    FAST_PREVIEW_DELAY_MS = 2000
+    JOURNAL_FLUSH_MS = 2000
+
+    # the save writer reports back from its thread, the signal brings it to the GUI thread
+    save_finished = Signal(object, str, int, object)
+
+    def __init__(self, startup_clock=None, startup_bench=False):
         super().__init__()
 
+        self.startup_clock = startup_clock
+        self.startup_bench = startup_bench
+        self.first_painted = False
+
         self.setWindowTitle("aScript Studio")
         self.resize(1400, 900)
 
-        self.current_file = None
         self.last_preview_path = None
-        self.document_modified = False
+        self.line_index = LineIndex()
+        self.stats_history = StatsHistory()
+        self.documents = {}     # editor widget -> DocumentTab
+        self.minimap_enabled = False
+
+        # saves and the recovery journal are written by a background thread
+        self.saver = saving.SaveWriter()
+        self.saver.start()
+        self.session = saving.new_session()
+        self.journal_count = 0
+        self.save_finished.connect(self.on_save_finished)
+
+        self.journal_timer = QTimer()
+        self.journal_timer.setInterval(self.JOURNAL_FLUSH_MS)
+        self.journal_timer.timeout.connect(self.flush_journals)
+        self.journal_timer.start()
+
+        self._pdf_service = None
 
         splitter = QSplitter(Qt.Horizontal)
 
-        self.editor = AScriptEditor()
-        self.highlighter = AScriptHighlighter(self.editor.document())
-        self.preview = QWebEngineView()
-        self.preview.setContextMenuPolicy(Qt.NoContextMenu)
+        self.tabs = QTabWidget()
+        self.tabs.setTabsClosable(True)
+        self.tabs.setMovable(True)
+        self.tabs.setDocumentMode(True)
+        self.tabs.setStyleSheet("""
+            QTabBar::tab {
+                background: #2B2B2B;
+                color: #BBBBBB;
+                padding: 5px 12px;
+                border: none;
+            }
+            QTabBar::tab:selected {
+                background: #1e1e1e;
+                color: #FFFFFF;
+            }
+        """)
+        # stands in for the preview until the window has been painted once
+        self.preview = None
+        self.preview_placeholder = QWidget()
+        self.preview_placeholder.setStyleSheet("background: #1e1e1e;")
 
-        splitter.addWidget(self.editor)
-        splitter.addWidget(self.preview)
+        splitter.addWidget(self.tabs)
+        splitter.addWidget(self.preview_placeholder)
         splitter.setSizes([750, 650])
+        self.splitter = splitter
 
+        # only the visible tab compiles, hidden tabs catch up when they are shown again
         self.update_timer = QTimer()
-        self.update_timer.setInterval(150)
+        self.update_timer.setInterval(self.PREVIEW_DELAY_MS)
         self.update_timer.setSingleShot(True)
-        self.editor.textChanged.connect(lambda: self.update_timer.start())
         self.update_timer.timeout.connect(self.update_preview)
 
-        self.editor.textChanged.connect(self.on_text_changed)
+        # the preview follows the editor, at most once per frame
+        self.scroll_sync_timer = QTimer()
+        self.scroll_sync_timer.setInterval(16)
+        self.scroll_sync_timer.setSingleShot(True)
+        self.scroll_sync_timer.timeout.connect(self.sync_preview_scroll)
+
+        self.add_document()
+        self.tabs.currentChanged.connect(self.on_tab_changed)
+        self.tabs.tabCloseRequested.connect(self.close_tab)
 
         file_ops = {
             "save": self.save_file,
@@ -672,13 +1249,21 @@ class MainWindow(QMainWindow):
         export_ops = {
             "export": self.export_file,
             "export_pdf": self.export_file_to_pdf,
+            "export_pdf_folder": self.export_folder_to_pdf,
         }
         help_ops = {
             "show_about": self.show_about,
             "show_license": self.show_license
         }
+        tools_ops = {
+            "show_stats": self.show_compile_stats,
+            "export_trace": self.export_trace,
+            "dump_profile": self.dump_profile,
+            "toggle_outline": self.toggle_outline,
+            "toggle_minimap": self.toggle_minimap,
+        }
 
-        self.ribbon = RibbonMenu(file_ops, edit_ops, clipboard_ops, font_ops, export_ops, help_ops)
+        self.ribbon = RibbonMenu(file_ops, edit_ops, clipboard_ops, font_ops, export_ops, help_ops, tools_ops)
         self.setMenuWidget(self.ribbon)
 
         container = QWidget()
@@ -687,12 +1272,40 @@ class MainWindow(QMainWindow):
         layout.addWidget(splitter)
         self.setCentralWidget(container)
 
-        self.setup_shortcuts()
+        # outline of the current tab, fed by the preview compile
+        self.outline = Outline()
+        self.outline_list = QListWidget()
+        self.outline_list.setStyleSheet("""
+            QListWidget {
+                background: #1e1e1e;
+                color: #eeeeee;
+                border: none;
+            }
+            QListWidget::item:selected {
+                background: #8f0000;
+            }
+        """)
+        self.outline_list.itemActivated.connect(self.jump_to_heading)
+        self.outline_list.itemClicked.connect(self.jump_to_heading)
+        self.outline_dock = QDockWidget("Outline", self)
+        self.outline_dock.setObjectName("OutlineDock")
+        self.outline_dock.setWidget(self.outline_list)
+        self.addDockWidget(Qt.LeftDockWidgetArea, self.outline_dock)
+        self.outline_dock.hide()
+
+        self.load_progress = QProgressBar()
+        self.load_progress.setMaximumWidth(240)
+        self.load_progress.setTextVisible(True)
+        self.load_progress.hide()
+        self.statusBar().addPermanentWidget(self.load_progress)
 
-        self.update_preview()
+        self.setup_shortcuts()
 
         self.update_window_title()
 
+        self.editor.viewport().installEventFilter(self)
+        self.startup_mark("window built")
+
         
 
 
@@ -714,6 +1327,12 @@ class MainWindow(QMainWindow):
             QShortcut(QKeySequence("Ctrl+F"), self, activated=self.open_find_dialog)
             QShortcut(QKeySequence("Ctrl+Shift+F"), self, activated=self.open_find_replace_dialog)
 
+            QShortcut(QKeySequence("Ctrl+Shift+L"), self, activated=self.sync_editor_scroll)
+            QShortcut(QKeySequence("Ctrl+Shift+O"), self, activated=self.toggle_outline)
+            QShortcut(QKeySequence("Ctrl+Shift+["), self, activated=self.fold_at_cursor)
+            QShortcut(QKeySequence("Ctrl+Shift+]"), self, activated=self.unfold_at_cursor)
+            QShortcut(QKeySequence("Ctrl+Shift+0"), self, activated=self.unfold_all)
+
             QShortcut(QKeySequence("Ctrl+E"), self, activated=self.export_file)
             QShortcut(QKeySequence("Ctrl+Shift+E"), self, activated=self.export_file_to_pdf)
 
@@ -721,13 +1340,300 @@ class MainWindow(QMainWindow):
         cursor = self.editor.textCursor()
         cursor.insertText(text)
 
-    def on_text_changed(self):
-        self.document_modified = True
+    def startup_mark(self, name: str):
+        if self.startup_clock is not None:
+            self.startup_clock.mark(name)
+
+    def eventFilter(self, obj, event):
+        if not self.first_painted and event.type() == QEvent.Paint:
+            self.first_painted = True
+            obj.removeEventFilter(self)
+            self.startup_mark("first paint")
+            # everything heavy happens once the editor is on screen and usable
+            QTimer.singleShot(0, self.create_preview)
+            if not self.startup_bench:
+                QTimer.singleShot(0, self.offer_recovery)
+        return super().eventFilter(obj, event)
+
+    def create_preview(self):
+        from PySide6.QtWebEngineWidgets import QWebEngineView
+
+        from PySide6.QtWebChannel import QWebChannel
+
+        self.preview = QWebEngineView()
+        self.preview.setContextMenuPolicy(Qt.NoContextMenu)
+
+        # the channel stays with the page across reloads
+        self.preview_bridge = PreviewBridge(self)
+        self.preview_channel = QWebChannel(self.preview.page())
+        self.preview_channel.registerObject("preview", self.preview_bridge)
+        self.preview.page().setWebChannel(self.preview_channel)
+        self.preview.loadFinished.connect(self.on_first_preview_loaded)
+        # a reload keeps the preview where the editor is instead of jumping to the top
+        self.preview.loadFinished.connect(lambda ok: self.sync_preview_scroll())
+
+        sizes = self.splitter.sizes()
+        self.splitter.replaceWidget(1, self.preview)
+        self.preview_placeholder.deleteLater()
+        self.splitter.setSizes(sizes)
+        self.startup_mark("preview created")
+
+        self.update_preview()
+
+    def on_first_preview_loaded(self, ok):
+        self.preview.loadFinished.disconnect(self.on_first_preview_loaded)
+        self.startup_mark("first preview")
+        if self.startup_clock is not None:
+            print(self.startup_clock.format_report())
+        if self.startup_bench:
+            QTimer.singleShot(0, self.close)
+
+    @property
+    def pdf_service(self):
+        # QtWebEngine pages are only started for the first export
+        if self._pdf_service is None:
+            from pdf_export import PdfExportService
+            # one warm off-screen page for single exports, up to four for folders
+            self._pdf_service = PdfExportService(max_pages=4, parent=self)
+            self._pdf_service.job_finished.connect(self.on_pdf_exported)
+        return self._pdf_service
+
+    @property
+    def current(self) -> DocumentTab:
+        return self.documents[self.tabs.currentWidget()]
+
+    @property
+    def editor(self) -> AScriptEditor:
+        return self.current.editor
+
+    @property
+    def highlighter(self) -> AScriptHighlighter:
+        return self.current.highlighter
+
+    @property
+    def current_file(self):
+        return self.current.current_file
+
+    @current_file.setter
+    def current_file(self, path):
+        self.current.current_file = path
+
+    @property
+    def document_modified(self) -> bool:
+        return self.current.document_modified
+
+    @document_modified.setter
+    def document_modified(self, modified: bool):
+        self.current.document_modified = modified
+
+    def add_document(self) -> DocumentTab:
+        self.journal_count += 1
+        tab = DocumentTab(saving.RecoveryJournal(self.saver, self.session, self.journal_count))
+        tab.journal.rebase(text="")
+
+        editor = tab.editor
+        editor.set_minimap_enabled(self.minimap_enabled)
+        editor.textChanged.connect(lambda: self.on_text_changed(tab))
+        editor.updateRequest.connect(lambda rect, dy: tab.highlighter.set_viewport(*editor.visible_block_range()))
+        editor.document().contentsChange.connect(lambda pos, removed, added: self.journal_edit(tab, pos, removed, added))
+        editor.verticalScrollBar().valueChanged.connect(lambda value: self.on_editor_scrolled(tab))
+
+        self.documents[editor] = tab
+        self.tabs.setCurrentIndex(self.tabs.addTab(editor, tab.title()))
+        return tab
+
+    def find_document(self, path: str) -> DocumentTab | None:
+        path = os.path.abspath(path)
+        for tab in self.documents.values():
+            if tab.current_file and os.path.abspath(tab.current_file) == path:
+                return tab
+        return None
+
+    def on_tab_changed(self, index: int):
+        if index < 0:
+            return
+
+        tab = self.current
+        for other in self.documents.values():
+            if other is not tab:
+                other.highlighter.suspend()
+        tab.highlighter.resume()
+
+        self.update_timer.stop()
+        self.update_timer.setInterval(self.FAST_PREVIEW_DELAY_MS if tab.fast_mode else self.PREVIEW_DELAY_MS)
+        self.update_window_title()
+        self.update_highlight_viewport()
+        self.update_preview()
+
+    def close_tab(self, index: int):
+        editor = self.tabs.widget(index)
+        tab = self.documents[editor]
+        if tab.loader is not None:
+            return
+
+        self.tabs.setCurrentIndex(index)
+        if not self.maybe_save():
+            return
+
+        # removing the current tab switches to another one, keep it from compiling
+        # the closing tab first
+        self.tabs.blockSignals(True)
+        self.tabs.removeTab(index)
+        self.tabs.blockSignals(False)
+        del self.documents[editor]
+        tab.journal.discard()
+        editor.deleteLater()
+
+        if not self.documents:
+            self.add_document()
+        self.on_tab_changed(self.tabs.currentIndex())
+
+    def update_highlight_viewport(self):
+        self.highlighter.set_viewport(*self.editor.visible_block_range())
+
+    def fold_at_cursor(self):
+        line = self.editor.textCursor().blockNumber() + 1
+        region = self.current.folds.enclosing(line)
+        if region is not None:
+            self.editor.set_folded(region[0], region[1], True)
+
+    def unfold_at_cursor(self):
+        line = self.editor.textCursor().blockNumber() + 1
+        region = self.current.folds.at(line) or self.current.folds.enclosing(line)
+        if region is not None:
+            self.editor.set_folded(region[0], region[1], False, self.highlighter)
+
+    def unfold_all(self):
+        count = self.editor.document().blockCount()
+        self.editor.set_folded(1, count, False, self.highlighter)
+
+    def toggle_outline(self):
+        self.outline_dock.setVisible(not self.outline_dock.isVisible())
+
+    def toggle_minimap(self):
+        self.minimap_enabled = not self.minimap_enabled
+        for tab in self.documents.values():
+            tab.editor.set_minimap_enabled(self.minimap_enabled)
+
+    def update_outline(self, doc):
+        # only the rows of headings that changed are touched
+        entries = headings(doc)
+        opcodes, moved = self.outline.update(entries)
+        lst = self.outline_list
+
+        for tag, i1, i2, j1, j2 in reversed(opcodes):
+            for _ in range(i2 - i1):
+                lst.takeItem(i1)
+            for j in range(j1, j2):
+                item = QListWidgetItem(display_text(entries[j]))
+                item.setData(Qt.UserRole, entries[j][2])
+                lst.insertItem(i1 + (j - j1), item)
+
+        for j, line in moved:
+            lst.item(j).setData(Qt.UserRole, line)
+
+    def jump_to_heading(self, item):
+        block = self.editor.document().findBlockByNumber(item.data(Qt.UserRole) - 1)
+        if not block.isValid():
+            return
+        cursor = self.editor.textCursor()
+        cursor.setPosition(block.position())
+        self.editor.setTextCursor(cursor)
+        self.editor.centerCursor()
+        self.editor.setFocus()
+
+    def on_editor_scrolled(self, tab: DocumentTab):
+        if tab is self.current and not self.scroll_sync_timer.isActive():
+            self.scroll_sync_timer.start()
+
+    def sync_preview_scroll(self):
+        if self.preview is None or not len(self.line_index):
+            return
+        line = self.editor.firstVisibleBlock().blockNumber() + 1
+        block, fraction = self.line_index.block_at(line)
+        self.preview.page().runJavaScript(
+            f"window.ascrScrollToBlock && window.ascrScrollToBlock({block}, {fraction:.4f});"
+        )
+
+    def sync_editor_scroll(self):
+        # the other direction: scroll the editor to the block at the top of the preview
+        if self.preview is None or not len(self.line_index):
+            return
+
+        def scroll_to(result):
+            if not result:
+                return
+            line = self.line_index.line_at(int(result[0]), float(result[1]))
+            block = self.editor.document().findBlockByNumber(line - 1)
+            if block.isValid():
+                self.editor.verticalScrollBar().setValue(block.firstLineNumber())
+
+        self.preview.page().runJavaScript("window.ascrTopBlock ? window.ascrTopBlock() : null;", 0, scroll_to)
+
+    def journal_edit(self, tab: DocumentTab, pos: int, removed: int, added: int):
+        if tab.loader is not None:
+            # the journal starts over from the file once it's loaded
+            return
+
+        inserted = ""
+        if added:
+            doc = tab.editor.document()
+            cursor = QTextCursor(doc)
+            cursor.setPosition(pos)
+            cursor.setPosition(min(pos + added, doc.characterCount() - 1), QTextCursor.KeepAnchor)
+            inserted = cursor.selectedText().replace("\u2029", "\n")
+        tab.journal.record(pos, removed, inserted)
+
+    def flush_journals(self):
+        for tab in self.documents.values():
+            if tab.journal.needs_compaction():
+                # a long session, start the journal over from the current text
+                tab.journal.rebase(tab.current_file, tab.editor.toPlainText())
+            else:
+                tab.journal.flush()
+        saving.touch_heartbeat(self.session)
+
+    def offer_recovery(self):
+        journals = saving.find_crashed_journals(self.session)
+        if not journals:
+            return
+
+        answer = QMessageBox.question(
+            self, "Restore Documents",
+            f"aScript Studio was not closed properly. Restore {len(journals)} unsaved document(s)?",
+            QMessageBox.Yes | QMessageBox.No, QMessageBox.Yes
+        )
+        if answer == QMessageBox.Yes:
+            for path in journals:
+                try:
+                    file, text = saving.replay_journal(path)
+                except (OSError, ValueError, KeyError) as e:
+                    print(f"[aScript] Warning: could not restore {path}: {e}")
+                    continue
+                self.restore_document(file, text)
+
+        for path in journals:
+            saving.discard_journal(path)
+
+    def restore_document(self, file: str | None, text: str):
+        tab = self.current if self.current.is_blank() else self.add_document()
+        tab.editor.setPlainText(text)
+        tab.current_file = file
+        tab.document_modified = True
+        tab.journal.rebase(file, text)
         self.update_window_title()
 
+    def on_text_changed(self, tab: DocumentTab):
+        tab.document_modified = True
+        if tab is self.current:
+            self.update_timer.start()
+            self.update_window_title()
+
 
     def update_window_title(self):
         base = "aScript Studio"
+        self.tabs.setTabText(self.tabs.currentIndex(), self.current.title())
+        self.tabs.setTabToolTip(self.tabs.currentIndex(), self.current_file or "")
 
         if not self.current_file:
             if self.document_modified:
@@ -764,7 +1670,7 @@ class MainWindow(QMainWindow):
             result = msg.exec()
 
             if result == QMessageBox.Save:
-                return self.save_file()
+                return self.save_file(wait=True)
 
             if result == QMessageBox.Discard:
                 return True
@@ -773,44 +1679,165 @@ class MainWindow(QMainWindow):
 
 
     def new_file(self):
-        subprocess.Popen([sys.executable, sys.argv[0]])
+        self.add_document()
 
-    def save_file(self):
+    def save_file(self, wait: bool = False) -> bool:
         if not self.current_file:
-            return self.save_file_as()
+            return self.save_file_as(wait)
 
-        with open(self.current_file, "w", encoding="utf8") as f:
-            f.write(self.editor.toPlainText())
+        # the text is copied here, writing it happens on the save thread
+        tab = self.current
+        path = tab.current_file
+        revision = tab.editor.document().revision()
 
-        self.document_modified = False
-        self.update_window_title()
+        # the journal keeps its old base until the file is on disk (on_save_finished)
+        job = self.saver.save(
+            path, tab.editor.toPlainText(),
+            lambda job: self.save_finished.emit(tab, path, revision, job.error)
+        )
+        if not wait:
+            self.statusBar().showMessage(f"Saving {os.path.basename(path)}...")
+            return True
+
+        # closing the window or a tab, that has to know whether it worked
+        job.finished.wait()
+        self.on_save_finished(tab, path, revision, job.error)
+        return job.error is None
 
-    def save_file_as(self):
+    def save_file_as(self, wait: bool = False) -> bool:
         path, _ = QFileDialog.getSaveFileName(
             self, "Save aScript", DEFAULT_PATH, "aScript (*.ascr *.ascript)"
         )
         if not path:
-            return
+            return False
         self.current_file = path
-        self.save_file()
+        return self.save_file(wait)
 
+    def on_save_finished(self, tab: DocumentTab, path: str, revision: int, error):
+        if tab.editor not in self.documents:
+            return
 
-    def open_file(self):
-        if not self.maybe_save():
+        if error:
+            # the journal points at a file that didn't get written, base it on the text instead
+            tab.journal.rebase(tab.current_file, tab.editor.toPlainText())
+            QMessageBox.critical(self, "Save failed", f"Could not save {path}:\n{error}")
             return
 
+        if tab.current_file == path and tab.editor.document().revision() == revision:
+            tab.document_modified = False
+            tab.journal.rebase(path)
+        else:
+            # edited (or saved as something else) while the save ran, the file doesn't
+            # hold the current text, so the journal keeps it in full
+            tab.journal.rebase(tab.current_file, tab.editor.toPlainText())
+        self.statusBar().showMessage(f"Saved {os.path.basename(path)}", 3000)
+        if tab is self.current:
+            self.update_window_title()
+
+
+    def open_file(self):
         path, _ = QFileDialog.getOpenFileName(
             self, "Open aScript", DEFAULT_PATH, "aScript (*.ascr *.ascript)"
         )
         if not path:
             return
 
-        self.current_file = path
-        with open(path, "r", encoding="utf8") as f:
-            self.editor.setPlainText(f.read())
+        self.load_file(path)
 
-        self.document_modified = False
-        self.update_window_title()
+    def load_file(self, path: str):
+        if any(tab.loader is not None for tab in self.documents.values()):
+            self.statusBar().showMessage("Another file is still loading", 3000)
+            return
+
+        existing = self.find_document(path)
+        if existing is not None:
+            self.tabs.setCurrentWidget(existing.editor)
+            return
+
+        try:
+            size = os.path.getsize(path)
+        except OSError as e:
+            QMessageBox.critical(self, "Open failed", str(e))
+            return
+
+        # an untouched empty tab is reused, everything else opens next to it
+        tab = self.current if self.current.is_blank() else self.add_document()
+        tab.current_file = path
+        self.set_fast_mode(tab, size >= self.FAST_MODE_BYTES)
+
+        # the document is filled chunk by chunk with signals blocked, so nothing
+        # recompiles or marks the file modified until the last chunk is in
+        editor = tab.editor
+        self.update_timer.stop()
+        editor.setReadOnly(True)
+        editor.blockSignals(True)
+        editor.document().setUndoRedoEnabled(False)
+        editor.clear()
+        tab.highlighter.window = (0, -1)
+
+        self.load_progress.setRange(0, 1000)
+        self.load_progress.setValue(0)
+        self.load_progress.show()
+        self.statusBar().showMessage(f"Loading {os.path.basename(path)}...")
+
+        tab.loader = FileLoader(path, self)
+        tab.loader.chunk.connect(lambda text, done, total: self.append_loaded_chunk(tab, text, done, total))
+        tab.loader.failed.connect(lambda message: self.on_load_failed(tab, message))
+        tab.loader.finished.connect(lambda: self.on_load_finished(tab))
+        tab.loader.start()
+
+    def set_fast_mode(self, tab: DocumentTab, fast: bool):
+        tab.fast_mode = fast
+        tab.highlighter.set_lazy(fast)
+        tab.editor.setLineWrapMode(QPlainTextEdit.NoWrap if fast else QPlainTextEdit.WidgetWidth)
+        if tab is self.current:
+            self.update_timer.setInterval(self.FAST_PREVIEW_DELAY_MS if fast else self.PREVIEW_DELAY_MS)
+
+    def append_loaded_chunk(self, tab: DocumentTab, text: str, done: int, total: int):
+        editor = tab.editor
+        cursor = QTextCursor(editor.document())
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertText(text)
+
+        if total:
+            self.load_progress.setValue(int(done * 1000 / total))
+        if tab.highlighter.window == (0, -1):
+            # the first chunk is in, format what's on screen
+            tab.highlighter.set_viewport(*editor.visible_block_range())
+
+    def on_load_failed(self, tab: DocumentTab, message: str):
+        QMessageBox.critical(self, "Open failed", message)
+        tab.current_file = None
+        tab.editor.clear()
+
+    def on_load_finished(self, tab: DocumentTab):
+        tab.loader.deleteLater()
+        tab.loader = None
+
+        editor = tab.editor
+        doc = editor.document()
+        doc.setUndoRedoEnabled(True)
+        editor.blockSignals(False)
+        editor.setReadOnly(False)
+        editor.moveCursor(QTextCursor.Start)
+        # blockCountChanged was blocked for the whole load, size the gutter for the line count now
+        editor.update_margins()
+        editor.viewport().update()
+        editor.gutter.update()
+        editor.minimap.update()
+
+        self.load_progress.hide()
+        mode = " (fast mode)" if tab.fast_mode else ""
+        self.statusBar().showMessage(f"Loaded {doc.blockCount()} lines{mode}", 5000)
+
+        tab.highlighter.set_viewport(*editor.visible_block_range())
+        tab.document_modified = False
+        tab.journal.rebase(tab.current_file)
+
+        # first compile only once everything is loaded, and only if it's on screen
+        if tab is self.current:
+            self.update_window_title()
+            self.update_preview()
 
 
     def export_file(self):
@@ -828,36 +1855,39 @@ class MainWindow(QMainWindow):
     def export_file_to_pdf(self):
         text = self.editor.toPlainText()
 
-        outfile, _ = QFileDialog.getSaveFileName(
+        pdf_path, _ = QFileDialog.getSaveFileName(
             self,
-            "Export HTML for PDF conversion",
-            f"{DEFAULT_PATH}/output.html",
-            "HTML Files (*.html)"
+            "Export PDF",
+            f"{DEFAULT_PATH}/output.pdf",
+            "PDF Files (*.pdf)"
         )
 
-        if not outfile:
+        if not pdf_path:
             return
 
-        export_standalone_html(text, outfile)
+        self.pdf_service.submit_source(text, pdf_path)
+        self.statusBar().showMessage(f"Exporting {os.path.basename(pdf_path)}...")
 
-        pdf_path = outfile.replace(".html", ".pdf")
-        self.convert_to_pdf(outfile, pdf_path)
-
-    def convert_to_pdf(self, html_path: str, pdf_path: str):
-        page = QWebEnginePage()
+    def export_folder_to_pdf(self):
+        src_dir = QFileDialog.getExistingDirectory(self, "Folder with aScript files", DEFAULT_PATH)
+        if not src_dir:
+            return
+        out_dir = QFileDialog.getExistingDirectory(self, "Save PDFs to", src_dir)
+        if not out_dir:
+            return
 
-        def handle_load_finished(ok):
-            if not ok:
-                print("[aScript] Failed to load HTML for PDF export.")
-                return
+        count = self.pdf_service.export_folder(src_dir, out_dir)
+        self.statusBar().showMessage(f"Exporting {count} file(s) to PDF...")
 
-            page.printToPdf(pdf_path)
-            print(f"[aScript] PDF exported successfully → {pdf_path}")
+    def on_pdf_exported(self, pdf_path: str, ok: bool, error: str):
+        name = os.path.basename(pdf_path)
+        pending = self._pdf_service.pending()
+        left = f", {pending} left" if pending else ""
+        if ok:
+            self.statusBar().showMessage(f"Exported {name}{left}", 5000)
+        else:
+            self.statusBar().showMessage(f"Export of {name} failed: {error}{left}", 10000)
 
-        url = QUrl.fromLocalFile(os.path.abspath(html_path))
-        page.loadFinished.connect(handle_load_finished)
-        page.load(url)
-    
     def undo(self):
         self.editor.undo()
 
@@ -958,12 +1988,31 @@ class MainWindow(QMainWindow):
 
 
     def update_preview(self):
+        with profiling.stage("update_preview"):
+            self._update_preview()
+
+    def _update_preview(self):
+        if self.preview is None or self.current.loader is not None:
+            # compiles once the preview exists and the file is completely loaded
+            return
+
         source = self.editor.toPlainText()
 
         try:
-            out_path = render_to_tempfile(source)
+            stats = CompileStats()
+            preview = render_preview(source, stats, VIRTUAL_MIN_BLOCKS, self.current.last_good)
+            out_path = preview.path
+            self.line_index = preview.line_index
+            self.preview_bridge.sections = preview.sections or []
+            self.stats_history.add(stats)
+            self.update_outline(preview.doc)
+            if self.current.folds.update(preview.doc):
+                self.editor.gutter.update()
             self.last_preview_path = out_path
             self.preview.setUrl(QUrl.fromLocalFile(out_path))
+            if stats.errors:
+                lines = ", ".join(f"{a}-{b}" if a != b else str(a) for a, b in stats.errors[:5])
+                self.statusBar().showMessage(f"{len(stats.errors)} block(s) could not be rendered (lines {lines})", 5000)
 
         except Exception as e:
             safe_tb = self.sanitize_traceback(e)
@@ -1001,6 +2050,60 @@ class MainWindow(QMainWindow):
             self.preview.setHtml(error_html)
 
 
+    def show_compile_stats(self):
+        dlg = QDialog(self)
+        dlg.setWindowTitle("Compile Stats")
+        dlg.resize(620, 640)
+
+        layout = QVBoxLayout(dlg)
+        report = QPlainTextEdit(dlg)
+        report.setReadOnly(True)
+        report.setFont(QFont("JetBrains Mono", 10))
+        report.setPlainText(self.stats_history.format_report())
+        layout.addWidget(report)
+
+        refresh_btn = QPushButton("Refresh")
+        refresh_btn.clicked.connect(lambda: report.setPlainText(self.stats_history.format_report()))
+        layout.addWidget(refresh_btn)
+
+        dlg.show()
+
+    def export_trace(self):
+        if self.stats_history.last is None:
+            QMessageBox.information(self, "Export Trace", "There is no compile to export yet.")
+            return
+
+        path, _ = QFileDialog.getSaveFileName(
+            self, "Export Trace", f"{DEFAULT_PATH}/compile_trace.json", "Trace Files (*.json)"
+        )
+        if not path:
+            return
+
+        self.stats_history.last.write_trace(path)
+        print(f"[aScript] Trace exported to {path}")
+
+    def dump_profile(self):
+        profiler = profiling.active()
+        session = profiler is not None
+
+        if not session:
+            # not started with --profile, profile one compile of the current document
+            profiler = profiling.enable()
+            try:
+                self.update_preview()
+                paths = profiler.dump()
+            finally:
+                profiling.disable()
+        else:
+            paths = profiler.dump()
+
+        QMessageBox.information(
+            self,
+            "Dump Profile",
+            ("Profile of this session" if session else "Profile of the current document")
+            + " written to:\n\n" + "\n".join(paths.values())
+        )
+
     def show_license(self):
         dlg = QDialog(self)
         dlg.setWindowTitle("License")
@@ -1177,8 +2280,27 @@ is licensed under the <b>LGPLv3</b>, which allows dynamic linking in your applic
         dlg.exec()
 
 
+    def maybe_save_all(self) -> bool:
+        for tab in list(self.documents.values()):
+            if tab.document_modified:
+                self.tabs.setCurrentWidget(tab.editor)
+                if not self.maybe_save():
+                    return False
+        return True
+
     def closeEvent(self, event):
-        if self.maybe_save():
+        if self.maybe_save_all():
+            for tab in self.documents.values():
+                if tab.loader is not None:
+                    tab.loader.requestInterruption()
+                    tab.loader.wait()
+
+            # a clean exit leaves nothing to recover
+            self.journal_timer.stop()
+            for tab in self.documents.values():
+                tab.journal.discard()
+            self.saver.stop()
+            saving.end_session(self.session)
             try:
                 import glob
                 for f in glob.glob(os.path.join(tempfile.gettempdir(), "ascript_preview_*.html")):
@@ -1193,8 +2315,31 @@ is licensed under the <b>LGPLv3</b>, which allows dynamic linking in your applic
 
 
 if __name__ == "__main__":
+    if "--profile" in sys.argv:
+        sys.argv.remove("--profile")
+        profiling.enable()
+
+    # log theme copies and every written preview
+    if "--verbose" in sys.argv:
+        sys.argv.remove("--verbose")
+        set_verbose(True)
+
+    # prints time to first paint and first preview, then quits
+    startup_bench = "--startup-bench" in sys.argv
+    if startup_bench:
+        sys.argv.remove("--startup-bench")
+    clock = profiling.StartupClock(STARTUP_T0) if startup_bench else None
+    if clock:
+        clock.mark("imports")
+
+    # needed because QtWebEngine is only imported after the application exists
+    QApplication.setAttribute(Qt.AA_ShareOpenGLContexts)
     app = QApplication(sys.argv)
     app.setWindowIcon(QIcon(resource_path("annascriptstudio.png")))
-    win = MainWindow()
+    win = MainWindow(clock, startup_bench)
     win.show()
     app.exec()
+
+    if profiling.active():
+        profiling.active().dump()
+        profiling.disable()
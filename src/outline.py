@@ -0,0 +1,78 @@
+import html
+import re
+from difflib import SequenceMatcher
+
+from ast_nodes import Document, Heading
+from inline import parse_inline
+
+
+# Outline of a document, taken from the AST the preview compile already produced.
+# Between two compiles only the changed headings are reported, so the panel can
+# insert/remove single rows instead of rebuilding itself.
+
+def headings(doc: Document) -> list[tuple[int, str, int]]:
+    # (level, text, start line) of every heading, headings only appear at the top level
+    return [(ch.level, ch.text.strip(), ch.start_line) for ch in doc.children if isinstance(ch, Heading)]
+
+
+def _key(entry):
+    return entry[0], entry[1]
+
+
+class Outline:
+    def __init__(self):
+        self.entries = []
+
+    def update(self, new_entries: list) -> tuple[list, list]:
+        # returns (opcodes, moved). opcodes are SequenceMatcher style
+        # (tag, i1, i2, j1, j2) against the old entries, applied back to front they
+        # turn the old list into the new one. moved holds (new index, line) of kept
+        # headings whose line changed.
+        old = self.entries
+        self.entries = new_entries
+
+        # typing only touches a few headings, cut the common start and end first
+        lo = 0
+        n = min(len(old), len(new_entries))
+        while lo < n and _key(old[lo]) == _key(new_entries[lo]):
+            lo += 1
+        hi = 0
+        while hi < n - lo and _key(old[-1 - hi]) == _key(new_entries[-1 - hi]):
+            hi += 1
+
+        opcodes = []
+        old_mid = [_key(e) for e in old[lo:len(old) - hi]]
+        new_mid = [_key(e) for e in new_entries[lo:len(new_entries) - hi]]
+        if old_mid or new_mid:
+            matcher = SequenceMatcher(None, old_mid, new_mid, autojunk=False)
+            for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+                if tag != "equal":
+                    opcodes.append((tag, i1 + lo, i2 + lo, j1 + lo, j2 + lo))
+
+        changed = set()
+        for tag, i1, i2, j1, j2 in opcodes:
+            changed.update(range(j1, j2))
+
+        moved = []
+        if len(old) == len(new_entries) and not opcodes:
+            moved = [(j, e[2]) for j, e in enumerate(new_entries) if old[j][2] != e[2]]
+        else:
+            # kept headings: walk both lists along the opcodes
+            i = j = 0
+            for tag, i1, i2, j1, j2 in opcodes + [("end", len(old), len(old), len(new_entries), len(new_entries))]:
+                while i < i1 and j < j1:
+                    if old[i][2] != new_entries[j][2]:
+                        moved.append((j, new_entries[j][2]))
+                    i += 1
+                    j += 1
+                i, j = i2, j2
+        return opcodes, moved
+
+
+TAG_RE = re.compile(r"<[^>]+>")
+
+
+def display_text(entry) -> str:
+    # the outline shows the heading without inline markup, indented by level
+    level, text, _ = entry
+    return "    " * (level - 1) + html.unescape(TAG_RE.sub("", parse_inline(text)))
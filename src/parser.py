@@ -1,5 +1,6 @@
 from tokenizer import tokenize
 from ast_nodes import *
+from limits import CompileLimitError
 import re
 
 ATTR_RE = re.compile(r'(\w+)\s*=\s*"([^"]+)"|(\w+)\s*=\s*([^\s]+)')
@@ -60,9 +61,11 @@ def parse_macro(tokens, i):
     node.__end_index__ = i
     return node
 
-def parse_list(tokens, i, list_type, base_indent):
+def parse_list(tokens, i, list_type, base_indent, budget=None, depth=1):
     start_line = tokens[i].lineno
     items = []
+    if budget is not None:
+        budget.enter(depth, start_line)
 
     while i < len(tokens):
         tok = tokens[i]
@@ -86,13 +89,15 @@ def parse_list(tokens, i, list_type, base_indent):
         item = ListItem(text=text, start_line=tok.lineno)
 
         i += 1
+        if budget is not None:
+            budget.tick(tok.lineno)
 
         while i < len(tokens):
             next_tok = tokens[i]
 
             if next_tok.indent > cur_indent and next_tok.type in ("UL_ITEM", "OL_ITEM"):
                 nested_type = "UL" if next_tok.type == "UL_ITEM" else "OL"
-                nested_node, i = parse_list(tokens, i, nested_type, next_tok.indent)
+                nested_node, i = parse_list(tokens, i, nested_type, next_tok.indent, budget, depth + 1)
                 item.children.append(nested_node)
                 continue
 
@@ -107,19 +112,74 @@ def parse_list(tokens, i, list_type, base_indent):
 
     return node, i
 
-def parse_table(tokens, i):
+def parse_table(tokens, i, budget=None):
     start_line = tokens[i].lineno
     rows = []
     while i < len(tokens) and tokens[i].type == "TABLE_ROW":
         raw = tokens[i].value.strip()
         cells = [c.strip() for c in raw.strip("|").split("|")]
+        if budget is not None:
+            budget.add_cells(len(cells), tokens[i].lineno)
         rows.append(cells)
         i += 1
     node = Table(rows=rows, start_line=start_line, end_line=tokens[i-1].lineno if rows else start_line)
     node.__end_index__ = i
     return node
 
-def parse(tokens):
+def parse_block(tokens, i, budget=None):
+    # parses the top level block starting at tokens[i], returns (node or None, next index)
+    tok = tokens[i]
+
+    if tok.type == "HEADING":
+        level = len(re.match(r'^(#+)', tok.value).group(1))
+        text = tok.value[level:].strip()
+        node = Heading(level=level, text=text, start_line=tok.lineno, end_line=tok.lineno)
+        node.__end_index__ = i + 1
+        return node, i + 1
+
+    if tok.type == "TEXT":
+        node = parse_paragraph(tokens, i)
+        return node, node.__end_index__
+
+    if tok.type == "CODE_START":
+        node = parse_code(tokens, i)
+        return node, node.__end_index__
+
+    if tok.type == "MACRO_START":
+        node = parse_macro(tokens, i)
+        return node, node.__end_index__
+
+    if tok.type == "UL_ITEM":
+        return parse_list(tokens, i, "UL", tok.indent, budget)
+
+    if tok.type == "OL_ITEM":
+        return parse_list(tokens, i, "OL", tok.indent, budget)
+
+    if tok.type == "TABLE_ROW":
+        node = parse_table(tokens, i, budget)
+        return node, node.__end_index__
+
+    # unknown, skip
+    return None, i + 1
+
+def parse_error(tokens, i, exc):
+    # skips the broken block: a macro up to its closing ::, anything else up to the next blank line
+    start_tok = tokens[i]
+    end = i + 1
+    if start_tok.type == "MACRO_START":
+        while end < len(tokens) and tokens[end].type not in ("MACRO_END", "EOF"):
+            end += 1
+        if end < len(tokens) and tokens[end].type == "MACRO_END":
+            end += 1
+    else:
+        while end < len(tokens) and tokens[end].type not in ("BLANK", "EOF"):
+            end += 1
+
+    node = ErrorNode(message=f"{type(exc).__name__}: {exc}", start_line=start_tok.lineno, end_line=tokens[end-1].lineno)
+    node.__end_index__ = end
+    return node, end
+
+def parse(tokens, budget=None):
     i = 0
     meta = {}
     children = []
@@ -138,57 +198,25 @@ def parse(tokens):
             i += 1
             continue
 
-        if tok.type == "HEADING":
-            level = len(re.match(r'^(#+)', tok.value).group(1))
-            text = tok.value[level:].strip()
-            node = Heading(level=level, text=text, start_line=tok.lineno, end_line=tok.lineno)
-            node.__end_index__ = i + 1
-            children.append(node)
-            i += 1
-            continue
-
-        if tok.type == "TEXT":
-            node = parse_paragraph(tokens, i)
-            children.append(node)
-            i = node.__end_index__
-            continue
+        if budget is not None:
+            budget.tick(tok.lineno)
 
-        if tok.type == "CODE_START":
-            node = parse_code(tokens, i)
-            children.append(node)
-            i = node.__end_index__
-            continue
+        # a block that fails to parse becomes an ErrorNode, the rest of the document still parses.
+        # Running into a compile limit stops the whole compile
+        try:
+            node, i = parse_block(tokens, i, budget)
+        except CompileLimitError:
+            raise
+        except Exception as e:
+            node, i = parse_error(tokens, i, e)
 
-        if tok.type == "MACRO_START":
-            node = parse_macro(tokens, i)
+        if node is not None:
             children.append(node)
-            i = node.__end_index__
-            continue
-
-        if tok.type == "UL_ITEM":
-            node, i = parse_list(tokens, i, "UL", tok.indent)
-            children.append(node)
-            continue
-
-        if tok.type == "OL_ITEM":
-            node, i = parse_list(tokens, i, "OL", tok.indent)
-            children.append(node)
-            continue
-
-
-        if tok.type == "TABLE_ROW":
-            node = parse_table(tokens, i)
-            children.append(node)
-            i = node.__end_index__
-            continue
-
-        # unknown, skip
-        i += 1
 
     doc = Document(meta=meta, children=children, start_line=1, end_line=tokens[i-1].lineno if i>0 else 1)
     return doc
 
 # parse from text
-def parse_text(text: str):
-    tokens = tokenize(text)
-    return parse(tokens)
+def parse_text(text: str, budget=None):
+    tokens = tokenize(text, budget)
+    return parse(tokens, budget)
@@ -0,0 +1,172 @@
+import os
+import tempfile
+from collections import deque
+
+from PySide6.QtCore import QObject, QUrl, Signal
+from PySide6.QtWebEngineCore import QWebEnginePage
+
+from compiler import BASE_DIR
+from compiler_api import compile_text, _ensure_temp_environment
+from build import find_sources
+
+
+# setHtml goes through a base64 data: url, and Chromium won't load urls longer than 2MB
+SET_HTML_LIMIT = 2 * 1024 * 1024
+DATA_URL_PREFIX = "data:text/html;charset=UTF-8;base64,"
+
+
+def data_url_length(size: int) -> int:
+    # base64 turns every 3 bytes (started) into 4 characters
+    return len(DATA_URL_PREFIX) + 4 * ((size + 2) // 3)
+
+# the stylesheet links are relative (themes/...), resolve them against the source tree
+BASE_URL = QUrl.fromLocalFile(BASE_DIR + os.sep)
+
+
+class PdfExportService(QObject):
+    # Queues pdf exports onto a small pool of off-screen pages that stay loaded between
+    # jobs, so an export doesn't pay for spinning up a new page every time.
+
+    job_started = Signal(str)               # pdf path
+    job_finished = Signal(str, bool, str)   # pdf path, ok, error message
+    all_done = Signal()
+
+    def __init__(self, max_pages: int = 1, parent=None):
+        super().__init__(parent)
+        self.max_pages = max(1, max_pages)
+        self.queue = deque()
+        self.pages = []
+        self.busy = {}          # page -> (pdf path, temp html path or None)
+        self.failed = 0
+        self.done = 0
+
+    def pending(self) -> int:
+        return len(self.queue) + len(self.busy)
+
+    def submit_html(self, html_out: str, pdf_path: str):
+        self.queue.append((html_out, os.path.abspath(pdf_path)))
+        self.pump()
+
+    def submit_source(self, text: str, pdf_path: str):
+        html_out, _ = compile_text(text)
+        self.submit_html(html_out, pdf_path)
+
+    def submit_file(self, src_path: str, pdf_path: str):
+        try:
+            with open(src_path, "r", encoding="utf-8") as f:
+                text = f.read()
+            self.submit_source(text, pdf_path)
+        except Exception as e:
+            self.finish(None, pdf_path, False, f"{type(e).__name__}: {e}")
+
+    def export_folder(self, src_dir: str, out_dir: str) -> int:
+        # queues every .ascr file of a folder, returns how many were queued
+        sources = find_sources(src_dir)
+        for rel in sources:
+            pdf_path = os.path.join(out_dir, os.path.splitext(rel)[0] + ".pdf")
+            os.makedirs(os.path.dirname(pdf_path), exist_ok=True)
+            self.submit_file(os.path.join(src_dir, rel), pdf_path)
+        return len(sources)
+
+    def idle_page(self):
+        for page in self.pages:
+            if page not in self.busy:
+                return page
+        if len(self.pages) < self.max_pages:
+            page = QWebEnginePage(self)
+            page.loadFinished.connect(lambda ok, page=page: self.on_load_finished(page, ok))
+            page.pdfPrintingFinished.connect(lambda path, ok, page=page: self.on_printed(page, path, ok))
+            self.pages.append(page)
+            return page
+        return None
+
+    def pump(self):
+        while self.queue:
+            page = self.idle_page()
+            if page is None:
+                return
+            html_out, pdf_path = self.queue.popleft()
+            self.start(page, html_out, pdf_path)
+
+    def start(self, page, html_out: str, pdf_path: str):
+        self.job_started.emit(pdf_path)
+
+        data = html_out.encode("utf-8")
+        if data_url_length(len(data)) < SET_HTML_LIMIT:
+            self.busy[page] = (pdf_path, None)
+            page.setHtml(html_out, BASE_URL)
+            return
+
+        # too big for setHtml, load it from a file next to the copied themes instead
+        tmp_dir = _ensure_temp_environment()
+        fd, tmp_path = tempfile.mkstemp(suffix=".html", prefix="pdf_", dir=tmp_dir)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        self.busy[page] = (pdf_path, tmp_path)
+        page.load(QUrl.fromLocalFile(tmp_path))
+
+    def on_load_finished(self, page, ok: bool):
+        if page not in self.busy:
+            return
+        pdf_path, _ = self.busy[page]
+        if not ok:
+            self.finish(page, pdf_path, False, "could not load the html")
+            return
+        page.printToPdf(pdf_path)
+
+    def on_printed(self, page, path: str, ok: bool):
+        if page not in self.busy:
+            return
+        pdf_path, _ = self.busy[page]
+        self.finish(page, pdf_path, ok, "" if ok else "printing failed")
+
+    def finish(self, page, pdf_path: str, ok: bool, error: str):
+        if page is not None:
+            _, tmp_path = self.busy.pop(page)
+            if tmp_path:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+
+        if ok:
+            self.done += 1
+            print(f"[aScript] PDF exported successfully → {pdf_path}")
+        else:
+            self.failed += 1
+            print(f"[aScript] PDF export failed for {pdf_path}: {error}")
+
+        self.job_finished.emit(pdf_path, ok, error)
+        self.pump()
+        if not self.pending():
+            self.all_done.emit()
+
+
+def export_pdfs(src: str, out: str | None = None, pages: int = 4) -> int:
+    # `annascript pdf`, runs a headless Qt application until every export is done
+    from PySide6.QtWidgets import QApplication
+
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    app = QApplication.instance() or QApplication([])
+    service = PdfExportService(max_pages=pages)
+
+    if os.path.isdir(src):
+        count = service.export_folder(src, out or src)
+    else:
+        if out is None:
+            out = os.path.splitext(src)[0] + ".pdf"
+        elif os.path.isdir(out):
+            out = os.path.join(out, os.path.splitext(os.path.basename(src))[0] + ".pdf")
+        service.submit_file(src, out)
+        count = 1
+
+    if not count:
+        print(f"[aScript] no sources found in {src}")
+        return 0
+
+    if service.pending():
+        service.all_done.connect(app.quit)
+        app.exec()
+
+    print(f"[aScript] {service.done} pdf(s) exported, {service.failed} failed")
+    return 1 if service.failed else 0
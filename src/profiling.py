@@ -0,0 +1,224 @@
+import cProfile
+import io
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+
+
+# the profiler of the current session, set by enable() (main.py --profile or `annascript profile`)
+_active = None
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return f"{os.path.basename(code.co_filename)}:{code.co_name}"
+
+
+class StackSampler(threading.Thread):
+    # Samples the stack of one thread while a stage is running, for flamegraph.pl style folded stacks.
+
+    def __init__(self, interval: float = 0.001):
+        super().__init__(name="ascript-stack-sampler", daemon=True)
+        self.interval = interval
+        self.samples = Counter()
+        self.target = None
+        self.running = True
+
+    def run(self):
+        while self.running:
+            target = self.target
+            if target is not None:
+                frame = sys._current_frames().get(target)
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_name(frame))
+                    frame = frame.f_back
+                if stack:
+                    self.samples[";".join(reversed(stack))] += 1
+            time.sleep(self.interval)
+
+    def stop(self):
+        self.running = False
+
+
+class Profiler:
+    def __init__(self, out_dir: str | None = None, top: int = 30, sample_interval: float = 0.001):
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        self.out_dir = out_dir or os.path.join(tempfile.gettempdir(), "ascriptstudio-profiles", stamp)
+        self.top = top
+        self.started = time.time()
+
+        self.profile = cProfile.Profile()
+        self.sampler = StackSampler(sample_interval)
+        self.stages = {}            # name -> [calls, seconds, net bytes, peak bytes]
+        self.last_alloc_diff = []
+        self.depth = 0
+        self.lock = threading.Lock()
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(10)
+        self.sampler.start()
+
+    def stop(self):
+        self.sampler.stop()
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    @contextmanager
+    def stage(self, name: str):
+        # stages nest (update_preview -> render_to_tempfile -> parse), only the outermost
+        # one switches cProfile and the stack sampler on
+        with self.lock:
+            outer = self.depth == 0
+            self.depth += 1
+
+        if outer:
+            before_snapshot = tracemalloc.take_snapshot()
+            tracemalloc.reset_peak()
+            self.sampler.target = threading.get_ident()
+            self.profile.enable()
+
+        before, _ = tracemalloc.get_traced_memory()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            current, peak = tracemalloc.get_traced_memory()
+
+            if outer:
+                self.profile.disable()
+                self.sampler.target = None
+                after_snapshot = tracemalloc.take_snapshot()
+                self.last_alloc_diff = after_snapshot.compare_to(before_snapshot, "lineno")[:self.top]
+
+            with self.lock:
+                self.depth -= 1
+                entry = self.stages.setdefault(name, [0, 0.0, 0, 0])
+                entry[0] += 1
+                entry[1] += elapsed
+                entry[2] += current - before
+                entry[3] = max(entry[3], peak - before)
+
+    def format_report(self) -> str:
+        out = io.StringIO()
+        out.write(f"annaScript profile, session started {time.ctime(self.started)}\n")
+        out.write(f"Python {sys.version.split()[0]} on {sys.platform}\n\n")
+
+        current, peak = tracemalloc.get_traced_memory() if tracemalloc.is_tracing() else (0, 0)
+        out.write(f"Traced memory: {current / 1024:.1f}KB now, {peak / 1024:.1f}KB peak since the last stage started\n\n")
+
+        out.write("Stages\n")
+        out.write(f"  {'stage':<22}{'calls':>8}{'total ms':>12}{'avg ms':>10}{'net KB':>12}{'peak KB':>12}\n")
+        for name, (calls, seconds, net, peak_bytes) in sorted(self.stages.items(), key=lambda kv: -kv[1][1]):
+            out.write(
+                f"  {name:<22}{calls:>8}{seconds * 1000:>12.2f}{seconds * 1000 / calls:>10.2f}"
+                f"{net / 1024:>12.1f}{peak_bytes / 1024:>12.1f}\n"
+            )
+
+        out.write(f"\nTop {self.top} functions by cumulative time\n")
+        try:
+            stats = pstats.Stats(self.profile, stream=out)
+            stats.sort_stats("cumulative").print_stats(self.top)
+        except TypeError:
+            out.write("  (no samples recorded)\n")
+
+        out.write("\nTop allocations of the last outermost stage\n")
+        for stat in self.last_alloc_diff:
+            out.write(f"  {stat}\n")
+
+        return out.getvalue()
+
+    def format_folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.sampler.samples.most_common())
+
+    def dump(self) -> dict:
+        os.makedirs(self.out_dir, exist_ok=True)
+        paths = {
+            "report": os.path.join(self.out_dir, "profile_report.txt"),
+            "folded": os.path.join(self.out_dir, "profile.folded"),
+            "pstats": os.path.join(self.out_dir, "profile.pstats"),
+        }
+
+        with open(paths["report"], "w", encoding="utf-8") as f:
+            f.write(self.format_report())
+        with open(paths["folded"], "w", encoding="utf-8") as f:
+            f.write(self.format_folded())
+        try:
+            self.profile.dump_stats(paths["pstats"])
+        except TypeError:
+            del paths["pstats"]
+
+        print(f"[aScript] Profile written to {self.out_dir}")
+        return paths
+
+
+class StartupClock:
+    # `main.py --startup-bench`, milliseconds from process start to each startup milestone
+
+    def __init__(self, t0: float | None = None):
+        self.t0 = time.perf_counter() if t0 is None else t0
+        self.marks = []
+
+    def mark(self, name: str):
+        if all(n != name for n, _ in self.marks):
+            self.marks.append((name, (time.perf_counter() - self.t0) * 1000))
+
+    def format_report(self) -> str:
+        lines = ["[aScript] Startup times (ms since process start)"]
+        last = 0.0
+        for name, ms in self.marks:
+            lines.append(f"[aScript]   {name:<18}{ms:>9.1f}  (+{ms - last:.1f})")
+            last = ms
+        return "\n".join(lines)
+
+
+def enable(out_dir: str | None = None) -> Profiler:
+    global _active
+    if _active is None:
+        _active = Profiler(out_dir)
+        _active.start()
+        print(f"[aScript] Profiling enabled, reports go to {_active.out_dir}")
+    return _active
+
+
+def disable():
+    global _active
+    if _active is not None:
+        _active.stop()
+        _active = None
+
+
+def active() -> Profiler | None:
+    return _active
+
+
+def stage(name: str):
+    if _active is None:
+        return nullcontext()
+    return _active.stage(name)
+
+
+def profile_file(path: str, runs: int = 10, out_dir: str | None = None) -> int:
+    # `annascript profile FILE`, profiles the same compile path the editor preview uses
+    import compiler_api
+
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+
+    profiler = enable(out_dir)
+    try:
+        for _ in range(runs):
+            compiler_api.render_to_tempfile(text)
+        profiler.dump()
+    finally:
+        disable()
+        compiler_api.cleanup_instance_directory()
+    return 0
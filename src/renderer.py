@@ -1,109 +1,206 @@
 from ast_nodes import *
-from inline import parse_inline
+from inline import InlineRules, DEFAULT_INLINE
+from anchors import anchor_placeholder, toc_placeholder, resolve, escape
+import functools
 import html
+import inspect
 from typing import Callable
 import re
 
-_macro_registry: dict[str, Callable[[Macro], str]] = {}
-
-def register_macro(name: str):
-    def deco(fn: Callable[[Macro], str]):
-        _macro_registry[name] = fn
+# built-in macros, every Compiler starts with a copy of these (the module level render uses them directly)
+MACROS: dict[str, Callable[[Macro, "Renderer"], str]] = {}
+
+# the registry's old name, for code that filled it in directly
+_macro_registry = MACROS
+
+@functools.lru_cache(maxsize=1024)
+def _takes_renderer(fn: Callable) -> bool:
+    try:
+        params = inspect.signature(fn).parameters.values()
+    except (TypeError, ValueError):
+        return True
+    positional = [p for p in params if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD)]
+    return len(positional) >= 2 or any(p.kind == p.VAR_POSITIONAL for p in params)
+
+def takes_renderer(fn: Callable) -> bool:
+    # macros written before the Renderer existed only take the node. Checked when the macro
+    # is called, so it doesn't matter how it got into the registry
+    try:
+        return _takes_renderer(fn)
+    except TypeError:
+        # unhashable callable, nothing to cache it by
+        return _takes_renderer.__wrapped__(fn)
+
+def register_macro(name: str, registry: dict | None = None):
+    # macros get the node and the Renderer, r.inline formats text with the compiler's inline rules.
+    # fn(node) still works, it just formats with parse_inline like before
+    def deco(fn: Callable[[Macro, "Renderer"], str]):
+        (MACROS if registry is None else registry)[name] = fn
         return fn
     return deco
 
 
 @register_macro("note")
-def render_note(node: Macro) -> str:
-    inner = parse_inline(node.content)
+def render_note(node: Macro, r) -> str:
+    inner = r.inline(node.content)
     return f'<div class="note">{inner}</div>'
 
 @register_macro("center")
-def render_center(node: Macro) -> str:
-    inner = parse_inline(node.content)
+def render_center(node: Macro, r) -> str:
+    inner = r.inline(node.content)
     return f'<div style="text-align:center;">{inner}</div>'
 
 @register_macro("box")
-def render_box(node: Macro) -> str:
-    cls = html.escape(node.attrs.get("type", ""))
-    title = html.escape(node.attrs.get("title", ""))
+def render_box(node: Macro, r) -> str:
+    cls = escape(node.attrs.get("type", ""))
+    title = escape(node.attrs.get("title", ""))
     title_html = f'<div class="box-title">{title}</div>' if title else ''
-    inner = parse_inline(node.content)
+    inner = r.inline(node.content)
     return f'<div class="box {cls}">{title_html}<div class="box-content">{inner}</div></div>'
 
-def render_macro_generic(node: Macro) -> str:
-    inner = parse_inline(node.content)
-    return f'<div class="{html.escape(node.name)}">{inner}</div>'
-
-def render(node: Node) -> str:
-    if isinstance(node, Document):
-        title = str(node.meta.get("title", ""))
-        author = str(node.meta.get("author", ""))
-
-        style = str(node.meta.get("style", "default")).strip() or "default"
-
-        darkmode = str(node.meta.get("darkmode", "")).lower() in ("true", "1", "yes") # user feedback showed that not everyone agrees on "true"
-        mode = "dark" if darkmode else "light"
-
-        stylesheet_path = f"themes/{html.escape(style)}/{mode}.css"
-
-        head = (
-            "<!DOCTYPE html>\n<html>\n  <head>\n"
-            "    <meta charset='utf-8'>\n"
-            "    <meta name='viewport' content='width=device-width, initial-scale=1.0'>\n"
-            f"    <title>{title}</title>\n"
-            f"    <meta name='author' content='{author}'>\n"
-            f"    <link rel='stylesheet' href='{stylesheet_path}'>\n"
-            "  </head>"
-        )
-
-        body = "\n".join(render(ch) for ch in node.children)
-        return f"{head}\n  <body>\n{body}\n  </body>\n</html>"
-
-
-    if isinstance(node, Heading):
-        return f"<h{node.level}>{parse_inline(node.text)}</h{node.level}>"
-
-    if isinstance(node, Paragraph):
-        txt = " ".join(line.strip() for line in node.lines)
-        return f"<p>{parse_inline(txt)}</p>"
-
-    if isinstance(node, CodeBlock):
-        return f"<pre><code>{html.escape(node.code)}</code></pre>"
-
-    if isinstance(node, ListItem):
-        inner = parse_inline(node.text)
-        children_html = "".join(render(ch) for ch in node.children)
-        return f"<li>{inner}{children_html}</li>"
-
-
-    if isinstance(node, UL):
-        items_html = "".join(render(item) for item in node.items)
-        return f"<ul>{items_html}</ul>"
-
-    if isinstance(node, OL):
-        items_html = "".join(render(item) for item in node.items)
-        return f"<ol>{items_html}</ol>"
-
+@register_macro("toc")
+def render_toc(node: Macro, r) -> str:
+    # the list itself is filled in once every heading is known, see anchors.py
+    try:
+        depth = int(node.attrs.get("depth", 6))
+    except ValueError:
+        depth = 6
+    title = escape(node.attrs.get("title", ""))
+    title_html = f'<div class="toc-title">{title}</div>' if title else ''
+    return f'<nav class="toc">{title_html}{toc_placeholder(depth)}</nav>'
+
+def render_macro_generic(node: Macro, r) -> str:
+    inner = r.inline(node.content)
+    return f'<div class="{escape(node.name)}">{inner}</div>'
+
+def render_head(doc: Document) -> str:
+    title = str(doc.meta.get("title", ""))
+    author = str(doc.meta.get("author", ""))
+
+    style = str(doc.meta.get("style", "default")).strip() or "default"
+
+    darkmode = str(doc.meta.get("darkmode", "")).lower() in ("true", "1", "yes") # user feedback showed that not everyone agrees on "true"
+    mode = "dark" if darkmode else "light"
+
+    stylesheet_path = f"themes/{html.escape(style)}/{mode}.css"
+
+    return (
+        "<!DOCTYPE html>\n<html>\n  <head>\n"
+        "    <meta charset='utf-8'>\n"
+        "    <meta name='viewport' content='width=device-width, initial-scale=1.0'>\n"
+        f"    <title>{title}</title>\n"
+        f"    <meta name='author' content='{author}'>\n"
+        f"    <link rel='stylesheet' href='{stylesheet_path}'>\n"
+        "  </head>"
+    )
+
+def add_line_anchor(block_html: str, start: int, end: int) -> str | None:
+    # puts the source lines on the block's outer element, None if there is no element
+    if not block_html.startswith("<") or block_html.startswith("<!"):
+        return None
+    i = 1
+    n = len(block_html)
+    while i < n and block_html[i] not in " >/\t\n":
+        i += 1
+    return f"{block_html[:i]} data-line='{start}' data-end-line='{end}'{block_html[i:]}"
+
+def render_block_error(start: int, end: int, message: str, kept: str | None = None) -> str:
+    # inline marker for a block that failed to parse or render, followed by the html
+    # the block had before it broke (if there is one)
+    lines = f"line {start}" if start == end else f"lines {start}-{end}"
+    marker = (
+        "<div class='ascr-error' style='border-left:4px solid #d32f2f;background:#fdecea;"
+        "color:#8f0000;padding:4px 8px;margin:4px 0;font-family:monospace;font-size:0.9em;'>"
+        f"Could not render {lines}: {escape(message)}</div>"
+    )
+    return f"<div class='ascr-error-block'>{marker}{kept or ''}</div>"
+
+def render_page(doc: Document, blocks) -> str:
+    body = "\n".join(blocks)
+    return f"{render_head(doc)}\n  <body>\n{body}\n  </body>\n</html>"
+
+class Renderer:
+    # renders nodes with one set of macros and inline rules. A Compiler owns its own,
+    # the module level render() below uses the built-in macros and DEFAULT_INLINE
+
+    def __init__(self, macros: dict | None = None, inline: InlineRules | None = None):
+        self.macros = MACROS if macros is None else macros
+        self.inline_rules = inline or DEFAULT_INLINE
+        self.inline = self.inline_rules.parse
+
+    def resolve(self, doc: Document, blocks: list[str]) -> list[str]:
+        # heading ids, tables of contents and #links of the rendered blocks
+        return resolve(doc, blocks, self.inline)
+
+    def render_isolated(self, node: Node) -> str:
+        # one broken block doesn't take the whole page down
+        try:
+            return self.render(node)
+        except Exception as e:
+            return render_block_error(node.start_line, node.end_line, f"{type(e).__name__}: {e}")
+
+    def render(self, node: Node) -> str:
+        if isinstance(node, Document):
+            return render_page(node, self.resolve(node, [self.render_isolated(ch) for ch in node.children]))
+
+
+        if isinstance(node, Heading):
+            return f"<h{node.level} id='{anchor_placeholder(node.text)}'>{self.inline(node.text)}</h{node.level}>"
+
+        if isinstance(node, Paragraph):
+            txt = " ".join(line.strip() for line in node.lines)
+            return f"<p>{self.inline(txt)}</p>"
+
+        if isinstance(node, CodeBlock):
+            return f"<pre><code>{escape(node.code)}</code></pre>"
+
+        if isinstance(node, ListItem):
+            inner = self.inline(node.text)
+            children_html = "".join(self.render(ch) for ch in node.children)
+            return f"<li>{inner}{children_html}</li>"
+
+
+        if isinstance(node, UL):
+            items_html = "".join(self.render(item) for item in node.items)
+            return f"<ul>{items_html}</ul>"
+
+        if isinstance(node, OL):
+            items_html = "".join(self.render(item) for item in node.items)
+            return f"<ol>{items_html}</ol>"
+
+
+        if isinstance(node, Table):
+            header_html = ""
+            rows = node.rows[:]
+            if len(rows) >= 2 and all(re.match(r'^:?-+:?$', c.replace(" ", "")) for c in rows[1]):
+                header = rows[0]
+                header_html = "<thead><tr>" + "".join(f"<th>{self.inline(c)}</th>" for c in header) + "</tr></thead>"
+                body_rows = rows[2:]
+            else:
+                body_rows = rows
+            body_html = "<tbody>" + "".join("<tr>" + "".join(f"<td>{self.inline(c)}</td>" for c in r) + "</tr>" for r in body_rows) + "</tbody>"
+            return f"<table>{header_html}{body_html}</table>"
+
+        if isinstance(node, Macro):
+            fn = self.macros.get(node.name, render_macro_generic)
+            if takes_renderer(fn):
+                return fn(node, self)
+            return fn(node)
+
+        if isinstance(node, Comment):
+            return ""
+
+        if isinstance(node, ErrorNode):
+            return render_block_error(node.start_line, node.end_line, node.message)
+
+        # fallback
+        return ""
 
-    if isinstance(node, Table):
-        header_html = ""
-        rows = node.rows[:]
-        if len(rows) >= 2 and all(re.match(r'^:?-+:?$', c.replace(" ", "")) for c in rows[1]):
-            header = rows[0]
-            header_html = "<thead><tr>" + "".join(f"<th>{parse_inline(c)}</th>" for c in header) + "</tr></thead>"
-            body_rows = rows[2:]
-        else:
-            body_rows = rows
-        body_html = "<tbody>" + "".join("<tr>" + "".join(f"<td>{parse_inline(c)}</td>" for c in r) + "</tr>" for r in body_rows) + "</tbody>"
-        return f"<table>{header_html}{body_html}</table>"
 
-    if isinstance(node, Macro):
-        fn = _macro_registry.get(node.name, render_macro_generic)
-        return fn(node)
+DEFAULT_RENDERER = Renderer()
 
-    if isinstance(node, Comment):
-        return ""
+def render(node: Node) -> str:
+    return DEFAULT_RENDERER.render(node)
 
-    # fallback
-    return ""
+def render_isolated(node: Node) -> str:
+    return DEFAULT_RENDERER.render_isolated(node)
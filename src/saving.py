@@ -0,0 +1,251 @@
+import json
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+
+from textpos import from_utf16, utf16_len
+
+
+# Saving off the GUI thread plus a crash recovery journal. Files are written to a temp
+# file next to the target and moved over it with os.replace, so a crash mid-save never
+# leaves half a file behind. The journal only appends the edits since the last save,
+# so keeping it up to date costs as much as the edits, not as much as the document.
+
+RECOVERY_DIR = os.path.join(os.path.expanduser("~"), ".ascriptstudio", "recovery")
+
+# a session whose heartbeat is older than this is assumed to have crashed
+HEARTBEAT_STALE = 30
+
+# journals above this size are rewritten with the full text as their new base
+COMPACT_BYTES = 4 * 1024 * 1024
+
+
+def atomic_write(path: str, text: str):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".ascr-save-", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w", encoding="utf8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            shutil.copymode(path, tmp_path)
+        except OSError:
+            pass
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class SaveJob:
+    def __init__(self, path: str, text: str | None, done=None):
+        self.path = path
+        self.text = text
+        self.done = done
+        self.error = None
+        self.finished = threading.Event()
+
+
+class SaveWriter(threading.Thread):
+    # One thread does every write, in order. Saves of the same path that are still
+    # queued are skipped when a newer one is behind them.
+
+    def __init__(self):
+        super().__init__(name="ascript-save-writer", daemon=True)
+        self.jobs = queue.Queue()
+        self.latest = {}
+        self.lock = threading.Lock()
+
+    def save(self, path: str, text: str, done=None) -> SaveJob:
+        # done(job) is called on the writer thread
+        job = SaveJob(path, text, done)
+        with self.lock:
+            self.latest[path] = job
+        self.jobs.put(("save", job))
+        return job
+
+    def append(self, path: str, data: str):
+        self.jobs.put(("append", path, data))
+
+    def remove(self, path: str):
+        self.jobs.put(("remove", path))
+
+    def flush(self):
+        self.jobs.join()
+
+    def stop(self):
+        self.jobs.put(None)
+        self.join()
+
+    def run(self):
+        while True:
+            item = self.jobs.get()
+            try:
+                if item is None:
+                    return
+                kind = item[0]
+                if kind == "save":
+                    self.run_save(item[1])
+                elif kind == "append":
+                    _, path, data = item
+                    with open(path, "a", encoding="utf-8") as f:
+                        f.write(data)
+                elif kind == "remove":
+                    try:
+                        os.remove(item[1])
+                    except FileNotFoundError:
+                        pass
+            except OSError as e:
+                print(f"[aScript] Warning: background write failed: {e}")
+            finally:
+                self.jobs.task_done()
+
+    def run_save(self, job: SaveJob):
+        with self.lock:
+            superseded = self.latest.get(job.path) is not job
+        try:
+            if not superseded:
+                atomic_write(job.path, job.text)
+        except OSError as e:
+            job.error = str(e)
+        finally:
+            with self.lock:
+                if self.latest.get(job.path) is job:
+                    del self.latest[job.path]
+            job.text = None
+            job.finished.set()
+            if job.done is not None:
+                job.done(job)
+
+
+class RecoveryJournal:
+    # One append-only JSON lines file per open document. The first record is the base
+    # (the saved file, or the full text), every other record is one edit in Qt positions.
+
+    def __init__(self, writer: SaveWriter, session: str, number: int, directory: str = RECOVERY_DIR):
+        self.writer = writer
+        self.path = os.path.join(directory, f"{session}-{number}.jsonl")
+        self.pending = []       # [pos, removed, inserted] not written yet
+        self.size = 0
+
+    def rebase(self, file: str | None = None, text: str | None = None):
+        record = {"op": "base", "file": file}
+        if text is not None:
+            record["text"] = text
+        line = json.dumps(record) + "\n"
+        self.pending = []
+        self.size = len(line)
+        self.writer.save(self.path, line)
+
+    def record(self, pos: int, removed: int, inserted: str):
+        if self.pending:
+            last = self.pending[-1]
+            # typing: one record per word instead of one per key. pos is in Qt units,
+            # so the end of the last insert has to be measured in them too
+            if not removed and not last[1] and pos == last[0] + utf16_len(last[2]) and "\n" not in inserted:
+                last[2] += inserted
+                return
+        self.pending.append([pos, removed, inserted])
+
+    def needs_compaction(self) -> bool:
+        return self.size > COMPACT_BYTES
+
+    def flush(self):
+        if not self.pending:
+            return
+        data = "".join(
+            json.dumps({"op": "edit", "pos": pos, "del": removed, "ins": inserted}) + "\n"
+            for pos, removed, inserted in self.pending
+        )
+        self.pending = []
+        self.size += len(data)
+        self.writer.append(self.path, data)
+
+    def discard(self):
+        self.pending = []
+        self.writer.remove(self.path)
+
+
+def new_session(directory: str = RECOVERY_DIR) -> str:
+    os.makedirs(directory, exist_ok=True)
+    session = uuid.uuid4().hex
+    touch_heartbeat(session, directory)
+    return session
+
+
+def touch_heartbeat(session: str, directory: str = RECOVERY_DIR):
+    path = os.path.join(directory, f"{session}.alive")
+    with open(path, "a"):
+        pass
+    os.utime(path)
+
+
+def end_session(session: str, directory: str = RECOVERY_DIR):
+    try:
+        os.remove(os.path.join(directory, f"{session}.alive"))
+    except OSError:
+        pass
+
+
+def find_crashed_journals(current_session: str, directory: str = RECOVERY_DIR) -> list[str]:
+    # journals of sessions that stopped sending heartbeats
+    if not os.path.isdir(directory):
+        return []
+
+    now = time.time()
+    crashed = []
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".jsonl"):
+            continue
+        session = name.split("-", 1)[0]
+        if session == current_session:
+            continue
+        try:
+            alive = now - os.path.getmtime(os.path.join(directory, f"{session}.alive")) < HEARTBEAT_STALE
+        except OSError:
+            alive = False
+        if not alive:
+            crashed.append(os.path.join(directory, name))
+    return crashed
+
+
+def replay_journal(path: str) -> tuple[str | None, str]:
+    # returns (file the document belongs to, recovered text)
+    file, text = None, ""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # the last line of a crashed session may be cut off
+                break
+
+            if record["op"] == "base":
+                file = record.get("file")
+                if "text" in record:
+                    text = record["text"]
+                elif file and os.path.exists(file):
+                    with open(file, "r", encoding="utf8") as base:
+                        text = base.read()
+                else:
+                    text = ""
+            elif record["op"] == "edit":
+                start = from_utf16(text, record["pos"])
+                end = from_utf16(text, record["pos"] + record["del"])
+                text = text[:start] + record["ins"] + text[end:]
+    return file, text
+
+
+def discard_journal(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
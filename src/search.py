@@ -0,0 +1,114 @@
+import re
+from bisect import bisect_left
+
+from textpos import has_astral, utf16_offsets, from_utf16
+
+
+# Match index for the find & replace dialog. Matches never span lines (same as
+# QTextDocument.find), so an edit only invalidates the lines it touched: those get
+# rescanned and every match behind them is shifted by the length difference.
+# Positions are Qt positions, so they can go straight into a QTextCursor.
+
+class MatchIndex:
+    def __init__(self):
+        self.pattern = None
+        self.regex = False
+        self.starts = []
+        self.ends = []
+
+    def set_query(self, query: str, regex: bool = False, case_sensitive: bool = True):
+        # raises re.error for an invalid regex
+        flags = 0 if case_sensitive else re.IGNORECASE
+        self.regex = regex
+        self.pattern = re.compile(query if regex else re.escape(query), flags) if query else None
+        self.starts = []
+        self.ends = []
+
+    def __len__(self):
+        return len(self.starts)
+
+    def scan_line(self, position: int, text: str) -> list[tuple[int, int]]:
+        if self.pattern is None:
+            return []
+
+        offsets = utf16_offsets(text) if has_astral(text) else None
+        matches = []
+        for m in self.pattern.finditer(text):
+            start, end = m.span()
+            if start == end:
+                # empty regex matches can't be selected or replaced sensibly
+                continue
+            if offsets:
+                start, end = offsets[start], offsets[end]
+            matches.append((position + start, position + end))
+        return matches
+
+    def rebuild(self, lines):
+        # lines: iterable of (position, text) for every block of the document
+        self.starts = []
+        self.ends = []
+        self._extend(self.starts, self.ends, lines)
+
+    def _extend(self, starts, ends, lines):
+        for position, text in lines:
+            for start, end in self.scan_line(position, text):
+                starts.append(start)
+                ends.append(end)
+
+    def update(self, first: int, old_end: int, delta: int, lines):
+        # the old range [first, old_end) was replaced by the given lines,
+        # everything behind it moved by delta
+        lo = bisect_left(self.starts, first)
+        hi = bisect_left(self.starts, old_end)
+
+        starts, ends = [], []
+        self._extend(starts, ends, lines)
+
+        tail_starts = self.starts[hi:]
+        tail_ends = self.ends[hi:]
+        if delta:
+            tail_starts = [s + delta for s in tail_starts]
+            tail_ends = [e + delta for e in tail_ends]
+
+        self.starts[lo:] = starts + tail_starts
+        self.ends[lo:] = ends + tail_ends
+
+    def match_at(self, start: int, end: int) -> int:
+        # index of the match with exactly this span, -1 if there is none
+        i = bisect_left(self.starts, start)
+        if i < len(self.starts) and self.starts[i] == start and self.ends[i] == end:
+            return i
+        return -1
+
+    def next_after(self, position: int) -> int:
+        if not self.starts:
+            return -1
+        i = bisect_left(self.starts, position)
+        return i if i < len(self.starts) else 0
+
+    def prev_before(self, position: int) -> int:
+        if not self.starts:
+            return -1
+        i = bisect_left(self.starts, position) - 1
+        return i if i >= 0 else len(self.starts) - 1
+
+    def replacement(self, text: str, column: int, template: str) -> str:
+        # the replacement of the match that starts at Qt column `column` of the line `text`
+        if not self.regex:
+            return template
+        m = self.pattern.match(text, from_utf16(text, column))
+        return m.expand(template) if m else template
+
+    def replace_lines(self, text: str, template: str) -> tuple[str, int]:
+        # replaces every match in a run of whole lines, returns (new text, count)
+        count = 0
+
+        def repl(m):
+            nonlocal count
+            if m.start() == m.end():
+                return ""
+            count += 1
+            return m.expand(template) if self.regex else template
+
+        lines = [self.pattern.sub(repl, line) for line in text.split("\n")]
+        return "\n".join(lines), count
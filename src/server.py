@@ -0,0 +1,227 @@
+import hashlib
+import ipaddress
+import json
+import os
+import socketserver
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from parser import parse_text
+from compiler import Compiler
+from limits import CompileLimits, CompileLimitError
+from stats import CompileStats
+
+
+MAX_BODY_BYTES = 64 * 1024 * 1024
+
+
+class CompileService:
+    # Everything in here lives as long as the server, so repeated pages are cheap:
+    # parsed documents by source hash, plus the compiler's rendered blocks, inline
+    # results and theme css.
+
+    def __init__(self, max_documents: int = 512, limits: CompileLimits | None = None, root: str | None = None):
+        # documents come from clients, every compile is bounded
+        self.limits = limits or CompileLimits()
+        # "path" requests can only read files below root, without a root they are refused
+        self.root = os.path.realpath(root) if root else None
+        self.compiler = Compiler(limits=self.limits)
+        self.max_documents = max_documents
+        self.documents: OrderedDict[str, object] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _parse_cached(self, text: str, budget):
+        key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+        with self.lock:
+            doc = self.documents.get(key)
+            if doc is not None:
+                self.documents.move_to_end(key)
+                return doc, True
+
+        doc = parse_text(text, budget)
+
+        with self.lock:
+            self.documents[key] = doc
+            if len(self.documents) > self.max_documents:
+                self.documents.popitem(last=False)
+        return doc, False
+
+    def read_source(self, path: str) -> str:
+        if self.root is None:
+            raise PermissionError("path requests are off, start the server with --root")
+        full = os.path.realpath(os.path.join(self.root, path))
+        if os.path.commonpath([self.root, full]) != self.root:
+            raise PermissionError(f"{path} is outside of the server root")
+        with open(full, "r", encoding="utf-8") as f:
+            return f.read()
+
+    def compile(self, text: str, standalone: bool = False, cancel=None) -> dict:
+        stats = CompileStats()
+        budget = self.limits.start(text, cancel)
+
+        with stats.span("parse"):
+            doc, ast_cached = self._parse_cached(text, budget)
+
+        with stats.span("render"):
+            html_out = self.compiler.blocks.render_document(doc, text, stats, budget=budget)
+
+        if standalone:
+            with stats.span("theme"):
+                html_out = self.compiler.inline_stylesheet(html_out)
+
+        return {
+            "html": html_out,
+            "ast_cached": ast_cached,
+            "errors": stats.errors,
+            "timings": stats.as_dict(),
+        }
+
+
+class CompileRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "annaScript"
+    # headers and body are written separately, without this every response waits for a delayed ack
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            print("[aScript] " + format % args)
+
+    def send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self.send_json(200, {"status": "ok"})
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/compile":
+            self.close_connection = True
+            self.send_json(404, {"error": "not found"})
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length <= 0 or length > MAX_BODY_BYTES:
+            # the body (if any) is never read, so the connection can't be used for another request
+            self.close_connection = True
+            if length < 0:
+                self.send_json(400, {"error": "invalid Content-Length"})
+            else:
+                self.send_json(413 if length else 400, {"error": "missing or oversized request body"})
+            return
+
+        try:
+            request = json.loads(self.rfile.read(length))
+            if not isinstance(request, dict):
+                raise ValueError("request body has to be a json object")
+
+            if "text" in request:
+                text = str(request["text"])
+            elif "path" in request:
+                text = self.server.service.read_source(str(request["path"]))
+            else:
+                raise ValueError("expected a 'text' or 'path' field")
+        except PermissionError as e:
+            self.send_json(403, {"error": str(e)})
+            return
+        except (ValueError, OSError) as e:
+            self.send_json(400, {"error": f"{type(e).__name__}: {e}"})
+            return
+
+        try:
+            result = self.server.service.compile(text, standalone=bool(request.get("standalone")))
+        except CompileLimitError as e:
+            self.send_json(413 if e.limit == "source_bytes" else 422, e.as_dict())
+            return
+        except Exception as e:
+            self.send_json(422, {"error": f"{type(e).__name__}: {e}"})
+            return
+
+        self.send_json(200, result)
+
+
+class CompileHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service: CompileService, verbose: bool = False):
+        super().__init__(address, CompileRequestHandler)
+        self.service = service
+        self.verbose = verbose
+
+
+class UnixCompileRequestHandler(CompileRequestHandler):
+    disable_nagle_algorithm = False
+
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+    class CompileUnixServer(socketserver.ThreadingUnixStreamServer):
+        daemon_threads = True
+
+        def __init__(self, path: str, service: CompileService, verbose: bool = False):
+            if os.path.exists(path):
+                os.remove(path)
+            super().__init__(path, UnixCompileRequestHandler)
+            self.service = service
+            self.verbose = verbose
+
+        def get_request(self):
+            # unix sockets have no peer address, http.server expects a (host, port) tuple
+            request, _ = super().get_request()
+            return request, ("local", 0)
+
+
+def is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def serve(host: str = "127.0.0.1", port: int = 8765, socket_path: str | None = None, verbose: bool = False,
+          limits: CompileLimits | None = None, root: str | None = None, allow_remote: bool = False) -> int:
+    if not socket_path and not allow_remote and not is_loopback(host):
+        print(f"[aScript] refusing to listen on {host}, the server has no authentication. "
+              "Use --allow-remote if other machines should reach it")
+        return 1
+    if root and not os.path.isdir(root):
+        print(f"[aScript] server root {root} is not a folder")
+        return 1
+
+    service = CompileService(limits=limits, root=root)
+
+    if socket_path:
+        if not hasattr(socketserver, "ThreadingUnixStreamServer"):
+            print("[aScript] Unix sockets are not supported on this platform")
+            return 1
+        server = CompileUnixServer(socket_path, service, verbose)
+        where = socket_path
+    else:
+        server = CompileHTTPServer((host, port), service, verbose)
+        where = f"http://{host}:{server.server_address[1]}"
+
+    print(f"[aScript] compile server listening on {where} (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("[aScript] stopping compile server")
+    finally:
+        server.server_close()
+        if socket_path and os.path.exists(socket_path):
+            os.remove(socket_path)
+    return 0
@@ -0,0 +1,66 @@
+from bisect import bisect_right
+
+
+# Maps editor lines to the top level blocks of the preview and back. The renderer marks
+# every block with data-line attributes (renderer.add_line_anchor), the preview keeps the
+# list of those elements once per page load, so following the editor is a binary search
+# here plus one lookup by position in the page.
+
+class LineIndex:
+    def __init__(self):
+        self.starts = []    # first source line of every anchored block, ascending
+        self.ends = []
+
+    def add(self, start: int, end: int):
+        self.starts.append(start)
+        self.ends.append(max(start, end))
+
+    def __len__(self):
+        return len(self.starts)
+
+    def block_at(self, line: int) -> tuple[int, float]:
+        # (block number, how far into the block) for a 1-based source line
+        i = bisect_right(self.starts, line) - 1
+        if i < 0:
+            return 0, 0.0
+        start, end = self.starts[i], self.ends[i]
+        if line > end:
+            # blank lines between two blocks
+            return i, 1.0
+        return i, (line - start) / (end - start + 1)
+
+    def line_at(self, block: int, fraction: float = 0.0) -> int:
+        if not self.starts:
+            return 1
+        block = max(0, min(block, len(self.starts) - 1))
+        start, end = self.starts[block], self.ends[block]
+        return start + int(fraction * (end - start + 1))
+
+
+# preview side: ascrScrollToBlock(i, fraction) and ascrTopBlock() -> [i, fraction]
+SCROLL_SCRIPT = """<script>
+(function () {
+  var blocks = null;
+  function anchored() {
+    if (blocks === null) blocks = document.querySelectorAll('[data-line]');
+    return blocks;
+  }
+  window.ascrScrollToBlock = function (i, fraction) {
+    var b = anchored();
+    if (!b.length) return;
+    var r = b[Math.min(i, b.length - 1)].getBoundingClientRect();
+    window.scrollTo(0, window.scrollY + r.top + r.height * fraction);
+  };
+  window.ascrTopBlock = function () {
+    var b = anchored(), lo = 0, hi = b.length - 1;
+    if (hi < 0) return [0, 0];
+    while (lo < hi) {
+      var mid = (lo + hi + 1) >> 1;
+      if (b[mid].getBoundingClientRect().top <= 0) lo = mid; else hi = mid - 1;
+    }
+    var r = b[lo].getBoundingClientRect();
+    return [lo, r.height > 0 ? Math.min(1, Math.max(0, -r.top / r.height)) : 0];
+  };
+})();
+</script>
+"""
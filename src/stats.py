@@ -0,0 +1,147 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from ast_nodes import Macro, Node
+
+
+STAGES = ("tokenize", "parse", "render", "io")
+
+
+class CompileStats:
+    # Timings of one compile. Every measured span is kept as an event so the whole
+    # compile can be exported as a Chrome trace (chrome://tracing, Perfetto).
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.events = []            # (name, category, start, end, args)
+        self.stages = {}            # stage name -> seconds
+        self.nodes = {}             # node type or macro:name -> [count, seconds]
+        self.errors = []            # (start line, end line) of blocks that failed to parse or render
+
+    @contextmanager
+    def span(self, name: str, category: str = "stage", **args):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, category, start, time.perf_counter(), args)
+
+    def add(self, name: str, category: str, start: float, end: float, args: dict | None = None):
+        self.events.append((name, category, start, end, args or {}))
+        if category == "stage":
+            self.stages[name] = self.stages.get(name, 0.0) + (end - start)
+
+    def add_node(self, node: Node, start: float, end: float, cached: bool = False):
+        name = f"macro:{node.name}" if isinstance(node, Macro) else type(node).__name__
+        self.events.append((name, "node", start, end, {"line": node.start_line, "cached": cached}))
+        entry = self.nodes.setdefault(name, [0, 0.0])
+        entry[0] += 1
+        entry[1] += end - start
+
+    def add_error(self, start_line: int, end_line: int):
+        self.errors.append((start_line, end_line))
+
+    def stage_ms(self, name: str) -> float:
+        return self.stages.get(name, 0.0) * 1000
+
+    @property
+    def total_ms(self) -> float:
+        return sum(self.stages.values()) * 1000
+
+    def as_dict(self) -> dict:
+        return {
+            "total_ms": round(self.total_ms, 3),
+            "stages_ms": {name: round(self.stage_ms(name), 3) for name in self.stages},
+            "nodes": {
+                name: {"count": count, "ms": round(seconds * 1000, 3)}
+                for name, (count, seconds) in sorted(self.nodes.items(), key=lambda kv: -kv[1][1])
+            },
+        }
+
+    def summary(self) -> str:
+        parts = [f"{name} {self.stage_ms(name):.2f}ms" for name in self.stages]
+        return f"{self.total_ms:.2f}ms ({', '.join(parts)})"
+
+    def to_trace_events(self) -> dict:
+        pid = os.getpid()
+        tid = threading.get_ident()
+        events = []
+        for name, category, start, end, args in self.events:
+            events.append({
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": round((start - self.origin) * 1e6, 3),
+                "dur": round((end - start) * 1e6, 3),
+                "pid": pid,
+                "tid": tid,
+                "args": args,
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_trace(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_trace_events(), f)
+
+
+class StatsHistory:
+    # Rolling window of the last compiles, used by the editor's stats dialog.
+
+    def __init__(self, size: int = 200):
+        self.size = size
+        self.samples = {name: deque(maxlen=size) for name in STAGES + ("total",)}
+        self.last = None
+
+    def add(self, stats: CompileStats):
+        self.last = stats
+        for name in STAGES:
+            self.samples[name].append(stats.stage_ms(name))
+        self.samples["total"].append(stats.total_ms)
+
+    def __len__(self):
+        return len(self.samples["total"])
+
+    def percentiles(self, name: str) -> dict:
+        values = sorted(self.samples[name])
+        if not values:
+            return {"p50": 0.0, "p95": 0.0, "max": 0.0}
+        pick = lambda pct: values[min(len(values) - 1, int(pct / 100 * len(values)))]
+        return {"p50": pick(50), "p95": pick(95), "max": values[-1]}
+
+    def histogram(self, name: str, bins: int = 10) -> list[tuple[float, float, int]]:
+        values = self.samples[name]
+        if not values:
+            return []
+        low, high = min(values), max(values)
+        width = (high - low) / bins or 1.0
+        counts = [0] * bins
+        for v in values:
+            counts[min(bins - 1, int((v - low) / width))] += 1
+        return [(low + i * width, low + (i + 1) * width, c) for i, c in enumerate(counts)]
+
+    def format_report(self, bins: int = 10, bar_width: int = 30) -> str:
+        if not len(self):
+            return "No compiles recorded yet."
+
+        lines = [f"Last {len(self)} compiles"]
+        for name in STAGES + ("total",):
+            p = self.percentiles(name)
+            lines.append("")
+            lines.append(f"{name}: p50 {p['p50']:.2f}ms   p95 {p['p95']:.2f}ms   max {p['max']:.2f}ms")
+            hist = self.histogram(name, bins)
+            peak = max(c for _, _, c in hist) or 1
+            for low, high, count in hist:
+                bar = "#" * round(count / peak * bar_width)
+                lines.append(f"  {low:8.2f} - {high:8.2f}ms | {bar} {count}")
+
+        if self.last and self.last.nodes:
+            lines.append("")
+            lines.append("Render time by block type (last compile)")
+            for name, info in self.last.as_dict()["nodes"].items():
+                lines.append(f"  {name:<20} {info['count']:>6}x  {info['ms']:9.2f}ms")
+
+        return "\n".join(lines)
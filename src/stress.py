@@ -0,0 +1,76 @@
+import sys
+import threading
+import time
+
+from compiler import Compiler
+from corpus import PROFILES, generate, parse_size
+
+
+# Concurrency stress test for compiler.Compiler. Threads compile the benchmark corpus
+# at the same time and every result has to match a single threaded reference, once
+# with a compiler per thread and once with one compiler shared by all threads.
+
+MACRO_DOC = "::stress\nworker\n::\n"
+
+
+def run_threads(docs: list[str], reference: list[str], threads: int, rounds: int, shared: bool) -> tuple[int, list[str]]:
+    shared_compiler = Compiler() if shared else None
+    barrier = threading.Barrier(threads)
+    failures = []
+    counts = [0] * threads
+
+    def worker(n: int):
+        compiler = shared_compiler or Compiler()
+        if not shared:
+            # a macro only this compiler knows, another thread's registry must not leak in
+            @compiler.register_macro("stress")
+            def render_stress(node, r, n=n):
+                return f"<div data-worker='{n}'>{r.inline(node.content)}</div>"
+
+        barrier.wait()
+        for round_no in range(rounds):
+            if round_no % 4 == n % 4:
+                # cache misses and concurrent clears need to work as well as the hits
+                compiler.blocks.clear()
+            for k in range(len(docs)):
+                i = (k + n) % len(docs)
+                html_out, _ = compiler.compile(docs[i])
+                counts[n] += 1
+                if html_out != reference[i]:
+                    failures.append(f"thread {n} round {round_no}: document {i} differs from the reference")
+
+            if not shared:
+                html_out, _ = compiler.compile(MACRO_DOC)
+                if f"data-worker='{n}'" not in html_out:
+                    failures.append(f"thread {n} round {round_no}: macro registry is not isolated")
+
+    workers = [threading.Thread(target=worker, args=(n,), name=f"ascript-stress-{n}") for n in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return sum(counts), failures
+
+
+def stress(threads: int = 8, rounds: int = 20, size: str = "64K", seed: int = 1234) -> int:
+    docs = [generate(profile, parse_size(size), seed) for profile in PROFILES]
+    reference = [Compiler().compile(text)[0] for text in docs]
+
+    gil = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(f"[aScript] stress: {threads} threads, {rounds} rounds, {len(docs)} documents of {size}, "
+          f"GIL {'enabled' if gil else 'disabled'}")
+
+    status = 0
+    for shared in (False, True):
+        mode = "one shared compiler" if shared else "a compiler per thread"
+        start = time.perf_counter()
+        compiles, failures = run_threads(docs, reference, threads, rounds, shared)
+        elapsed = time.perf_counter() - start
+
+        print(f"[aScript]   {mode:<22} {compiles} compiles in {elapsed:.2f}s "
+              f"({compiles / elapsed:.0f}/s), {len(failures)} failure(s)")
+        for line in failures[:10]:
+            print(f"[aScript]     {line}")
+        if failures:
+            status = 1
+    return status
@@ -0,0 +1,34 @@
+# Qt counts positions in UTF-16 code units, Python strings in code points. They only
+# differ for characters outside the BMP (emoji and friends), which take two units.
+
+def has_astral(text: str) -> bool:
+    return not text.isascii() and max(text) > "\uffff"
+
+
+def utf16_len(text: str) -> int:
+    if not has_astral(text):
+        return len(text)
+    return len(text) + sum(1 for ch in text if ch > "\uffff")
+
+
+def from_utf16(text: str, offset: int) -> int:
+    # Qt position -> code point index
+    if not has_astral(text):
+        return offset
+    units = 0
+    for i, ch in enumerate(text):
+        if units >= offset:
+            return i
+        units += 2 if ch > "\uffff" else 1
+    return len(text)
+
+
+def utf16_offsets(text: str) -> list[int]:
+    # Qt position of every code point index (and of the end), for converting many at once
+    offsets = [0] * (len(text) + 1)
+    units = 0
+    for i, ch in enumerate(text):
+        offsets[i] = units
+        units += 2 if ch > "\uffff" else 1
+    offsets[len(text)] = units
+    return offsets
@@ -0,0 +1,104 @@
+from dataclasses import dataclass
+
+from ast_nodes import Document, Node, Heading, Table, UL, OL
+from renderer import render_page
+from sourcemap import LineIndex, SCROLL_SCRIPT
+
+
+# Preview mode for documents with thousands of blocks. The page only gets one empty
+# placeholder per section of blocks, sized to an estimated height so the scrollbar is
+# right. Sections are fetched over QWebChannel (main.PreviewBridge) when they come near
+# the viewport and emptied again, keeping their measured height, when they are far away.
+
+VIRTUAL_MIN_BLOCKS = 2000
+SECTION_BLOCKS = 40
+
+LINE_HEIGHT_PX = 24
+BLOCK_MARGIN_PX = 16
+
+
+@dataclass
+class Section:
+    start_line: int
+    end_line: int
+    html: str
+    height: int
+
+
+def estimate_height(node: Node) -> int:
+    lines = node.end_line - node.start_line + 1
+    if isinstance(node, Heading):
+        return 40 + BLOCK_MARGIN_PX
+    if isinstance(node, Table):
+        return len(node.rows) * 32 + BLOCK_MARGIN_PX
+    if isinstance(node, (UL, OL)):
+        return lines * LINE_HEIGHT_PX + BLOCK_MARGIN_PX
+    # paragraph lines are joined and wrap, a few source lines per rendered line
+    return max(1, lines) * LINE_HEIGHT_PX + BLOCK_MARGIN_PX
+
+
+def make_sections(nodes: list[Node], blocks: list[str], size: int = SECTION_BLOCKS) -> list[Section]:
+    sections = []
+    for i in range(0, len(nodes), size):
+        group = nodes[i:i + size]
+        sections.append(Section(
+            start_line=group[0].start_line,
+            end_line=group[-1].end_line,
+            html="\n".join(blocks[i:i + size]),
+            height=sum(estimate_height(n) for n in group),
+        ))
+    return sections
+
+
+def render_shell(doc: Document, sections: list[Section], line_index: LineIndex) -> str:
+    placeholders = []
+    for i, section in enumerate(sections):
+        line_index.add(section.start_line, section.end_line)
+        placeholders.append(
+            f"<div class='ascr-section' data-section='{i}' data-line='{section.start_line}' "
+            f"data-end-line='{section.end_line}' style='min-height:{section.height}px'></div>"
+        )
+    placeholders.append(SCROLL_SCRIPT + VIRTUAL_SCRIPT)
+    return render_page(doc, placeholders)
+
+
+VIRTUAL_SCRIPT = """<script src="qrc:///qtwebchannel/qwebchannel.js"></script>
+<script>
+(function () {
+  // sections within this distance of the viewport are loaded, beyond it they are emptied
+  var MARGIN = '2000px 0px';
+  var sections = document.querySelectorAll('.ascr-section');
+  var loaded = {};
+
+  function show(el, bridge) {
+    var i = +el.dataset.section;
+    if (loaded[i]) return;
+    loaded[i] = 'pending';
+    bridge.section(i, function (html) {
+      if (loaded[i] !== 'pending') return;
+      el.innerHTML = html;
+      el.style.minHeight = '';
+      loaded[i] = true;
+    });
+  }
+
+  function hide(el) {
+    var i = +el.dataset.section;
+    if (loaded[i] !== true) { delete loaded[i]; return; }
+    el.style.minHeight = el.getBoundingClientRect().height + 'px';
+    el.innerHTML = '';
+    delete loaded[i];
+  }
+
+  new QWebChannel(qt.webChannelTransport, function (channel) {
+    var bridge = channel.objects.preview;
+    var observer = new IntersectionObserver(function (entries) {
+      entries.forEach(function (e) {
+        if (e.isIntersecting) show(e.target, bridge); else hide(e.target);
+      });
+    }, {rootMargin: MARGIN});
+    sections.forEach(function (el) { observer.observe(el); });
+  });
+})();
+</script>
+"""
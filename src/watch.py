@@ -0,0 +1,203 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import sys
+import time
+
+from build import (
+    build, find_sources, hash_bytes, output_name, relink_themes,
+    load_manifest, save_manifest,
+)
+from incremental import BlockCache, LastGood
+
+
+# inotify flags, see <sys/inotify.h>
+IN_MODIFY      = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM  = 0x00000040
+IN_MOVED_TO    = 0x00000080
+IN_CREATE      = 0x00000100
+IN_DELETE      = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+
+
+class InotifyWaiter:
+    # Only used as a wake up signal, the tree scan still decides what changed.
+    # That way the polling fallback and inotify can't disagree.
+
+    def __init__(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        self._add_watch = libc.inotify_add_watch
+        self._add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+
+        self.fd = libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.watched = set()
+
+    def watch_tree(self, root: str):
+        for dirpath, dirs, _ in os.walk(root):
+            dirs[:] = [d for d in dirs if not d.startswith(".")]
+            if dirpath in self.watched:
+                continue
+            if self._add_watch(self.fd, os.fsencode(dirpath), IN_WATCH_MASK) >= 0:
+                self.watched.add(dirpath)
+
+    def wait(self, timeout: float | None) -> bool:
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return False
+        # editors tend to write in several steps, give them a moment and drain everything at once
+        time.sleep(0.05)
+        while select.select([self.fd], [], [], 0)[0]:
+            os.read(self.fd, 65536)
+        return True
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingWaiter:
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+
+    def watch_tree(self, root: str):
+        pass
+
+    def wait(self, timeout: float | None) -> bool:
+        time.sleep(self.interval)
+        return True
+
+    def close(self):
+        pass
+
+
+def make_waiter(poll: bool = False, interval: float = 0.5):
+    if not poll and sys.platform.startswith("linux"):
+        try:
+            return InotifyWaiter()
+        except (OSError, AttributeError) as e:
+            print(f"[aScript] inotify not available ({e}), falling back to polling")
+    return PollingWaiter(interval)
+
+
+class Watcher:
+    def __init__(self, src_dir: str, out_dir: str, waiter=None):
+        self.src_dir = os.path.abspath(src_dir)
+        self.out_dir = os.path.abspath(out_dir)
+        self.waiter = waiter or PollingWaiter()
+
+        # everything that is kept warm between rebuilds
+        self.cache = BlockCache()
+        self.good = {}      # rel -> LastGood, broken blocks keep their previous html
+        self.stats = {}     # rel -> (size, mtime_ns)
+        self.manifest = None
+
+    def start(self):
+        build(self.src_dir, self.out_dir, quiet=True)
+        self.manifest = load_manifest(self.out_dir)
+
+        for rel in find_sources(self.src_dir):
+            st = os.stat(os.path.join(self.src_dir, rel))
+            self.stats[rel] = (st.st_size, st.st_mtime_ns)
+
+        self.waiter.watch_tree(self.src_dir)
+
+    def scan(self) -> tuple[list[str], list[str]]:
+        # returns (changed, removed); unchanged size and mtime means the file is not even opened
+        changed = []
+        current = set(find_sources(self.src_dir))
+
+        for rel in sorted(current):
+            try:
+                st = os.stat(os.path.join(self.src_dir, rel))
+            except FileNotFoundError:
+                current.discard(rel)
+                continue
+            sig = (st.st_size, st.st_mtime_ns)
+            if self.stats.get(rel) != sig:
+                self.stats[rel] = sig
+                changed.append(rel)
+
+        removed = [rel for rel in self.stats if rel not in current]
+        for rel in removed:
+            del self.stats[rel]
+
+        return changed, removed
+
+    def rebuild(self, rel: str) -> bool:
+        src_path = os.path.join(self.src_dir, rel)
+        try:
+            with open(src_path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return False
+
+        digest = hash_bytes(data)
+        entry = self.manifest["files"].get(rel)
+        if entry and entry.get("hash") == digest:
+            # touched or saved without changes
+            return False
+
+        start = time.perf_counter()
+        hits, misses = self.cache.hits, self.cache.misses
+        try:
+            text = data.decode("utf-8")
+            _, html_out = self.cache.compile(text, self.good.setdefault(rel, LastGood()))
+        except Exception as e:
+            print(f"[aScript] FAILED  {rel}: {type(e).__name__}: {e}")
+            return False
+
+        dst_path = os.path.join(self.out_dir, output_name(rel))
+        os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+        with open(dst_path, "w", encoding="utf-8") as f:
+            f.write(relink_themes(html_out, rel.count("/")))
+
+        size, mtime = self.stats.get(rel, (len(data), 0))
+        self.manifest["files"][rel] = {"hash": digest, "size": size, "mtime": mtime}
+
+        elapsed = (time.perf_counter() - start) * 1000
+        reused = self.cache.hits - hits
+        total = reused + self.cache.misses - misses
+        print(f"[aScript] rebuilt {rel} in {elapsed:.2f}ms ({reused}/{total} blocks cached)")
+        return True
+
+    def remove(self, rel: str):
+        dst_path = os.path.join(self.out_dir, output_name(rel))
+        if os.path.exists(dst_path):
+            os.remove(dst_path)
+        self.good.pop(rel, None)
+        self.manifest["files"].pop(rel, None)
+        print(f"[aScript] removed {rel}")
+
+    def step(self) -> int:
+        changed, removed = self.scan()
+        for rel in removed:
+            self.remove(rel)
+
+        rebuilt = sum(1 for rel in changed if self.rebuild(rel))
+
+        if changed or removed:
+            self.waiter.watch_tree(self.src_dir)
+            save_manifest(self.out_dir, self.manifest)
+        return rebuilt
+
+    def run(self, timeout: float | None = 5.0):
+        self.start()
+        print(f"[aScript] watching {self.src_dir} (Ctrl+C to stop)")
+        try:
+            while True:
+                # the timeout makes sure a missed inotify event can't stall us forever
+                self.waiter.wait(timeout)
+                self.step()
+        except KeyboardInterrupt:
+            print("[aScript] stopped watching")
+        finally:
+            self.waiter.close()
+
+
+def watch(src_dir: str, out_dir: str, poll: bool = False, interval: float = 0.5) -> int:
+    Watcher(src_dir, out_dir, make_waiter(poll, interval)).run()
+    return 0
@@ -0,0 +1,44 @@
+from anchors import toc_html
+from compiler_api import compile_text
+
+
+def toc(levels: list[int], depth: int = 6) -> str:
+    return toc_html([(level, f"h{i}", f"h{i}") for i, level in enumerate(levels)], depth)
+
+
+def item(i: int) -> str:
+    return f"<li><a href='#h{i}'>h{i}</a>"
+
+
+def test_nested_levels():
+    assert toc([1, 2, 2, 1]) == (
+        f"<ul>{item(0)}<ul>{item(1)}</li>{item(2)}</li></ul></li>{item(3)}</li></ul>"
+    )
+
+
+def test_skipped_levels():
+    # the H2 after an H3 is still under the H1, not next to it
+    assert toc([1, 3, 2]) == f"<ul>{item(0)}<ul>{item(1)}</li>{item(2)}</li></ul></li></ul>"
+    assert toc([1, 3, 2, 3, 1]) == (
+        f"<ul>{item(0)}<ul>{item(1)}</li>{item(2)}<ul>{item(3)}</li></ul></li></ul></li>{item(4)}</li></ul>"
+    )
+
+
+def test_document_starting_below_top_level():
+    assert toc([2, 1, 2]) == f"<ul>{item(0)}</li>{item(1)}<ul>{item(2)}</li></ul></li></ul>"
+
+
+def test_depth():
+    assert toc([1, 2, 3], depth=2) == f"<ul>{item(0)}<ul>{item(1)}</li></ul></li></ul>"
+
+
+def test_sentinels_in_the_source_are_text():
+    # the source can't fake a placeholder, not even in code spans or macro attributes
+    html_out, stats = compile_text(
+        "# Intro\n\nhello \ue000toc:abc\ue001 `\ue000r:intro\ue001`\n\n"
+        "| \ue000a:intro\ue001 | x |\n\n::box title=\"\ue000toc:1\ue001\"\nx\n::\n"
+    )
+    assert not stats.errors
+    assert "\ue000" not in html_out and "\ue001" not in html_out
+    assert "hello &#xe000;toc:abc&#xe001;" in html_out
+    assert "<h1 id='intro'>" in html_out
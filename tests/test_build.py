@@ -0,0 +1,60 @@
+import json
+import os
+
+import build
+from build import MANIFEST_NAME, build as run_build
+
+
+def write(path, text: str):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def manifest(out):
+    with open(out / MANIFEST_NAME, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_unchanged_files_are_skipped(tmp_path, capsys):
+    src, out = tmp_path / "src", tmp_path / "out"
+    write(src / "a.ascr", "# A\n")
+    write(src / "sub" / "b.ascr", "# B\n")
+
+    assert run_build(str(src), str(out), jobs=1, quiet=True) == 0
+    assert (out / "a.html").exists() and (out / "sub" / "b.html").exists()
+    assert set(manifest(out)["files"]) == {"a.ascr", "sub/b.ascr"}
+    capsys.readouterr()
+
+    run_build(str(src), str(out), jobs=1, quiet=True)
+    assert "0 compiled, 2 unchanged" in capsys.readouterr().out
+
+
+def test_removed_sources_are_pruned(tmp_path):
+    src, out = tmp_path / "src", tmp_path / "out"
+    write(src / "a.ascr", "# A\n")
+    write(src / "b.ascr", "# B\n")
+    run_build(str(src), str(out), jobs=1, quiet=True)
+
+    os.remove(src / "b.ascr")
+    run_build(str(src), str(out), jobs=1, quiet=True)
+    assert not (out / "b.html").exists()
+    assert list(manifest(out)["files"]) == ["a.ascr"]
+
+
+def test_prune_after_compiler_change(tmp_path, monkeypatch, capsys):
+    src, out = tmp_path / "src", tmp_path / "out"
+    write(src / "a.ascr", "# A\n")
+    write(src / "b.ascr", "# B\n")
+    monkeypatch.setattr(build, "compiler_fingerprint", lambda: "old")
+    run_build(str(src), str(out), jobs=1, quiet=True)
+
+    # a source deleted together with a compiler upgrade still loses its output
+    os.remove(src / "b.ascr")
+    monkeypatch.setattr(build, "compiler_fingerprint", lambda: "new")
+    capsys.readouterr()
+    run_build(str(src), str(out), jobs=1, quiet=True)
+
+    assert not (out / "b.html").exists()
+    assert "1 compiled, 0 unchanged, 1 removed" in capsys.readouterr().out
+    assert manifest(out)["compiler"] == "new"
@@ -0,0 +1,32 @@
+from fileload import read_chunks
+
+
+def read_all(path, chunk_size: int):
+    chunks = list(read_chunks(str(path), chunk_size))
+    return chunks, "".join(text for text, _, _ in chunks)
+
+
+def test_chunks_are_whole_lines(tmp_path):
+    text = "".join(f"line {i} ä€\U0001F600\n" for i in range(500))
+    path = tmp_path / "doc.ascr"
+    path.write_bytes(text.encode("utf-8"))
+
+    chunks, joined = read_all(path, 256)
+    assert joined == text
+    assert len(chunks) > 10
+    assert all(chunk.endswith("\n") for chunk, _, _ in chunks)
+    # progress counts bytes and ends at the file size
+    assert chunks[-1][1] == chunks[-1][2] == len(text.encode("utf-8"))
+    assert [done for _, done, _ in chunks] == sorted(done for _, done, _ in chunks)
+
+
+def test_newlines_are_normalized(tmp_path):
+    path = tmp_path / "doc.ascr"
+    path.write_bytes(b"a\r\nb\rc\nno newline at the end")
+    assert read_all(path, 4)[1] == "a\nb\nc\nno newline at the end"
+
+
+def test_empty_file(tmp_path):
+    path = tmp_path / "empty.ascr"
+    path.write_bytes(b"")
+    assert read_all(path, 16) == ([], "")
@@ -0,0 +1,59 @@
+from incremental import BlockCache, LastGood
+from parser import parse_text
+from renderer import Renderer, MACROS, render
+
+
+DOC = "# Title\n\nfirst paragraph\n\nsecond *paragraph*\n\n- a\n- b\n\n| x | y |\n"
+
+
+def test_same_output_as_a_full_render():
+    cache = BlockCache()
+    doc, html_out = cache.compile(DOC)
+    assert html_out == render(parse_text(DOC))
+
+
+def test_only_changed_blocks_are_rendered():
+    cache = BlockCache()
+    cache.compile(DOC)
+    assert (cache.hits, cache.misses) == (0, 5)
+
+    cache.compile(DOC.replace("first paragraph", "first paragraph, edited"))
+    assert (cache.hits, cache.misses) == (4, 6)
+
+
+def test_least_recently_used_blocks_are_dropped():
+    cache = BlockCache(max_blocks=2)
+    cache.compile("one\n\ntwo\n\nthree\n")
+    assert len(cache.blocks) == 2
+    cache.compile("three\n")
+    assert cache.hits == 1
+
+
+def test_broken_block_keeps_its_last_good_html():
+    macros = dict(MACROS)
+
+    def render_flaky(node, r):
+        if "boom" in node.content:
+            raise ValueError("boom")
+        return f"<div class='flaky'>{r.inline(node.content)}</div>"
+
+    macros["flaky"] = render_flaky
+    cache = BlockCache(renderer=Renderer(macros))
+    good = LastGood()
+
+    _, html_out = cache.compile("before\n\n::flaky\nfine\n::\n\nafter\n", good)
+    assert "<div class='flaky'>fine</div>" in html_out
+
+    _, html_out = cache.compile("before\n\n::flaky\nboom\n::\n\nafter\n", good)
+    assert "Could not render lines 3-5: ValueError: boom" in html_out
+    # the error marker is followed by the html from before, the other blocks are untouched
+    assert "<div class='flaky'>fine</div>" in html_out
+    assert "<p>before</p>" in html_out and "<p>after</p>" in html_out
+
+
+def test_last_good_find():
+    good = LastGood()
+    good.update([(1, 1, "a"), (3, 5, "b"), (7, 9, "c")])
+    assert good.find(4, 4) == "b"
+    assert good.find(2, 7) == "b\nc"
+    assert good.find(10, 12) is None
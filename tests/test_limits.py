@@ -0,0 +1,64 @@
+import threading
+
+import pytest
+
+from compiler import Compiler
+from limits import Budget, CompileLimitError, CompileLimits, start_budget
+
+
+def compile_with(text: str, cancel=None, **limits):
+    return Compiler(limits=CompileLimits(**limits)).compile(text, cancel)
+
+
+def test_source_size():
+    with pytest.raises(CompileLimitError) as e:
+        compile_with("ä" * 600, max_source_bytes=1000)
+    assert (e.value.limit, e.value.value, e.value.maximum) == ("source_bytes", 1200, 1000)
+    compile_with("a" * 600, max_source_bytes=1000)
+
+
+def test_list_depth():
+    nested = "- a\n" + "".join("    " * d + "- a\n" for d in range(1, 6))
+    with pytest.raises(CompileLimitError) as e:
+        compile_with(nested, max_depth=3)
+    assert e.value.limit == "depth" and e.value.line is not None
+    compile_with(nested, max_depth=10)
+
+
+def test_table_cells():
+    table = "| a | b |\n" * 10
+    with pytest.raises(CompileLimitError) as e:
+        compile_with(table + "\n" + table, max_table_cells=30)
+    assert e.value.limit == "table_cells"
+    assert e.value.as_dict()["maximum"] == 30
+    compile_with(table, max_table_cells=30)
+
+
+def test_time_budget():
+    with pytest.raises(CompileLimitError) as e:
+        compile_with("paragraph\n\n" * 2000, time_budget=0)
+    assert e.value.limit == "time"
+
+
+def test_cancel():
+    cancel = threading.Event()
+    cancel.set()
+    with pytest.raises(CompileLimitError) as e:
+        Compiler().compile("text\n", cancel)
+    assert e.value.limit == "cancelled" and str(e.value).startswith("compile cancelled")
+
+
+def test_tick_checks_every_few_calls():
+    cancel = threading.Event()
+    budget = Budget(CompileLimits(None, None, None, None), cancel)
+    cancel.set()
+    for _ in range(Budget.CHECK_EVERY - 1):
+        budget.tick()
+    with pytest.raises(CompileLimitError):
+        budget.tick()
+
+
+def test_start_budget():
+    assert start_budget("x") is None
+    budget = start_budget("x", cancel=threading.Event())
+    assert budget is not None and budget.deadline is None
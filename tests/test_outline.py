@@ -0,0 +1,38 @@
+from outline import Outline, display_text, headings
+from parser import parse_text
+
+
+def apply(old: list, new: list, opcodes: list, moved: list) -> list:
+    # what the outline panel does with the result of update()
+    result = list(old)
+    for tag, i1, i2, j1, j2 in reversed(opcodes):
+        result[i1:i2] = new[j1:j2]
+    for j, line in moved:
+        result[j] = result[j][:2] + (line,)
+    return result
+
+
+def test_headings():
+    doc = parse_text("# One\n\ntext\n\n## Two **b**\n")
+    assert headings(doc) == [(1, "One", 1), (2, "Two **b**", 5)]
+    assert display_text(headings(doc)[1]) == "    Two b"
+
+
+def test_update_reports_the_changes():
+    outline = Outline()
+    first = [(1, "A", 1), (2, "B", 3), (2, "C", 5), (1, "D", 7)]
+    opcodes, moved = outline.update(first)
+    assert apply([], first, opcodes, moved) == first and moved == []
+
+    second = [(1, "A", 1), (2, "B2", 3), (2, "C", 6), (1, "D", 8), (1, "E", 10)]
+    opcodes, moved = outline.update(second)
+    assert apply(first, second, opcodes, moved) == second
+    assert [op[0] for op in opcodes] == ["replace", "insert"]
+    assert moved == [(2, 6), (3, 8)]
+
+
+def test_only_lines_moved():
+    outline = Outline()
+    outline.update([(1, "A", 1), (1, "B", 3)])
+    assert outline.update([(1, "A", 2), (1, "B", 4)]) == ([], [(0, 2), (1, 4)])
+    assert outline.update([(1, "A", 2), (1, "B", 4)]) == ([], [])
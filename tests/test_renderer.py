@@ -0,0 +1,41 @@
+import renderer
+from compiler import Compiler
+from inline import parse_inline
+from parser import parse_text
+
+
+def body(html_out: str) -> str:
+    return html_out.split("<body>\n", 1)[1].split("\n  </body>", 1)[0]
+
+
+def test_macro_with_renderer():
+    compiler = Compiler()
+
+    @compiler.register_macro("shout")
+    def render_shout(node, r):
+        return f"<div class='shout'>{r.inline(node.content.upper())}</div>"
+
+    assert body(compiler.compile("::shout\n*hi*\n::\n")[0]) == "<div class='shout'><em>HI</em></div>"
+
+
+def test_single_argument_macros():
+    compiler = Compiler()
+
+    @compiler.register_macro("old")
+    def render_old(node):
+        return f"<div class='old'>{parse_inline(node.content)}</div>"
+
+    assert body(compiler.compile("::old\n**x**\n::\n")[0]) == "<div class='old'><strong>x</strong></div>"
+
+
+def test_macros_written_to_the_registry(monkeypatch):
+    # code from before register_macro took a registry filled the dict directly
+    monkeypatch.setitem(renderer._macro_registry, "legacy", lambda node: "<b>legacy</b>")
+    assert body(renderer.render(parse_text("::legacy\nx\n::\n"))) == "<b>legacy</b>"
+
+    compiler = Compiler()
+    compiler.macros["local"] = lambda node: "<i>local</i>"
+    compiler.macros["both"] = lambda node, r: "<u>both</u>"
+    html_out, stats = compiler.compile("::local\nx\n::\n\n::both\ny\n::\n")
+    assert not stats.errors
+    assert body(html_out) == "<i>local</i>\n<u>both</u>"
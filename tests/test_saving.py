@@ -0,0 +1,27 @@
+from saving import RecoveryJournal, SaveWriter, replay_journal
+
+
+def replay(tmp_path, base: str, edits: list[tuple[int, int, str]]) -> str:
+    writer = SaveWriter()
+    writer.start()
+    journal = RecoveryJournal(writer, "test", 1, str(tmp_path))
+    journal.rebase(None, base)
+    for pos, removed, inserted in edits:
+        journal.record(pos, removed, inserted)
+    journal.flush()
+    writer.flush()
+    writer.stop()
+    return replay_journal(journal.path)[1]
+
+
+def test_typing_is_merged(tmp_path):
+    assert replay(tmp_path, "hello", [(5, 0, " "), (6, 0, "w"), (7, 0, "o")]) == "hello wo"
+
+
+def test_typing_after_astral_characters(tmp_path):
+    # positions are Qt (UTF-16) positions, the emoji takes two of them
+    edits = [(5, 0, "\U0001F600x"), (7, 0, "b")]
+    assert replay(tmp_path, "hello", edits) == "hello\U0001F600bx"
+
+    edits = [(5, 0, "\U0001F600x"), (8, 0, "b"), (9, 0, "c")]
+    assert replay(tmp_path, "hello", edits) == "hello\U0001F600xbc"
@@ -0,0 +1,70 @@
+import random
+
+from search import MatchIndex
+
+
+def positions(lines: list[str]) -> list[tuple[int, str]]:
+    # (Qt position, text) of every line, the newline counts as one
+    out, pos = [], 0
+    for line in lines:
+        out.append((pos, line))
+        pos += len(line.encode("utf-16-le")) // 2 + 1
+    return out
+
+
+def indexed(lines: list[str], query: str, regex: bool = False) -> MatchIndex:
+    index = MatchIndex()
+    index.set_query(query, regex)
+    index.rebuild(positions(lines))
+    return index
+
+
+def test_matches():
+    index = indexed(["cat cat", "dog", "a cat"], "cat")
+    assert list(zip(index.starts, index.ends)) == [(0, 3), (4, 7), (14, 17)]
+    assert index.next_after(5) == 2 and index.next_after(20) == 0
+    assert index.prev_before(4) == 0 and index.prev_before(0) == 2
+    assert index.match_at(4, 7) == 1 and index.match_at(4, 6) == -1
+
+
+def test_positions_after_astral_characters():
+    index = indexed(["\U0001F600cat", "cat"], "cat")
+    assert list(zip(index.starts, index.ends)) == [(2, 5), (6, 9)]
+
+
+def test_update_matches_a_rebuild():
+    rng = random.Random(7)
+    words = ["cat", "dog", "\U0001F600", "category", "x"]
+    lines = [" ".join(rng.choice(words) for _ in range(5)) for _ in range(40)]
+    index = indexed(lines, "cat")
+
+    for _ in range(200):
+        first = rng.randrange(len(lines))
+        last = min(len(lines), first + rng.randrange(3))
+        new = [" ".join(rng.choice(words) for _ in range(rng.randrange(6))) for _ in range(rng.randrange(3))]
+        if last == first and not new:
+            continue
+
+        old_positions = positions(lines)
+        old_total = old_positions[-1][0] + len(lines[-1].encode("utf-16-le")) // 2 + 1
+        start = old_positions[first][0]
+        old_end = old_positions[last][0] if last < len(lines) else old_total
+
+        lines[first:last] = new
+        new_positions = positions(lines)
+        new_total = new_positions[-1][0] + len(lines[-1].encode("utf-16-le")) // 2 + 1 if lines else 0
+        index.update(start, old_end, new_total - old_total, new_positions[first:first + len(new)])
+
+        expected = indexed(lines, "cat")
+        assert (index.starts, index.ends) == (expected.starts, expected.ends)
+        if not lines:
+            break
+
+
+def test_replace():
+    index = indexed([], r"(\w+)@(\w+)", regex=True)
+    assert index.replace_lines("a@b c@d\nx", r"\2@\1") == ("b@a d@c\nx", 2)
+    assert index.replacement("xx a@b", 3, r"\2") == "b"
+
+    index = indexed([], "a")
+    assert index.replace_lines("banana", "o") == ("bonono", 3)
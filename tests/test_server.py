@@ -0,0 +1,80 @@
+import http.client
+import json
+import socket
+import threading
+
+import pytest
+
+from limits import CompileLimits
+from server import CompileHTTPServer, CompileService
+
+
+@pytest.fixture
+def server(tmp_path):
+    (tmp_path / "a.ascr").write_text("# From a file\n", encoding="utf-8")
+    service = CompileService(limits=CompileLimits(max_source_bytes=1000, max_depth=3), root=str(tmp_path))
+    srv = CompileHTTPServer(("127.0.0.1", 0), service)
+    thread = threading.Thread(target=srv.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield srv
+    srv.shutdown()
+    srv.server_close()
+
+
+def post(srv, body, path="/compile"):
+    conn = http.client.HTTPConnection("127.0.0.1", srv.server_address[1], timeout=5)
+    conn.request("POST", path, json.dumps(body), {"Content-Type": "application/json"})
+    response = conn.getresponse()
+    return response.status, json.loads(response.read())
+
+
+def raw_request(srv, data: bytes) -> bytes:
+    with socket.create_connection(("127.0.0.1", srv.server_address[1]), timeout=5) as sock:
+        sock.sendall(data)
+        chunks = []
+        while chunk := sock.recv(65536):
+            chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def test_compile(server):
+    status, result = post(server, {"text": "# Hi\n\n*x*\n"})
+    assert status == 200
+    assert "<em>x</em>" in result["html"] and result["errors"] == []
+
+
+def test_limits(server):
+    assert post(server, {"text": "x" * 2000})[0] == 413
+    status, result = post(server, {"text": "- a\n" + "".join("    " * d + "- a\n" for d in range(1, 6))})
+    assert status == 422 and result["limit"] == "depth"
+
+
+def test_paths_stay_in_the_root(server):
+    status, result = post(server, {"path": "a.ascr"})
+    assert status == 200 and "From a file" in result["html"]
+    assert post(server, {"path": "../outside.ascr"})[0] == 403
+    assert post(server, {"path": "missing.ascr"})[0] == 400
+
+
+def test_bad_requests(server):
+    assert post(server, ["not", "an", "object"])[0] == 400
+    assert post(server, {"other": 1})[0] == 400
+    assert post(server, {"text": "x"}, path="/nope")[0] == 404
+
+
+def test_bad_content_length_closes_the_connection(server):
+    # the server answers without reading the body, what's left of it must not become a request
+    response = raw_request(server, b"POST /compile HTTP/1.1\r\nHost: x\r\nContent-Length: abc\r\n\r\n"
+                                   b"GET /health HTTP/1.1\r\nHost: x\r\n\r\n")
+    assert response.startswith(b"HTTP/1.1 400")
+    assert b"invalid Content-Length" in response
+    assert response.count(b"HTTP/1.1") == 1
+
+
+def test_keep_alive(server):
+    conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=5)
+    for _ in range(3):
+        conn.request("POST", "/compile", json.dumps({"text": "hi"}))
+        response = conn.getresponse()
+        assert response.status == 200
+        response.read()